@@ -0,0 +1,375 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from enum import Enum
+from typing import Callable
+
+from fastapi import WebSocket
+from starlette.websockets import WebSocketDisconnect
+from websockets.exceptions import ConnectionClosed
+
+from api.constants import LogConstants, BroadcastConstants
+from api.lib import serialization
+from api.lib.metrics import FANOUT_SECONDS
+
+
+class SlowConsumerPolicy(str, Enum):
+    """
+    What to do with a connection whose send queue is full.
+
+    DROP: Skip the message for that connection only.
+    EVICT: Close the connection and remove it from the game.
+    """
+    DROP = "drop"
+    EVICT = "evict"
+
+
+class FanoutStats:
+    """
+    Aggregated fan-out latency: the time between a message being queued and it being sent to the last player.
+
+    Attributes:
+        count: Number of completed fan-outs
+        total_seconds: Sum of all the fan-out latencies
+        max_seconds: Highest fan-out latency
+        last_seconds: Latency of the last completed fan-out
+        dropped: Number of messages dropped for slow consumers
+        evicted: Number of slow consumers evicted
+    """
+    def __init__(self):
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.last_seconds = 0.0
+        self.dropped = 0
+        self.evicted = 0
+
+    def observe(self, seconds: float):
+        self.count += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.last_seconds = seconds
+        FANOUT_SECONDS.observe(seconds)
+
+
+class Fanout:
+    """
+    Delivery of one encoded message to a set of connections.
+
+    Attributes:
+        recipients: Number of connections the message was queued for
+        started_at: time.perf_counter() when the message was queued
+        seconds: Fan-out latency, None until the message reached every recipient
+    """
+    def __init__(self, recipients: int, stats: FanoutStats):
+        self.recipients = recipients
+        self.started_at = time.perf_counter()
+        self.seconds: float | None = None
+        self.__pending = recipients
+        self.__stats = stats
+        self.__callbacks: list[Callable[["Fanout"], None]] = []
+        self.__done = asyncio.Event()
+        if not recipients:
+            self.seconds = 0.0
+            self.__done.set()
+
+    def delivered(self):
+        """Marks the message as handled for one recipient, whether it was sent, dropped or failed"""
+        self.__pending -= 1
+        if self.__pending == 0:
+            self.seconds = time.perf_counter() - self.started_at
+            self.__stats.observe(self.seconds)
+            self.__done.set()
+            for callback in self.__callbacks:
+                callback(self)
+
+    def add_done_callback(self, callback: Callable[["Fanout"], None]):
+        """
+        Calls the callback with the fanout once the message reached every recipient, right away if it already has
+        Args:
+            callback: Function taking the fanout
+
+        Returns:
+            None
+        """
+        if self.__done.is_set():
+            callback(self)
+        else:
+            self.__callbacks.append(callback)
+
+    async def wait(self, timeout: float | None = None) -> bool:
+        """
+        Waits until the message reached every recipient
+        Args:
+            timeout: Seconds to wait for
+
+        Returns:
+            True if the fan-out completed, False if the timeout was hit
+        """
+        try:
+            await asyncio.wait_for(self.__done.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+class PlayerConnection:
+    """
+    Websocket of a player with a bounded send queue. A writer task sends the queued messages so that a slow
+    socket never blocks the sender.
+
+    Attributes:
+        game_id: Game ID
+        player_id: Player ID
+        websocket: Websocket connection of the player
+        last_pong: Monotonic time of the last pong from the player, None if the player never sent one
+    """
+    def __init__(self, broadcaster: "Broadcaster", game_id: str, player_id: str, websocket: WebSocket,
+                 queue_size: int):
+        self.game_id = game_id
+        self.player_id = player_id
+        self.websocket = websocket
+        self.last_pong: float | None = None
+        self.__broadcaster = broadcaster
+        self.__queue: asyncio.Queue[tuple[str, Fanout] | None] = asyncio.Queue(maxsize=queue_size)
+        self.__writer = asyncio.get_running_loop().create_task(self.__write())
+
+    def enqueue(self, payload: str, fanout: Fanout) -> bool:
+        """
+        Queues an encoded message without waiting
+        Args:
+            payload: Encoded message
+            fanout: Fan-out the message belongs to
+
+        Returns:
+            False if the queue is full or closed, True otherwise
+        """
+        if self.__writer.done():
+            return False
+        try:
+            self.__queue.put_nowait((payload, fanout))
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def pong(self):
+        """
+        Records that the player answered a heartbeat
+
+        Returns:
+            None
+        """
+        self.last_pong = time.monotonic()
+
+    def close(self, drain: bool = True):
+        """
+        Stops the writer task
+        Args:
+            drain: Send the already queued messages before stopping
+
+        Returns:
+            None
+        """
+        if drain:
+            try:
+                self.__queue.put_nowait(None)
+                return
+            except asyncio.QueueFull:
+                pass
+        self.__writer.cancel()
+        self.__discard_queued()
+
+    def __discard_queued(self):
+        # Messages which will never be sent still count as handled for their fan-outs
+        while not self.__queue.empty():
+            if item := self.__queue.get_nowait():
+                item[1].delivered()
+
+    async def __write(self):
+        try:
+            while (item := await self.__queue.get()) is not None:
+                payload, fanout = item
+                try:
+                    await self.websocket.send_text(payload)
+                except (ConnectionClosed, WebSocketDisconnect, RuntimeError):
+                    self.__broadcaster.unregister(self.game_id, self.player_id, self)
+                    return
+                finally:
+                    fanout.delivered()
+        finally:
+            self.__discard_queued()
+
+
+class Broadcaster:
+    """
+    Sends messages to the players connected to a game. Each message is encoded once and queued for every
+    connection, and the per-connection writers send it concurrently.
+
+    Attributes:
+        connections: Player connections by game ID and player ID
+        queue_size: Maximum number of messages queued for a connection
+        slow_consumer_policy: What to do with connections whose queue is full
+        on_unregister: Called with the game ID and player ID of every connection removed from a running game
+        fanout_stats: Fan-out latency statistics
+    """
+    def __init__(self, queue_size: int = BroadcastConstants.SEND_QUEUE_SIZE,
+                 slow_consumer_policy: SlowConsumerPolicy = SlowConsumerPolicy.EVICT,
+                 on_unregister: Callable[[str, str], None] | None = None):
+        self.connections: defaultdict[str, dict[str, PlayerConnection]] = defaultdict(dict)
+        self.queue_size = queue_size
+        self.slow_consumer_policy = slow_consumer_policy
+        self.on_unregister = on_unregister
+        self.fanout_stats = FanoutStats()
+        self.__tasks: set[asyncio.Task] = set()
+
+    @staticmethod
+    def encode(message: dict) -> str:
+        """
+        Encodes a message as compact JSON text with orjson
+        Args:
+            message: Message to encode
+
+        Returns:
+            JSON text of the message
+        """
+        return serialization.dumps(message).decode()
+
+    def register(self, game_id: str, player_id: str, websocket: WebSocket) -> PlayerConnection:
+        """
+        Adds the websocket of a player to the game, replacing the previous connection of the player
+        Args:
+            game_id: Game ID
+            player_id: Player ID
+            websocket: Accepted websocket connection
+
+        Returns:
+            PlayerConnection
+        """
+        if previous := self.connections[game_id].get(player_id):
+            previous.close(drain=False)
+        connection = PlayerConnection(self, game_id, player_id, websocket, self.queue_size)
+        self.connections[game_id][player_id] = connection
+        return connection
+
+    def unregister(self, game_id: str, player_id: str, connection: PlayerConnection | None = None):
+        """
+        Removes the connection of a player from the game
+        Args:
+            game_id: Game ID
+            player_id: Player ID
+            connection: Only remove the connection if it's still this one
+
+        Returns:
+            None
+        """
+        game_connections = self.connections.get(game_id, {})
+        current = game_connections.get(player_id)
+        if current is None or (connection is not None and current is not connection):
+            return
+        del game_connections[player_id]
+        if not game_connections:
+            del self.connections[game_id]
+        current.close(drain=False)
+        if self.on_unregister is not None:
+            self.on_unregister(game_id, player_id)
+
+    def disconnect(self, connection: PlayerConnection):
+        """
+        Removes the connection from its game and closes its websocket without waiting for the close handshake
+        Args:
+            connection: Player connection
+
+        Returns:
+            None
+        """
+        self.unregister(connection.game_id, connection.player_id, connection)
+        task = asyncio.get_running_loop().create_task(self.__close_websocket(connection.websocket))
+        self.__tasks.add(task)
+        task.add_done_callback(self.__tasks.discard)
+
+    def close_game(self, game_id: str):
+        """
+        Removes all the connections of the game once their queued messages are sent
+        Args:
+            game_id: Game ID
+
+        Returns:
+            None
+        """
+        for connection in self.connections.pop(game_id, {}).values():
+            connection.close()
+
+    def broadcast(self, game_id: str, message: dict) -> Fanout:
+        """
+        Queues the message for every player connected to the game
+        Args:
+            game_id: Game ID
+            message: Message to broadcast
+
+        Returns:
+            Fanout of the message
+        """
+        return self.broadcast_encoded(game_id, self.encode(message))
+
+    def broadcast_encoded(self, game_id: str, payload: str) -> Fanout:
+        """
+        Queues an already encoded message for every player connected to the game
+        Args:
+            game_id: Game ID
+            payload: Encoded message
+
+        Returns:
+            Fanout of the message
+        """
+        return self.__fanout(list(self.connections.get(game_id, {}).values()), payload)
+
+    def send(self, game_id: str, player_id: str, message: dict) -> Fanout:
+        """
+        Queues the message for a single player
+        Args:
+            game_id: Game ID
+            player_id: Player ID
+            message: Message to send
+
+        Returns:
+            Fanout of the message
+        """
+        return self.send_encoded(game_id, player_id, self.encode(message))
+
+    def send_encoded(self, game_id: str, player_id: str, payload: str) -> Fanout:
+        """
+        Queues an already encoded message for a single player
+        Args:
+            game_id: Game ID
+            player_id: Player ID
+            payload: Encoded message
+
+        Returns:
+            Fanout of the message
+        """
+        connection = self.connections.get(game_id, {}).get(player_id)
+        return self.__fanout([connection] if connection else [], payload)
+
+    def __fanout(self, connections: list[PlayerConnection], payload: str) -> Fanout:
+        fanout = Fanout(len(connections), self.fanout_stats)
+        for connection in connections:
+            if connection.enqueue(payload, fanout):
+                continue
+            fanout.delivered()
+            if self.slow_consumer_policy == SlowConsumerPolicy.EVICT:
+                self.fanout_stats.evicted += 1
+                logging.getLogger(LogConstants.APP_NAME).info(
+                    f"Evicting slow player {connection.player_id} from game {connection.game_id}."
+                )
+                self.disconnect(connection)
+            else:
+                self.fanout_stats.dropped += 1
+        return fanout
+
+    @staticmethod
+    async def __close_websocket(websocket: WebSocket):
+        try:
+            await websocket.close()
+        except (ConnectionClosed, RuntimeError):
+            pass
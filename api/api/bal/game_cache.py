@@ -0,0 +1,90 @@
+import time
+from collections import OrderedDict
+
+from api.models.game import Game
+
+
+class GameCache:
+    """
+    In-process cache of live games. The cached Game objects are the authoritative copy for the
+    process; callers write every mutation through to the database themselves.
+
+    Games are kept in least-recently-used order so that idle games can be evicted from the front
+    without scanning the whole cache.
+
+    Attributes:
+        max_idle_seconds: Seconds a game can stay untouched before it is evicted.
+        max_size: Maximum number of games kept in memory.
+    """
+    def __init__(self, max_idle_seconds: float = 3600, max_size: int = 10000):
+        self.max_idle_seconds = max_idle_seconds
+        self.max_size = max_size
+        self.__games: OrderedDict[str, tuple[Game, float]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.__games)
+
+    def __contains__(self, game_id: str) -> bool:
+        return game_id in self.__games
+
+    def __iter__(self):
+        return iter(list(self.__games))
+
+    def get(self, game_id: str) -> Game | None:
+        """
+        Gets the cached game and marks it as recently used
+        Args:
+            game_id: ID of the game
+
+        Returns:
+            Game object if it's cached, None otherwise
+        """
+        if entry := self.__games.get(game_id):
+            self.__games[game_id] = (entry[0], time.monotonic())
+            self.__games.move_to_end(game_id)
+            return entry[0]
+        return None
+
+    def put(self, game: Game):
+        """
+        Adds or replaces a game in the cache and evicts the idle ones
+        Args:
+            game: Game object to cache
+
+        Returns:
+            None
+        """
+        self.__games[game.id] = (game, time.monotonic())
+        self.__games.move_to_end(game.id)
+        self.evict_idle()
+
+    def evict(self, game_id: str) -> Game | None:
+        """
+        Removes a game from the cache
+        Args:
+            game_id: ID of the game
+
+        Returns:
+            The evicted game object if it was cached, None otherwise
+        """
+        if entry := self.__games.pop(game_id, None):
+            return entry[0]
+        return None
+
+    def evict_idle(self) -> list[str]:
+        """
+        Evicts the games which have not been used for longer than max_idle_seconds, and the least recently
+        used ones if the cache has grown beyond max_size.
+
+        Returns:
+            IDs of the evicted games
+        """
+        evicted = []
+        now = time.monotonic()
+        while self.__games:
+            game_id, (_, last_used) = next(iter(self.__games.items()))
+            if len(self.__games) <= self.max_size and now - last_used < self.max_idle_seconds:
+                break
+            self.__games.popitem(last=False)
+            evicted.append(game_id)
+        return evicted
@@ -1,39 +1,286 @@
 import asyncio
+import json
 import logging
+import time
 import uuid
-from collections import defaultdict
 from datetime import timedelta, datetime
-from json import JSONDecodeError
 
 import pytz
-from typing import Tuple
+from typing import Tuple, Dict, Any
 
 from fastapi import WebSocket
-from websockets.exceptions import ConnectionClosedError
 
-from api.constants import EntityNames, LogConstants
+from api.constants import EntityNames, LogConstants, ENVConstants, DatabaseBackends, BusConstants, \
+    RateLimitConstants, HeartbeatConstants
+from api.bal.broadcaster import Broadcaster
+from api.bal.game_cache import GameCache
+from api.bal.game_supervisor import GameSupervisor
+from api.bal.heartbeat import HeartbeatScheduler
+from api.bal.round_completion import RoundCompletionTracker
+from api.bal.round_pool import RoundPool
+from api.bal.round_scheduler import RoundScheduler
+from api.bal.write_behind import WriteBehindBuffer
+from api.dal import documents
 from api.dal.database import Database
-from api.dal.firestore import Firestore
-import numpy as np
+from api.dal.firestore import AsyncFirestore
+from api.dal.sqlite import SQLiteDatabase
 
 from api.errors.database import GameNotFoundError
+from api.errors.rate_limit import RateLimitedError
 from api.errors.game import RoundNotExistsError, InvalidPlayerError, \
     RoundAlreadyEndedError, RoundNotStartedError, GameNotFinishedError, ActionNotPermittedError, PlayerLimitMetError
-from api.lib.chatgpt import ChatGPTManager
+from api.lib.chatgpt import AsyncChatGPTManager
+from api.lib.config import get_env, get_env_float
+from api.lib.matcher import AnswerMatcher, Verdict
+from api.lib.message_bus import MessageBus, InProcessMessageBus, RedisMessageBus
+from api.lib.metrics import DB_REQUEST_SECONDS
+from api.lib.rate_limit import TokenBucketLimiter, AdmissionController
+from api.lib.tracing import Tracer
+from api.lib.verdict_cache import VerdictCache
 from api.models.game import Game, Player, Round
 
 
 class GameManager:
-    def __init__(self):
-        self.db_client: Database = Firestore()
-        self.gpt_client = ChatGPTManager()
-        self.game = None
-        self.player_connections = defaultdict(dict[str:WebSocket])
+    def __init__(
+            self,
+            db_client: Database | None = None,
+            gpt_client: AsyncChatGPTManager | None = None,
+            message_bus: MessageBus | None = None,
+    ):
+        self.db_client: Database = db_client or self.__create_db_client()
+        self.message_bus: MessageBus = message_bus or self.__create_message_bus()
+        self.bus_subscription: asyncio.Task | None = None
+        self.gpt_client = gpt_client or AsyncChatGPTManager()
+        self.round_pool = RoundPool(self.gpt_client)
+        self.answer_matcher = AnswerMatcher()
+        self.verdict_cache = VerdictCache()
+        self.games = GameCache()
+        self.game_loads: dict[str, asyncio.Task] = {}
+        self.write_behind = WriteBehindBuffer(self.db_client)
+        self.broadcaster = Broadcaster(on_unregister=self.__on_player_disconnected)
+        self.round_completion = RoundCompletionTracker()
+        self.player_connections = self.broadcaster.connections
+        self.heartbeat = HeartbeatScheduler(
+            self.broadcaster,
+            interval=get_env_float(ENVConstants.HEARTBEAT_INTERVAL_SECONDS, HeartbeatConstants.INTERVAL_SECONDS),
+            max_missed_pongs=int(get_env_float(
+                ENVConstants.HEARTBEAT_MAX_MISSED_PONGS, HeartbeatConstants.MAX_MISSED_PONGS
+            )),
+        )
         self.game_events: dict[str:dict[str:asyncio.Event]] = {}
-        self.game_started_flag = False
+        self.paused_rounds: dict[str, tuple[str, float]] = {}
+        self.round_scheduler = RoundScheduler(on_round_end=self.advance_game)
+        self.worker_id = uuid.uuid4().hex
+        self.supervisor = GameSupervisor(
+            self.broadcaster,
+            self.worker_id,
+            watched_games=lambda: {*self.games, *self.game_events, *self.paused_rounds},
+            on_empty=self.__pause_rounds,
+            on_occupied=self.__resume_rounds,
+            on_abandoned=self.__abandon_game,
+            publish_presence=lambda players: self.__publish(
+                BusConstants.PRESENCE, BusConstants.NO_TARGET, self.worker_id,
+                " ".join(f"{game_id}:{','.join(player_ids)}" for game_id, player_ids in players.items()),
+            ),
+        )
+        self.started_games: set[str] = set()
+        self.guess_tasks: set[asyncio.Task] = set()
+        self.bus_tasks: set[asyncio.Task] = set()
+        self.tracer = Tracer()
+        self.player_guess_limiter = TokenBucketLimiter(
+            get_env_float(ENVConstants.GUESS_RATE_PER_PLAYER, RateLimitConstants.GUESS_RATE_PER_PLAYER),
+            get_env_float(ENVConstants.GUESS_BURST_PER_PLAYER, RateLimitConstants.GUESS_BURST_PER_PLAYER),
+        )
+        self.game_guess_limiter = TokenBucketLimiter(
+            get_env_float(ENVConstants.GUESS_RATE_PER_GAME, RateLimitConstants.GUESS_RATE_PER_GAME),
+            get_env_float(ENVConstants.GUESS_BURST_PER_GAME, RateLimitConstants.GUESS_BURST_PER_GAME),
+        )
+        self.create_game_admission = AdmissionController(
+            max_concurrency=int(get_env_float(
+                ENVConstants.CREATE_GAME_MAX_CONCURRENCY, RateLimitConstants.CREATE_GAME_MAX_CONCURRENCY
+            )),
+            max_queue=int(get_env_float(ENVConstants.CREATE_GAME_MAX_QUEUE, RateLimitConstants.CREATE_GAME_MAX_QUEUE)),
+            queue_timeout=get_env_float(
+                ENVConstants.CREATE_GAME_QUEUE_TIMEOUT, RateLimitConstants.CREATE_GAME_QUEUE_TIMEOUT
+            ),
+        )
         self.tz = pytz.timezone('UTC')
 
-    def __get_game_from_db(self, game_id: str) -> Game:
+    @staticmethod
+    def __create_db_client() -> Database:
+        """
+        Creates the database store selected by the DATABASE_BACKEND environment variable, Firestore by default
+
+        Returns:
+            Database store
+        """
+        if get_env(ENVConstants.DATABASE_BACKEND) == DatabaseBackends.SQLITE:
+            return SQLiteDatabase(get_env(ENVConstants.SQLITE_PATH) or DatabaseBackends.DEFAULT_SQLITE_PATH)
+        return AsyncFirestore()
+
+    @staticmethod
+    def __create_message_bus() -> MessageBus:
+        """
+        Creates the message bus at the MESSAGE_BUS_URL environment variable, or an in-process message bus if it's
+        not set
+
+        Returns:
+            Message bus
+        """
+        if url := get_env(ENVConstants.MESSAGE_BUS_URL):
+            return RedisMessageBus.from_url(url)
+        return InProcessMessageBus()
+
+    async def start(self):
+        """
+        Starts the background work of the game manager: warms up the round pool, subscribes to the message bus and
+        starts supervising the games
+
+        Returns:
+            None
+        """
+        self.round_pool.refill()
+        await self.__subscribe()
+        self.supervisor.start()
+
+    async def __subscribe(self):
+        """
+        Subscribes to the messages of all games on the message bus, once. A failed subscription is retried by
+        the next call.
+
+        Returns:
+            None
+        """
+        if self.bus_subscription is None or (
+                self.bus_subscription.done() and (
+                    self.bus_subscription.cancelled() or self.bus_subscription.exception() is not None)):
+            self.bus_subscription = asyncio.get_running_loop().create_task(
+                self.message_bus.subscribe(BusConstants.CHANNEL, self.__on_bus_message)
+            )
+        await asyncio.shield(self.bus_subscription)
+
+    async def __publish(self, kind: str, game_id: str, target: str = BusConstants.NO_TARGET, payload: str = ""):
+        """
+        Publishes a message for the players or rounds of a game to every worker
+        Args:
+            kind: Message kind, one of BusConstants
+            game_id: Game ID
+            target: Player ID, round ID or worker ID the message is meant for or comes from
+            payload: Encoded websocket message, or the details of the message
+
+        Returns:
+            None
+        """
+        await self.__subscribe()
+        await self.message_bus.publish(BusConstants.CHANNEL, f"{kind} {game_id} {target}\n{payload}")
+
+    def __publish_players(self, game_id: str):
+        """
+        Publishes the players of the game connected to this worker in the background, after one of them joined
+        or left, so that the other workers count them in the lobby and in the current round
+        Args:
+            game_id: Game ID
+
+        Returns:
+            None
+        """
+        task = asyncio.get_running_loop().create_task(self.__publish(
+            BusConstants.PLAYERS, game_id, self.worker_id, " ".join(self.player_connections.get(game_id, {}))
+        ))
+        self.bus_tasks.add(task)
+        task.add_done_callback(self.bus_tasks.discard)
+
+    async def __on_bus_message(self, message: str):
+        """
+        Handles a message published on the message bus by acting on the players and rounds of the game connected
+        to this worker
+        Args:
+            message: Message in the `<kind> <game_id> <target>\\n<payload>` format
+
+        Returns:
+            None
+        """
+        header, _, payload = message.partition("\n")
+        kind, game_id, target = header.split(" ")
+        if kind == BusConstants.BROADCAST:
+            fanout = self.broadcaster.broadcast_encoded(game_id, payload)
+            if fanout.recipients:
+                fanout.add_done_callback(lambda f: self.tracer.record(
+                    game_id, "broadcast", f.started_at, f.started_at + f.seconds, recipients=f.recipients
+                ))
+        elif kind == BusConstants.SEND:
+            self.broadcaster.send_encoded(game_id, target, payload)
+        elif kind == BusConstants.ANSWERED:
+            if self.round_completion.answered(game_id, payload, target):
+                self.__end_round_early(game_id, payload)
+        elif kind == BusConstants.CLOSE_GAME:
+            self.broadcaster.close_game(game_id)
+            self.__forget_game(game_id)
+        elif kind == BusConstants.GAME_CHANGED and target != self.worker_id:
+            self.games.evict(game_id)
+        elif kind == BusConstants.PRESENCE and target != self.worker_id:
+            # The payload lists the players by game as `<game_id>:<player_id>,<player_id> <game_id>:...`
+            players = {}
+            for game_players in payload.split():
+                presence_game_id, _, player_ids = game_players.partition(":")
+                players[presence_game_id] = player_ids.split(",")
+            self.supervisor.presence(target, players)
+        elif kind == BusConstants.PLAYERS and target != self.worker_id:
+            joined, left = self.supervisor.players_changed(target, game_id, payload.split())
+            for player_id in left:
+                self.__stop_waiting_for(game_id, player_id)
+            if joined:
+                # The other worker may have missed the players of this worker, e.g. if it subscribed after they joined
+                if self.player_connections.get(game_id):
+                    self.__publish_players(game_id)
+                await self.__on_remote_players_joined(game_id, joined)
+
+    async def close(self):
+        """
+        Stops the background work and closes the connections held by the game manager
+
+        Returns:
+            None
+        """
+        await self.supervisor.close()
+        await self.round_pool.close()
+        await self.round_scheduler.close()
+        await self.heartbeat.close()
+        for task in [*self.guess_tasks, *self.bus_tasks]:
+            task.cancel()
+        await self.write_behind.close()
+        if (close_db_client := getattr(self.db_client, "close", None)) is not None:
+            # Closing the SQLite connection checkpoints its WAL into the database file
+            close_db_client()
+        await self.gpt_client.close()
+        await self.message_bus.close()
+
+    async def __get_game(self, game_id: str) -> Game:
+        """
+        Gets the game from the in-process cache, loading it from the db if it's not cached yet.
+        Concurrent loads of the same game share one db read, so there is only ever one cached copy of a game.
+        Args:
+            game_id: Game ID to get.
+
+        Returns:
+            Game object
+        """
+        if game := self.games.get(game_id):
+            return game
+        if (game_load := self.game_loads.get(game_id)) is None:
+            game_load = asyncio.get_running_loop().create_task(self.__load_game(game_id))
+            self.game_loads[game_id] = game_load
+            game_load.add_done_callback(lambda _: self.game_loads.pop(game_id, None))
+        return await asyncio.shield(game_load)
+
+    async def __load_game(self, game_id: str) -> Game:
+        game = await self.__get_game_from_db(game_id)
+        if cached_game := self.games.get(game_id):
+            return cached_game
+        self.games.put(game)
+        return game
+
+    async def __get_game_from_db(self, game_id: str) -> Game:
         """
         Gets the game from the db based on the given ID
         Args:
@@ -42,12 +289,75 @@ class GameManager:
         Returns:
             Game object
         """
-        if game_dict := self.db_client.get_game(game_id):
+        with DB_REQUEST_SECONDS.time("get_game"):
+            game_dict = await self.db_client.get_game(game_id)
+        if game_dict:
             game_dict["round_duration"] = timedelta(minutes=int(game_dict['round_duration']))
             return Game(**game_dict)
         else:
             raise GameNotFoundError(f"Game with id: {game_id} was not found in the database!")
 
+    async def __save_game(self, game: Game):
+        """
+        Writes the game through to the db and keeps the cached copy up to date
+        Args:
+            game: Game object to save
+
+        Returns:
+            None
+        """
+        game.invalidate()
+        with DB_REQUEST_SECONDS.time("upsert_game"):
+            await self.db_client.upsert_game(game.to_dict())
+        self.games.put(game)
+
+    def __update_game(self, game: Game, updates: Dict[str, Any]):
+        """
+        Stages the fields changed by a mutation of the cached game to be written to the db
+        Args:
+            game: Game object, already mutated
+            updates: New values by field path, built with api.dal.documents
+
+        Returns:
+            None
+        """
+        game.invalidate()
+        self.write_behind.stage(game.id, updates)
+        # With a shared message bus, the game may have been loaded again since this copy was read because
+        # another worker changed it. The newer copy is kept, and reloaded once this change is written.
+        if not self.message_bus.shared or self.games.get(game.id) is game:
+            self.games.put(game)
+
+    async def __share_game(self, game: Game):
+        """
+        Writes the pending changes of the game to the db right away and tells the other workers to load the game
+        again, when they share the message bus. A single worker keeps coalescing the writes.
+        Args:
+            game: Game object, already mutated
+
+        Returns:
+            None
+        """
+        if not self.message_bus.shared:
+            return
+        await self.write_behind.flush(game.id)
+        if self.games.get(game.id) is not game:
+            self.games.evict(game.id)
+        await self.__publish(BusConstants.GAME_CHANGED, game.id, self.worker_id)
+
+    async def __reload_game(self, game_id: str) -> Game:
+        """
+        Loads the game again from the db, for when another worker may have changed it since it was cached
+        Args:
+            game_id: Game ID
+
+        Returns:
+            Game object
+        """
+        await self.write_behind.flush(game_id)
+        self.games.evict(game_id)
+        return await self.__get_game(game_id)
+
     async def create_game(
             self,
             handle: str,
@@ -57,7 +367,8 @@ class GameManager:
             round_duration: timedelta,
     ) -> Game:
         """
-        Creates the game with the creator specified settings
+        Creates the game with the creator specified settings. At most a few games are created at a time, the
+        others wait for their turn or fail with a ServerBusyError if too many are waiting already.
         Args:
             avatar: Player avatar
             handle: Player handle
@@ -68,30 +379,35 @@ class GameManager:
         Returns:
             Game object
         """
-        player = Player(
-            handle=handle,
-            avatar=avatar,
-            score=0
-        )
-        if round_count < 1:
-            round_count = 1
-        if user_count < 1:
-            user_count = 1
-        if round_duration < timedelta(minutes=1):
-            round_duration = timedelta(minutes=1)
-        rounds = await self.create_rounds(round_count)
-        game = Game(
-            created_by=player.id,
-            user_count=user_count,
-            round_count=round_count,
-            round_duration=round_duration,
-            rounds=rounds,
-            players=[player]
-        )
-        self.db_client.upsert_game(game=game.dict())
-        return game
+        async with self.create_game_admission.admit():
+            player = Player(
+                handle=handle,
+                avatar=avatar,
+                score=0
+            )
+            if round_count < 1:
+                round_count = 1
+            if user_count < 1:
+                user_count = 1
+            if round_duration < timedelta(minutes=1):
+                round_duration = timedelta(minutes=1)
+            start = time.perf_counter()
+            rounds = await self.create_rounds(round_count)
+            rounds_created = time.perf_counter()
+            game = Game(
+                created_by=player.id,
+                user_count=user_count,
+                round_count=round_count,
+                round_duration=round_duration,
+                rounds=rounds,
+                players=[player]
+            )
+            await self.__save_game(game)
+            self.tracer.record(game.id, "create_rounds", start, rounds_created, count=round_count)
+            self.tracer.record(game.id, "create_game", start, time.perf_counter())
+            return game
 
-    def add_player(self, game_id: str, handle: str, avatar: str) -> Player:
+    async def add_player(self, game_id: str, handle: str, avatar: str) -> Player:
         """
         Adds a player to the game
         Args:
@@ -102,7 +418,7 @@ class GameManager:
         Returns:
             Player: Player object
         """
-        game = self.__get_game_from_db(game_id)
+        game = await self.__get_game(game_id)
         if len(game.players) == game.user_count:
             raise PlayerLimitMetError("Max number of players reached.")
         player = Player(
@@ -110,8 +426,18 @@ class GameManager:
             avatar=avatar,
             score=0
         )
-        game.players.append(player)
-        self.db_client.upsert_game(game.dict())
+        if self.message_bus.shared:
+            # Other workers may be adding players too, so the db checks the limit and places the player
+            await self.write_behind.flush(game_id)
+            with DB_REQUEST_SECONDS.time("add_player"):
+                is_added = await self.db_client.add_player(game_id, player.to_dict(), game.user_count)
+            if not is_added:
+                raise PlayerLimitMetError("Max number of players reached.")
+            self.games.evict(game_id)
+            await self.__publish(BusConstants.GAME_CHANGED, game_id, self.worker_id)
+            return player
+        game.add_player(player)
+        self.__update_game(game, documents.player_added(player.to_dict(), len(game.players) - 1))
         return player
 
     async def join_game(self, game_id: str, player_id: str, websocket: WebSocket):
@@ -125,99 +451,274 @@ class GameManager:
         Returns:
             None
         """
-        game = self.__get_game_from_db(game_id)
-        if len(self.player_connections[game_id].keys()) >= game.user_count:
-            logging.getLogger(LogConstants.APP_NAME).info("Maximum number of players are already in the room.")
-            await websocket.close()
+        with self.tracer.span(game_id, "join_game", player_id=player_id):
+            game = await self.__get_game(game_id)
+            if len(self.supervisor.connected_players(game_id)) >= game.user_count:
+                logging.getLogger(LogConstants.APP_NAME).info("Maximum number of players are already in the room.")
+                await websocket.close()
+                return
+            if (p := game.get_player(player_id)) is None and self.message_bus.shared:
+                # The player may have been added by another worker since the game was cached
+                game = await self.__reload_game(game_id)
+                p = game.get_player(player_id)
+            if p is None:
+                raise InvalidPlayerError("Can't join the game before the player is added to the game.")
+            await websocket.accept()
+            self.broadcaster.register(game_id, player_id, websocket)
+            self.__publish_players(game_id)
+            self.supervisor.joined(game_id)
+            self.heartbeat.start()
+            if (current_round := game.current_round) is not None and player_id not in current_round.results:
+                self.round_completion.joined(game_id, current_round.id, player_id)
+            message_to_broadcast = {
+                "status": "success",
+                "message": f"{p.handle} has joined the game.",
+                "message_type": "player_join",
+                "meta": {
+                    "new_player": {
+                        "id": p.id,
+                        "handle": p.handle,
+                        "avatar": p.avatar,
+                    },
+                    "existing_players": [player.to_dict() for player in game.players]
+                },
+            }
+            await self.broadcast_to_all_players(game_id, message_to_broadcast)
+            await self.__start_if_lobby_full(game_id)
+
+    async def __start_if_lobby_full(self, game_id: str):
+        """
+        Starts the game when the last player joins, whichever worker the players are connected to. When they are
+        connected to several workers, the worker with the lowest ID starts the game so that it's started once.
+        Args:
+            game_id: Game ID
+
+        Returns:
+            None
+        """
+        game = await self.__get_game(game_id)
+        connected_players = self.supervisor.connected_players(game_id)
+        # started_games only knows the games started by this process since it was started, so players
+        # reconnecting to a running or finished game are told apart by the game itself
+        if (
+                game_id not in self.started_games
+                and not game.has_started
+                and not game.results
+                and len(connected_players) == game.user_count
+                and min(connected_players.values()) == self.worker_id
+        ):
+            await self.start_round_if_everyone_joined(game_id, game.created_by)
+
+    async def __on_remote_players_joined(self, game_id: str, player_ids: set[str]):
+        """
+        Resumes the game and waits for the answers of players who joined another worker during a round scheduled
+        by this worker, and starts the game if they were the last players to join
+        Args:
+            game_id: Game ID
+            player_ids: IDs of the players who joined
+
+        Returns:
+            None
+        """
+        self.supervisor.joined(game_id)
+        if game_id in self.game_events:
+            current_round = (await self.__get_game(game_id)).current_round
+            for player_id in player_ids:
+                if current_round is not None and player_id not in current_round.results:
+                    self.round_completion.joined(game_id, current_round.id, player_id)
+        await self.__start_if_lobby_full(game_id)
+
+    async def receive_message(self, game_id: str, player_id: str, message: str):
+        """
+        Handles a message sent by a player over the websocket. Any message shows that the connection is alive,
+        so it counts as a pong. `submit_guess` messages are graded in the background so that the connection
+        keeps being read while ChatGPT checks the guess.
+        Args:
+            game_id: Game ID
+            player_id: Player ID
+            message: Text of the message
+
+        Returns:
+            None
+        """
+        self.heartbeat.pong(game_id, player_id)
+        try:
+            message_data = json.loads(message)
+        except json.JSONDecodeError:
+            logging.getLogger(LogConstants.APP_NAME).info(f"Ignoring a malformed message from player {player_id}.")
             return
-        if player_id not in [p.id for p in game.players]:
-            raise InvalidPlayerError("Can't join the game before the player is added to the game.")
-        await websocket.accept()
-        self.player_connections[game_id][player_id] = websocket
-        for p in game.players:
-            if p.id == player_id:
+        if isinstance(message_data, dict) and message_data.get("message_type") == "submit_guess":
+            meta = message_data.get("meta") or {}
+            task = asyncio.get_running_loop().create_task(
+                self.__submit_guess_from_websocket(game_id, meta.get("round_id"), player_id, meta.get("movie_name"))
+            )
+            self.guess_tasks.add(task)
+            task.add_done_callback(self.guess_tasks.discard)
+
+    async def __submit_guess_from_websocket(self, game_id: str, round_id: str, player_id: str, movie_name: str):
+        """
+        Submits a guess received over the websocket, replying with a `guess_error` message if it's not valid
+        Args:
+            game_id: Game ID
+            round_id: Round ID
+            player_id: Player ID
+            movie_name: Guessed movie name
+
+        Returns:
+            None
+        """
+        if not isinstance(movie_name, str):
+            error = "Invalid submission: The guess has no movie name."
+        else:
+            try:
+                await self.submit_guess(game_id, round_id, player_id, movie_name)
+                return
+            except (RoundNotExistsError, RoundNotStartedError, RoundAlreadyEndedError, RateLimitedError) as e:
+                error = str(e)
+        message_to_send = {
+            "status": "error",
+            "message": error,
+            "meta": {
+                "round_id": round_id
+            },
+            "message_type": "guess_error"
+        }
+        self.broadcaster.send(game_id, player_id, message_to_send)
+
+    def leave_game(self, game_id: str, player_id: str, websocket: WebSocket):
+        """
+        Removes the connection of a player whose websocket was closed, unless the player has reconnected since
+        Args:
+            game_id: Game ID
+            player_id: Player ID
+            websocket: Closed websocket connection
+
+        Returns:
+            None
+        """
+        connection = self.player_connections.get(game_id, {}).get(player_id)
+        if connection is not None and connection.websocket is websocket:
+            self.broadcaster.unregister(game_id, player_id, connection)
+
+    def __on_player_disconnected(self, game_id: str, player_id: str):
+        """
+        Stops waiting for the answer of a player who disconnected, and ends the round right away if the players
+        who are still connected have all answered
+        Args:
+            game_id: Game ID
+            player_id: Player ID
+
+        Returns:
+            None
+        """
+        self.__publish_players(game_id)
+        self.__stop_waiting_for(game_id, player_id)
+
+    def __stop_waiting_for(self, game_id: str, player_id: str):
+        """
+        Stops waiting for the answer of a player who disconnected from any worker, and ends the round right away
+        if the players who are still connected have all answered
+        Args:
+            game_id: Game ID
+            player_id: Player ID
+
+        Returns:
+            None
+        """
+        round_id = self.round_completion.left(game_id, player_id)
+        if round_id is not None and self.supervisor.is_connected(game_id):
+            self.__end_round_early(game_id, round_id)
+
+    def __end_round_early(self, game_id: str, round_id: str):
+        """
+        Sets the round end event of a round scheduled by this worker
+        Args:
+            game_id: Game ID
+            round_id: Round ID
+
+        Returns:
+            None
+        """
+        if round_end_event := self.game_events.get(game_id, {}).get(round_id):
+            # Setting the round end event makes the round scheduler end the round right away
+            round_end_event.set()
+
+    async def start_round(self, game_id: str):
+        """
+        Starts a new round by broadcasting a new emoji from the new round to all players and scheduling the end of
+        the round. If no new rounds are available, this method will end the game.
+        Args:
+            game_id: Game ID to start the round in.
+
+        Returns:
+            None
+        """
+        with self.tracer.span(game_id, "start_round") as span:
+            game = await self.__get_game(game_id)
+            current_round = game.start_next_round(datetime.now(self.tz))
+            if current_round is not None:
+                span["round_id"] = current_round.id
+                self.__update_game(game, documents.round_started(current_round.id, current_round.start_time))
+            if current_round is None:
+                await self.end_game(game_id)
+            else:
                 message_to_broadcast = {
                     "status": "success",
-                    "message": f"{p.handle} has joined the game.",
-                    "message_type": "player_join",
+                    "message": "Guess the movie",
                     "meta": {
-                        "new_player": {
-                            "id": p.id,
-                            "handle": p.handle,
-                            "avatar": p.avatar,
-                        },
-                        "existing_players": game.dict().get("players", [])
+                        "round_id": current_round.id,
+                        "emoji": current_round.emoji
                     },
+                    "message_type": "new_round"
                 }
+                round_ended_event = self.round_scheduler.schedule(
+                    game_id, current_round.id, current_round.start_time + game.round_duration
+                )
+                self.game_events[game_id] = {
+                    current_round.id: round_ended_event
+                }
+                self.round_completion.start(game_id, current_round.id, set(self.supervisor.connected_players(game_id)))
+                if self.supervisor.is_empty(game_id):
+                    self.__pause_rounds(game_id)
+                await self.__share_game(game)
                 await self.broadcast_to_all_players(game_id, message_to_broadcast)
-        # Wait until all players join the game!
-        if player_id == game.created_by:
-            while True:
-                await asyncio.sleep(1)
-                if game.user_count == len(self.player_connections[game_id].keys()):
-                    message_to_broadcast = {
-                        "status": "success",
-                        "message": "All players have joined the game, get ready to start guessing...",
-                        "message_type": "game_start"
-                    }
-                    await self.broadcast_to_all_players(game_id, message_to_broadcast)
-                    break
-            await self.start_round_if_everyone_joined(game_id, player_id)
 
-    async def start_round(self, game_id: str):
+    async def start_round_if_everyone_joined(self, game_id: str, player_id: str, force_start: bool = False):
         """
-        Starts a new round by broadcasting a new emoji from the new round to all players.
-        If no new rounds are available, this method will end the game.
+        Starts the first round of the game once every player has joined it, or right away if the game creator
+        forces the start. The game is started only once, even if this is called concurrently.
         Args:
-            game_id: Game ID to start the round in.
+            game_id: Game ID
+            player_id: ID of the player starting the game
+            force_start: Start the game without waiting for all the players to join
 
         Returns:
             None
         """
-        game = self.__get_game_from_db(game_id)
-        current_round = None
-        for r in game.rounds:
-            if r.start_time is None:
-                current_round = r
-                current_round.start_time = datetime.now(self.tz)
-                self.db_client.upsert_game(game.dict())
-                break
-        if current_round is None:
-            await self.end_game(game_id)
-        else:
+        game = await self.__get_game(game_id)
+        if game_id in self.started_games:
+            raise ActionNotPermittedError("The game has been started already.")
+        if game.has_started:
+            raise ActionNotPermittedError("The game has been started already.")
+        if game.created_by != player_id and force_start:
+            raise ActionNotPermittedError("Only game creators can force start the game!")
+        if not force_start and len(self.supervisor.connected_players(game_id)) != game.user_count:
+            return
+        self.started_games.add(game_id)
+        if not force_start:
             message_to_broadcast = {
                 "status": "success",
-                "message": "Guess the movie",
-                "meta": {
-                    "round_id": current_round.id,
-                    "emoji": current_round.emoji
-                },
-                "message_type": "new_round"
-            }
-            round_ended_event = asyncio.Event()
-            self.game_events[game_id] = {
-                current_round.id: round_ended_event
+                "message": "All players have joined the game, get ready to start guessing...",
+                "message_type": "game_start"
             }
             await self.broadcast_to_all_players(game_id, message_to_broadcast)
-            await self.handle_round(game_id, current_round.id)
-
-    async def start_round_if_everyone_joined(self, game_id: str, player_id: str, force_start: bool = False):
-        game = self.__get_game_from_db(game_id)
-        for r in game.rounds:
-            if r.start_time is not None:
-                raise ActionNotPermittedError("The game has been started already.")
-        if game.created_by == player_id and force_start:
-            await self.start_round(game_id=game_id)
-        elif game.created_by != player_id and force_start:
-            raise ActionNotPermittedError("Only game creators can force start the game!")
-        else:
-            current_game_connections = self.player_connections[game_id]
-            if len(current_game_connections.keys()) == game.user_count:
-                await self.start_round(game_id=game_id)
+        await self.start_round(game_id=game_id)
 
     async def submit_guess(self, game_id: str, round_id: str, player_id: str, movie_name: str):
         """
-        Submit the guessed movie name and populates the round results dictionary
+        Submit the guessed movie name and populates the round results dictionary. The result is sent straight to
+        the player's connection when it's held by this worker, and through the message bus otherwise.
+        Guesses over the rate limit of the player or of the game fail with a RateLimitedError.
         Args:
             game_id: Game ID
             round_id: Round ID
@@ -227,57 +728,98 @@ class GameManager:
         Returns:
             None
         """
-        game = self.__get_game_from_db(game_id)
-        movie_emoji_dict = []
-        for r in game.rounds[:(game.round_count + 1)]:
-            movie_emoji_dict.append({
-                "movie_name": r.movie_name,
-                "emoji": r.emoji
-            })
-        round_found_flag = False
-        for r in game.rounds:
-            if r.id == round_id:
-                round_found_flag = True
-                if r.start_time is None:
-                    raise RoundNotStartedError(
-                        "Invalid submission: The answer for the round you are trying to submit answer has not started"
-                        " yet"
-                    )
-                if r.end_time is not None:
-                    raise RoundAlreadyEndedError(
-                        "Invalid submission: The answer for the round you are trying to submit answer has already "
-                        "ended."
-                    )
-                is_guess_correct = self.gpt_client.check_if_right_guess(movie_emoji_dict, r.emoji, movie_name)
-                r.results[player_id] = is_guess_correct
-                player_socket = self.player_connections[game_id][player_id]
-                message_to_send = {
-                    "status": "success",
-                    "message": "Is guess correct?",
-                    "meta": {
-                        "player_id": player_id,
-                        "guess_result": is_guess_correct
-                    },
-                    "message_type": "guess_result"
-                }
-                await player_socket.send_json(message_to_send)
-                self.db_client.upsert_game(game.dict())
-                guessed_players = np.array(r.results.keys())
-                current_players = np.array(self.player_connections[game_id].keys())
-                if np.array_equal(guessed_players, current_players):
-                    if round_end_event := self.game_events.get(game_id, {}).get(round_id):
-                        # Setting the round end event which will be picked up by the handle_round function
-                        round_end_event.set()
-        if not round_found_flag:
-            raise RoundNotExistsError(
-                "Invalid submission: The answer was submitted for a round which doesn't exist."
+        with self.tracer.span(game_id, "submit_guess", round_id=round_id, player_id=player_id):
+            self.player_guess_limiter.acquire(player_id)
+            self.game_guess_limiter.acquire(game_id)
+            game = await self.__get_game(game_id)
+            r = game.get_round(round_id)
+            if (r is None or r.start_time is None) and self.message_bus.shared:
+                # The round may have been started by another worker since the game was cached
+                game = await self.__reload_game(game_id)
+                r = game.get_round(round_id)
+            if r is None:
+                raise RoundNotExistsError(
+                    "Invalid submission: The answer was submitted for a round which doesn't exist."
+                )
+            if r.start_time is None:
+                raise RoundNotStartedError(
+                    "Invalid submission: The answer for the round you are trying to submit answer has not started"
+                    " yet"
+                )
+            if r.end_time is not None:
+                raise RoundAlreadyEndedError(
+                    "Invalid submission: The answer for the round you are trying to submit answer has already "
+                    "ended."
+                )
+            is_guess_correct = await self.__check_guess(game, r, movie_name)
+            # The round or the game may have ended while the guess was being graded
+            if r.end_time is not None or game.results:
+                raise RoundAlreadyEndedError(
+                    "Invalid submission: The answer for the round you are trying to submit answer has already "
+                    "ended."
+                )
+            updates = documents.guess_recorded(r.id, player_id, is_guess_correct)
+            # The score only changes by the difference with the player's previous guess of the round
+            score_change = int(is_guess_correct) - int(r.results.get(player_id, False))
+            r.results[player_id] = is_guess_correct
+            if score_change and (player := game.get_player(player_id)) is not None:
+                player.score += score_change
+                updates.update(documents.player_scored(player.id, player.score))
+            message_to_send = {
+                "status": "success",
+                "message": "Is guess correct?",
+                "meta": {
+                    "player_id": player_id,
+                    "guess_result": is_guess_correct
+                },
+                "message_type": "guess_result"
+            }
+            if player_id in self.player_connections.get(game_id, {}):
+                self.broadcaster.send(game_id, player_id, message_to_send)
+            else:
+                await self.__publish(
+                    BusConstants.SEND, game_id, player_id, self.broadcaster.encode(message_to_send)
+                )
+            self.__update_game(game, updates)
+            await self.__share_game(game)
+            # The round is ended early by the worker which scheduled it, once every connected player answered
+            await self.__publish(BusConstants.ANSWERED, game_id, player_id, round_id)
+
+    async def __check_guess(self, game: Game, game_round: Round, movie_name: str) -> bool:
+        """
+        Grades the guess locally and only asks ChatGPT when the local grading isn't sure and the verdict for the
+        same guess isn't cached yet. Guesses ChatGPT couldn't check are considered wrong and are not cached.
+        Args:
+            game: Game object
+            game_round: Round the guess was submitted for
+            movie_name: Guessed movie name
+
+        Returns:
+            True if the guess is correct, False otherwise
+        """
+        with self.tracer.span(game.id, "check_guess", round_id=game_round.id, graded_by="matcher") as span:
+            verdict = self.answer_matcher.grade(game_round.movie_name, movie_name)
+            if verdict != Verdict.UNSURE:
+                return verdict == Verdict.CORRECT
+            span["graded_by"] = "verdict_cache"
+            cached_verdict = self.verdict_cache.get(game_round.movie_name, game_round.emoji, movie_name)
+            if cached_verdict is not None:
+                return cached_verdict
+            span["graded_by"] = "chatgpt"
+            is_guess_correct = await self.gpt_client.check_if_right_guess(
+                game.movie_emojis(), game_round.emoji, movie_name
             )
+            if is_guess_correct is None:
+                span["error"] = "timeout"
+                return False
+            self.verdict_cache.put(game_round.movie_name, game_round.emoji, movie_name, is_guess_correct)
+            return is_guess_correct
 
-    def end_round(self, game_id: str, current_round_id: str):
+    async def end_round(self, game_id: str, current_round_id: str):
         """
         Ends the game by setting the end_time attribute of the current round
         and by setting False as the guess for all the players who haven't yet made any guesses.
-        Then upserts the game object.
+        Then writes all the pending updates of the game to the db and sends the leaderboard to all the players.
         Args:
             game_id:
             current_round_id:
@@ -285,20 +827,53 @@ class GameManager:
         Returns:
             None
         """
-        game = self.__get_game_from_db(game_id)
-        for r in game.rounds:
-            if r.id == current_round_id:
+        with self.tracer.span(game_id, "end_round", round_id=current_round_id):
+            if self.message_bus.shared:
+                # The cached copy may miss guesses recorded by other workers, which would be overwritten below
+                game = await self.__reload_game(game_id)
+            else:
+                game = await self.__get_game(game_id)
+            self.round_completion.finish(game_id)
+            if (r := game.get_round(current_round_id)) is not None:
                 r.end_time = datetime.now(self.tz)
-                players_with_guesses = set(r.results.keys())
-                all_players = set([p.id for p in game.players])
-                players_without_guesses = list(all_players - players_with_guesses)
+                players_without_guesses = [p.id for p in game.players if p.id not in r.results]
                 for p in players_without_guesses:
                     r.results[p] = False
-        self.db_client.upsert_game(game.dict())
+                self.__update_game(
+                    game, documents.round_ended(r.id, r.end_time, {p: False for p in players_without_guesses})
+                )
+            await self.write_behind.flush(game_id)
+            await self.__share_game(game)
+            message_to_broadcast = {
+                "status": "success",
+                "message": "Leaderboard",
+                "meta": {
+                    "game_id": game.id,
+                    "round_id": current_round_id,
+                    "leaderboard": game.standings()
+                },
+                "message_type": "leaderboard"
+            }
+            await self.broadcast_to_all_players(game_id, message_to_broadcast)
+
+    async def get_leaderboard(self, game_id: str) -> bytes:
+        """
+        Gets the current standings of the game. The scores are kept up to date as guesses are recorded, and the
+        encoded standings are cached on the game until its next change.
+        Args:
+            game_id: Game ID
+
+        Returns:
+            Standings encoded as a JSON list, see Game.standings
+        """
+        game = await self.__get_game(game_id)
+        return game.leaderboard_bytes()
 
     async def broadcast_to_all_players(self, game_id: str, message: dict):
         """
-        Broadcasts given message to all the connected players
+        Broadcasts given message to all the connected players, on every worker. The message is encoded once,
+        published on the message bus and queued for every player by the worker holding its connection, so this
+        doesn't wait for slow connections.
         Args:
             game_id: Game ID
             message: Message to broadcast
@@ -306,17 +881,13 @@ class GameManager:
         Returns:
             None
         """
-        current_game_connections = self.player_connections[game_id]
-        for player_id, ws in current_game_connections.items():
-            try:
-                await ws.send_json(message)
-            except ConnectionClosedError:
-                del self.player_connections[game_id][player_id]
+        await self.__publish(BusConstants.BROADCAST, game_id, payload=self.broadcaster.encode(message))
 
-    async def handle_round(self, game_id: str, current_round_id: str):
+    async def advance_game(self, game_id: str, current_round_id: str):
         """
-        Goes into an infinite loop which will exit once the round duration finishes by ending the round.
-        In case the round is ended before the duration met, it will exit the infinite loop as well.
+        Moves the game to its next state once the current round is over, either because the round duration has
+        passed or because its round end event was set. Called by the round scheduler; ends the current round and
+        then starts the next one, which ends the game if there are no rounds left.
         Args:
             game_id: Game ID
             current_round_id: Current round ID
@@ -324,59 +895,118 @@ class GameManager:
         Returns:
             None
         """
-        game = self.__get_game_from_db(game_id)
-        current_round = None
-        for r in game.rounds:
-            if r.id == current_round_id:
-                current_round = r
-        while True:
-            await asyncio.sleep(1)
-            if current_round.start_time + game.round_duration <= datetime.now(self.tz):
-                break
-            if round_end_event := self.game_events.get(game_id, {}).get(current_round_id):
-                if round_end_event.is_set():
-                    break
-        self.end_round(game_id, current_round_id)
-        self.game_events.get(game_id, {}).pop(current_round_id)
+        await self.end_round(game_id, current_round_id)
+        self.game_events.get(game_id, {}).pop(current_round_id, None)
         await self.start_round(game_id)
 
     async def end_game(self, game_id: str):
         """
-        Ends the game and populates the scores for all the players in the game. The updates the game in the db
-        TODO: Also frees up the websocket list from self.player_connections[game_id] belonging to this game.
+        Ends the game and sets its results from the scores of the players, highest score first. Then updates the
+        game in the db and frees up the connections of the game.
         Args:
             game_id: Game ID
 
         Returns:
             None
         """
-        game = self.__get_game_from_db(game_id)
-        results = {}
-        for player in game.players:
-            results[player.id] = 0
-        rounds = game.rounds
-        for r in rounds:
-            for k, v in r.results.items():
-                if v:
-                    results[k] += 1
-        sorted_result = dict(sorted(results.items(), key=lambda x: x[1]))
-        game.results = sorted_result
-        message_to_broadcast = {
-            "status": "success",
-            "message": "Game ended",
-            "meta": {
-                "game_id": game.id,
-                "game_results": game.results
-            },
-            "message_type": "end_game"
+        with self.tracer.span(game_id, "end_game"):
+            game = await self.__get_game(game_id)
+            game.results = {standing["id"]: standing["score"] for standing in game.standings()}
+            message_to_broadcast = {
+                "status": "success",
+                "message": "Game ended",
+                "meta": {
+                    "game_id": game.id,
+                    "game_results": game.results
+                },
+                "message_type": "end_game"
+            }
+            await self.broadcast_to_all_players(game_id=game.id, message=message_to_broadcast)
+            self.__update_game(game, documents.game_results_set(game.results))
+            await self.write_behind.flush(game_id)
+            self.__forget_game(game_id)
+            await self.__publish(BusConstants.CLOSE_GAME, game_id)
+
+    def __pause_rounds(self, game_id: str):
+        """
+        Stops the round timer of a game nobody is connected to anymore, keeping the time left in the round
+        Args:
+            game_id: Game ID
+
+        Returns:
+            None
+        """
+        loop_time = asyncio.get_running_loop().time()
+        for round_id, timer in self.game_events.pop(game_id, {}).items():
+            if timer.fired:
+                continue
+            self.round_scheduler.cancel(game_id, round_id)
+            self.paused_rounds[game_id] = (round_id, max(timer.deadline - loop_time, 0))
+            logging.getLogger(LogConstants.APP_NAME).info(f"Paused round {round_id} of game {game_id}.")
+
+    def __resume_rounds(self, game_id: str):
+        """
+        Restarts the round timer of a paused game once a player is back, with the time which was left in the round
+        Args:
+            game_id: Game ID
+
+        Returns:
+            None
+        """
+        if (paused_round := self.paused_rounds.pop(game_id, None)) is None:
+            return
+        round_id, seconds_left = paused_round
+        self.game_events[game_id] = {
+            round_id: self.round_scheduler.schedule(
+                game_id, round_id, datetime.now(self.tz) + timedelta(seconds=seconds_left)
+            )
         }
-        await self.broadcast_to_all_players(game_id=game.id, message=message_to_broadcast)
-        self.db_client.upsert_game(game.dict())
-        self.player_connections.pop(game_id)
+        logging.getLogger(LogConstants.APP_NAME).info(f"Resumed round {round_id} of game {game_id}.")
+
+    async def __abandon_game(self, game_id: str):
+        """
+        Ends a game whose players all left during the game if its rounds run on this worker, and frees the
+        in-memory state of the game
+        Args:
+            game_id: Game ID
+
+        Returns:
+            None
+        """
+        game = self.games.get(game_id)
+        # A round whose timer already fired is being ended by advance_game
+        round_ids = [round_id for round_id, timer in self.game_events.get(game_id, {}).items() if not timer.fired]
+        if paused_round := self.paused_rounds.get(game_id):
+            round_ids.append(paused_round[0])
+        if game is not None and round_ids and not game.results:
+            for round_id in round_ids:
+                self.round_scheduler.cancel(game_id, round_id)
+                await self.end_round(game_id, round_id)
+            await self.end_game(game_id)
+            return
+        await self.write_behind.flush(game_id)
+        self.__forget_game(game_id)
+
+    def __forget_game(self, game_id: str):
+        """
+        Drops everything this worker keeps in memory for the game. A game which isn't over is loaded again from
+        the db the next time it's used.
+        Args:
+            game_id: Game ID
+
+        Returns:
+            None
+        """
+        for round_id in self.game_events.pop(game_id, {}):
+            self.round_scheduler.cancel(game_id, round_id)
+        self.paused_rounds.pop(game_id, None)
+        self.round_completion.finish(game_id)
+        self.games.evict(game_id)
+        self.started_games.discard(game_id)
 
     async def create_rounds(self, count: int) -> list[Round]:
         """
-        Creates the rounds by getting the movie name and emoji dictionary
+        Creates the rounds from the movie name and emoji dictionaries in the round pool
         Args:
             count: Number of rounds in the game
 
@@ -384,23 +1014,16 @@ class GameManager:
             List of rounds
         """
         rounds: list[Round] = []
-        while True:
-            await asyncio.sleep(1)
-            try:
-                emoji_movies_list = self.gpt_client.get_movie_names_in_emoji_repr(count)
-                break
-            except JSONDecodeError:
-                logging.getLogger(LogConstants.APP_NAME).warning("Improper json content from chatgpt! Retrying...")
-        for em in emoji_movies_list:
+        for em in self.round_pool.take(count):
             game_ground = Round(
                 id=uuid.uuid4().hex,
                 emoji=em.get(EntityNames.EMOJI),
                 movie_name=em.get(EntityNames.MOVIE_NAME),
             )
             rounds.append(game_ground)
-        return rounds[:count+1]
+        return rounds
 
-    def is_game_valid(self, game_id: str) -> Tuple[bool, Game | None]:
+    async def is_game_valid(self, game_id: str) -> Tuple[bool, Game | None]:
         """
         Checks if a game id is valid and returns a boolean value to indicate if the game id is valid along with
         the game's object if the game exists
@@ -410,13 +1033,13 @@ class GameManager:
         Returns:
             bool, Game | None
         """
-        game = self.__get_game_from_db(game_id)
+        game = await self.__get_game(game_id)
         if game.results:
             return False, game
         else:
             return True, game
 
-    def get_game_with_results(self, game_id: str) -> Game:
+    async def get_game_with_results(self, game_id: str) -> Game:
         """
         Gets games results and returns the game object.
         Args:
@@ -425,7 +1048,7 @@ class GameManager:
         Returns:
             Game
         """
-        game = self.__get_game_from_db(game_id)
+        game = await self.__get_game(game_id)
         if game.results:
             return game
         else:
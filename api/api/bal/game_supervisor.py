@@ -0,0 +1,217 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Iterable
+
+from api.bal.broadcaster import Broadcaster
+from api.constants import LogConstants, SupervisorConstants
+
+
+class GameSupervisor:
+    """
+    Single task which looks after the lifecycle of the games held in memory, every `interval` seconds.
+
+    A game is connected while one of its players is connected to any worker: every sweep, each worker publishes
+    the players it holds connections for by game, and remembers the players the other workers published. When the
+    last player of a game leaves, `on_empty` is called so that the game stops moving to its next rounds, and
+    `on_occupied` is called if a player comes back. A game which stays empty for `grace_seconds` is handed to
+    `on_abandoned` so that it can be ended and its state freed.
+
+    Attributes:
+        broadcaster: Broadcaster holding the player connections of this worker
+        worker_id: ID of this worker
+        interval: Seconds between two sweeps
+        grace_seconds: Seconds a game can stay empty before it's abandoned
+    """
+    def __init__(
+            self,
+            broadcaster: Broadcaster,
+            worker_id: str,
+            watched_games: Callable[[], Iterable[str]],
+            on_empty: Callable[[str], None],
+            on_occupied: Callable[[str], None],
+            on_abandoned: Callable[[str], Awaitable[None]],
+            publish_presence: Callable[[dict[str, list[str]]], Awaitable[None]],
+            interval: float = SupervisorConstants.SWEEP_INTERVAL_SECONDS,
+            grace_seconds: float = SupervisorConstants.ABANDON_AFTER_SECONDS,
+    ):
+        self.broadcaster = broadcaster
+        self.worker_id = worker_id
+        self.watched_games = watched_games
+        self.on_empty = on_empty
+        self.on_occupied = on_occupied
+        self.on_abandoned = on_abandoned
+        self.publish_presence = publish_presence
+        self.interval = interval
+        self.grace_seconds = grace_seconds
+        self.__empty_since: dict[str, float] = {}
+        # Player IDs by game ID by worker ID, and when each worker was last heard from
+        self.__remote_players: dict[str, dict[str, set[str]]] = {}
+        self.__remote_seen: dict[str, float] = {}
+        self.__runner: asyncio.Task | None = None
+
+    def start(self):
+        """
+        Starts the supervisor task unless it's already running
+
+        Returns:
+            None
+        """
+        if self.__runner is None or self.__runner.done():
+            self.__runner = asyncio.get_running_loop().create_task(self.__run())
+
+    async def close(self):
+        """
+        Stops the supervisor task
+
+        Returns:
+            None
+        """
+        if self.__runner is not None:
+            self.__runner.cancel()
+            try:
+                await self.__runner
+            except asyncio.CancelledError:
+                pass
+            self.__runner = None
+
+    def presence(self, worker_id: str, players: dict[str, Iterable[str]]):
+        """
+        Records all the players another worker holds connections for, replacing what it published before
+        Args:
+            worker_id: ID of the other worker
+            players: Player IDs by game ID
+
+        Returns:
+            None
+        """
+        self.__remote_players[worker_id] = {game_id: set(ids) for game_id, ids in players.items() if ids}
+        self.__remote_seen[worker_id] = time.monotonic()
+
+    def players_changed(self, worker_id: str, game_id: str, player_ids: Iterable[str]) -> tuple[set[str], set[str]]:
+        """
+        Records the players of a game another worker holds connections for, after one of them joined or left
+        Args:
+            worker_id: ID of the other worker
+            game_id: Game ID
+            player_ids: IDs of the players of the game connected to the other worker
+
+        Returns:
+            IDs of the players who joined and of the players who left the other worker
+        """
+        games = self.__remote_players.setdefault(worker_id, {})
+        before, after = games.pop(game_id, set()), set(player_ids)
+        if after:
+            games[game_id] = after
+        self.__remote_seen[worker_id] = time.monotonic()
+        return after - before, before - after
+
+    def connected_players(self, game_id: str) -> dict[str, str]:
+        """
+        Gets the players of the game connected to this worker, or to another worker at its last update
+        Args:
+            game_id: Game ID
+
+        Returns:
+            ID of the worker each player is connected to, by player ID
+        """
+        self.__forget_silent_workers()
+        players = {}
+        for worker_id, games in self.__remote_players.items():
+            for player_id in games.get(game_id, ()):
+                players[player_id] = worker_id
+        for player_id in self.broadcaster.connections.get(game_id, {}):
+            players[player_id] = self.worker_id
+        return players
+
+    def is_connected(self, game_id: str) -> bool:
+        """
+        Checks if a player of the game is connected to any worker
+        Args:
+            game_id: Game ID
+
+        Returns:
+            True if the game has a connected player
+        """
+        return bool(self.connected_players(game_id))
+
+    def joined(self, game_id: str):
+        """
+        Resumes an empty game right away when a player connects, instead of at the next sweep
+        Args:
+            game_id: Game ID
+
+        Returns:
+            None
+        """
+        if self.__empty_since.pop(game_id, None) is not None:
+            self.on_occupied(game_id)
+
+    def is_empty(self, game_id: str) -> bool:
+        """
+        Checks if the game was found without any connected player at the last sweep
+        Args:
+            game_id: Game ID
+
+        Returns:
+            True if the game is empty
+        """
+        return game_id in self.__empty_since
+
+    async def sweep(self) -> list[str]:
+        """
+        Publishes the players connected to this worker, then suspends, resumes or abandons the watched games
+
+        Returns:
+            IDs of the abandoned games
+        """
+        local_players = {
+            game_id: list(connections) for game_id, connections in self.broadcaster.connections.items() if connections
+        }
+        if local_players:
+            await self.publish_presence(local_players)
+        now = time.monotonic()
+        watched_games = set(self.watched_games())
+        for game_id in list(self.__empty_since):
+            if game_id not in watched_games:
+                del self.__empty_since[game_id]
+        abandoned = []
+        for game_id in watched_games:
+            if self.is_connected(game_id):
+                if self.__empty_since.pop(game_id, None) is not None:
+                    self.on_occupied(game_id)
+            elif game_id not in self.__empty_since:
+                self.__empty_since[game_id] = now
+                self.on_empty(game_id)
+            elif now - self.__empty_since[game_id] >= self.grace_seconds:
+                abandoned.append(game_id)
+        for game_id in abandoned:
+            del self.__empty_since[game_id]
+            logging.getLogger(LogConstants.APP_NAME).info(f"Game {game_id} was abandoned by its players.")
+            try:
+                await self.on_abandoned(game_id)
+            except Exception:
+                logging.getLogger(LogConstants.APP_NAME).exception(f"Failed to abandon game {game_id}")
+        return abandoned
+
+    def __forget_silent_workers(self):
+        """
+        Forgets the players of the workers which missed two sweeps, most likely because they were stopped
+
+        Returns:
+            None
+        """
+        now = time.monotonic()
+        for worker_id, last_seen in list(self.__remote_seen.items()):
+            if now - last_seen > 2 * self.interval:
+                del self.__remote_seen[worker_id]
+                self.__remote_players.pop(worker_id, None)
+
+    async def __run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sweep()
+            except Exception:
+                # Most likely the presence couldn't be published, the next sweep tries again
+                logging.getLogger(LogConstants.APP_NAME).exception("Failed to sweep the games")
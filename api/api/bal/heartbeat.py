@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import time
+
+from api.bal.broadcaster import Broadcaster
+from api.constants import LogConstants, HeartbeatConstants
+
+HEARTBEAT_MESSAGE = {
+    "status": "success",
+    "message": "heartbeat",
+    "message_type": "heartbeat"
+}
+
+
+class HeartbeatScheduler:
+    """
+    Single task which sends a heartbeat to every connected player each `interval` seconds. The heartbeat is
+    encoded once and queued like any other message. Players answer with a pong, and a player who has answered
+    before but misses `max_missed_pongs` heartbeats in a row is considered gone and disconnected. Players who
+    never answered are kept until their socket fails, so clients without pong support keep working.
+
+    Attributes:
+        broadcaster: Broadcaster holding the player connections
+        interval: Seconds between two heartbeats
+        max_missed_pongs: Number of heartbeats a player may leave unanswered
+    """
+    def __init__(
+            self,
+            broadcaster: Broadcaster,
+            interval: float = HeartbeatConstants.INTERVAL_SECONDS,
+            max_missed_pongs: int = HeartbeatConstants.MAX_MISSED_PONGS,
+    ):
+        self.broadcaster = broadcaster
+        self.interval = interval
+        self.max_missed_pongs = max_missed_pongs
+        self.payload = broadcaster.encode(HEARTBEAT_MESSAGE)
+        self.__runner: asyncio.Task | None = None
+
+    def start(self):
+        """
+        Starts the heartbeat task unless it's already running
+
+        Returns:
+            None
+        """
+        if self.__runner is None or self.__runner.done():
+            self.__runner = asyncio.get_running_loop().create_task(self.__run())
+
+    async def close(self):
+        """
+        Stops the heartbeat task
+
+        Returns:
+            None
+        """
+        if self.__runner is not None:
+            self.__runner.cancel()
+            try:
+                await self.__runner
+            except asyncio.CancelledError:
+                pass
+            self.__runner = None
+
+    def pong(self, game_id: str, player_id: str):
+        """
+        Records a pong from a player
+        Args:
+            game_id: Game ID
+            player_id: Player ID
+
+        Returns:
+            None
+        """
+        if connection := self.broadcaster.connections.get(game_id, {}).get(player_id):
+            connection.pong()
+
+    def beat(self) -> int:
+        """
+        Disconnects the players who stopped answering and sends the heartbeat to all the others
+        Returns:
+            Number of disconnected players
+        """
+        deadline = time.monotonic() - self.interval * self.max_missed_pongs
+        disconnected = 0
+        for game_id, game_connections in list(self.broadcaster.connections.items()):
+            for connection in list(game_connections.values()):
+                if connection.last_pong is not None and connection.last_pong < deadline:
+                    logging.getLogger(LogConstants.APP_NAME).info(
+                        f"Player {connection.player_id} of game {game_id} missed {self.max_missed_pongs} pongs."
+                    )
+                    self.broadcaster.disconnect(connection)
+                    disconnected += 1
+            self.broadcaster.broadcast_encoded(game_id, self.payload)
+        return disconnected
+
+    async def __run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            self.beat()
@@ -0,0 +1,100 @@
+class RoundCompletionTracker:
+    """
+    Keeps, for the current round of each game, the set of connected players who haven't answered yet, so that
+    the game manager knows in constant time when a round can end early. The set shrinks when a player answers
+    or disconnects and grows when a player who hasn't answered joins.
+    """
+    def __init__(self):
+        self.__rounds: dict[str, str] = {}
+        self.__pending: dict[str, set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.__rounds)
+
+    def start(self, game_id: str, round_id: str, player_ids: set[str]):
+        """
+        Starts tracking a new round of the game
+        Args:
+            game_id: Game ID
+            round_id: Round ID
+            player_ids: IDs of the connected players
+
+        Returns:
+            None
+        """
+        self.__rounds[game_id] = round_id
+        self.__pending[game_id] = set(player_ids)
+
+    def finish(self, game_id: str):
+        """
+        Stops tracking the round of the game
+        Args:
+            game_id: Game ID
+
+        Returns:
+            None
+        """
+        self.__rounds.pop(game_id, None)
+        self.__pending.pop(game_id, None)
+
+    def pending(self, game_id: str) -> set[str]:
+        """
+        Gets the connected players who haven't answered the current round yet
+        Args:
+            game_id: Game ID
+
+        Returns:
+            Set of player IDs
+        """
+        return set(self.__pending.get(game_id, ()))
+
+    def joined(self, game_id: str, round_id: str, player_id: str):
+        """
+        Adds a player who connected during the round and hasn't answered it
+        Args:
+            game_id: Game ID
+            round_id: Round ID
+            player_id: Player ID
+
+        Returns:
+            None
+        """
+        if self.__rounds.get(game_id) == round_id:
+            self.__pending[game_id].add(player_id)
+
+    def answered(self, game_id: str, round_id: str, player_id: str) -> bool:
+        """
+        Removes a player who answered the round
+        Args:
+            game_id: Game ID
+            round_id: Round ID
+            player_id: Player ID
+
+        Returns:
+            True if this was the last connected player to answer
+        """
+        if self.__rounds.get(game_id) != round_id:
+            return False
+        return self.__remove(game_id, player_id)
+
+    def left(self, game_id: str, player_id: str) -> str | None:
+        """
+        Removes a player who disconnected
+        Args:
+            game_id: Game ID
+            player_id: Player ID
+
+        Returns:
+            ID of the round if every remaining connected player has answered it, None otherwise
+        """
+        round_id = self.__rounds.get(game_id)
+        if round_id is not None and self.__remove(game_id, player_id):
+            return round_id
+        return None
+
+    def __remove(self, game_id: str, player_id: str) -> bool:
+        pending = self.__pending[game_id]
+        if player_id not in pending:
+            return False
+        pending.remove(player_id)
+        return not pending
@@ -0,0 +1,126 @@
+import asyncio
+import logging
+import random
+from collections import deque
+
+from api.constants import EntityNames, LogConstants, RoundPoolConstants
+from api.lib.chatgpt import AsyncChatGPTManager
+from api.lib.movies import emoji_movies
+
+
+class RoundPool:
+    """
+    Warm pool of emoji/movie pairs for new games. The pool is refilled from ChatGPT in the background whenever
+    it drops below `low_watermark`, and the built-in movie list is used when the pool runs dry, so taking
+    movies from the pool never waits on the network.
+
+    Attributes:
+        gpt_client: ChatGPT client used to refill the pool
+        target_size: Number of movies the refill aims for
+        low_watermark: Pool size below which a refill is started
+        batch_size: Number of movies requested from ChatGPT at a time
+    """
+    def __init__(
+            self,
+            gpt_client: AsyncChatGPTManager,
+            target_size: int = RoundPoolConstants.TARGET_SIZE,
+            low_watermark: int = RoundPoolConstants.LOW_WATERMARK,
+            batch_size: int = RoundPoolConstants.BATCH_SIZE,
+    ):
+        self.gpt_client = gpt_client
+        self.target_size = target_size
+        self.low_watermark = low_watermark
+        self.batch_size = batch_size
+        self.__movies: deque[dict[str:str]] = deque()
+        self.__refill_task: asyncio.Task | None = None
+
+    def __len__(self) -> int:
+        return len(self.__movies)
+
+    @staticmethod
+    def is_valid(movie: dict) -> bool:
+        """
+        Checks if a movie from ChatGPT can be used for a round
+        Args:
+            movie: Movie emoji dictionary
+
+        Returns:
+            True if both the emoji and the movie name are non-empty strings
+        """
+        emoji, movie_name = movie.get(EntityNames.EMOJI), movie.get(EntityNames.MOVIE_NAME)
+        return isinstance(emoji, str) and isinstance(movie_name, str) and bool(emoji.strip()) \
+            and bool(movie_name.strip())
+
+    def take(self, count: int) -> list[dict[str:str]]:
+        """
+        Takes movies for a game from the pool, topping them up from the built-in movie list if the pool doesn't
+        have enough. A movie name is used only once per game as long as there are enough different movies.
+        Args:
+            count: Number of movies
+
+        Returns:
+            List of movie emoji dictionary
+        """
+        movies = []
+        movie_names = set()
+
+        def add(movie: dict[str:str]):
+            if movie[EntityNames.MOVIE_NAME] not in movie_names:
+                movie_names.add(movie[EntityNames.MOVIE_NAME])
+                movies.append(movie)
+
+        while len(movies) < count and self.__movies:
+            add(self.__movies.popleft())
+        if len(movies) < count:
+            for movie in random.sample(emoji_movies, k=len(emoji_movies)):
+                add(movie)
+                if len(movies) == count:
+                    break
+        if len(movies) < count:
+            movies.extend(random.choices(emoji_movies, k=count - len(movies)))
+        if len(self.__movies) < self.low_watermark:
+            self.refill()
+        return movies
+
+    def refill(self):
+        """
+        Starts refilling the pool in the background unless a refill is already running
+
+        Returns:
+            None
+        """
+        if self.__refill_task is None or self.__refill_task.done():
+            self.__refill_task = asyncio.get_running_loop().create_task(self.__refill())
+
+    async def close(self):
+        """
+        Stops the running refill
+
+        Returns:
+            None
+        """
+        if self.__refill_task is not None:
+            self.__refill_task.cancel()
+            try:
+                await self.__refill_task
+            except asyncio.CancelledError:
+                pass
+            self.__refill_task = None
+
+    async def __refill(self):
+        while len(self.__movies) < self.target_size:
+            try:
+                movies = await self.gpt_client.get_movie_names_in_emoji_repr(self.batch_size)
+            except Exception as e:
+                logging.getLogger(LogConstants.APP_NAME).warning(f"Failed to refill the round pool: {e!r}")
+                return
+            pooled_movie_names = {m[EntityNames.MOVIE_NAME] for m in self.__movies}
+            new_movies = []
+            for movie in movies:
+                if self.is_valid(movie) and movie[EntityNames.MOVIE_NAME] not in pooled_movie_names:
+                    pooled_movie_names.add(movie[EntityNames.MOVIE_NAME])
+                    new_movies.append(movie)
+            if not new_movies:
+                logging.getLogger(LogConstants.APP_NAME).warning("Chatgpt returned no new movies for the pool.")
+                return
+            self.__movies.extend(new_movies)
@@ -0,0 +1,153 @@
+import asyncio
+import heapq
+import itertools
+import logging
+from datetime import datetime
+from typing import Awaitable, Callable
+
+import pytz
+
+from api.constants import LogConstants
+
+
+class RoundTimer(asyncio.Event):
+    """
+    Round end event which is also a deadline in the RoundScheduler. Setting the event ends the round right away,
+    otherwise the scheduler sets it once the deadline passes.
+
+    Attributes:
+        game_id: Game ID the round belongs to
+        round_id: Round ID
+        deadline: Event loop time at which the round ends
+    """
+    def __init__(self, scheduler: "RoundScheduler", game_id: str, round_id: str, deadline: float):
+        super().__init__()
+        self.game_id = game_id
+        self.round_id = round_id
+        self.deadline = deadline
+        self.fired = False
+        self.__scheduler = scheduler
+
+    def set(self):
+        super().set()
+        self.__scheduler.expire(self)
+
+
+class RoundScheduler:
+    """
+    Single timer heap for the round end deadlines of every game in the process.
+
+    One task sleeps until the earliest deadline, or until a round end event is set, and then calls
+    `on_round_end(game_id, round_id)` in its own task. Each round fires exactly once.
+    """
+    def __init__(self, on_round_end: Callable[[str, str], Awaitable[None]]):
+        self.on_round_end = on_round_end
+        self.tz = pytz.timezone('UTC')
+        self.__heap: list[tuple[float, int, RoundTimer]] = []
+        self.__timers: dict[tuple[str, str], RoundTimer] = {}
+        self.__expired: list[RoundTimer] = []
+        self.__sequence = itertools.count()
+        self.__wakeup = asyncio.Event()
+        self.__runner: asyncio.Task | None = None
+        self.__callbacks: set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self.__timers)
+
+    def schedule(self, game_id: str, round_id: str, end_time: datetime) -> RoundTimer:
+        """
+        Schedules the end of a round
+        Args:
+            game_id: Game ID
+            round_id: Round ID
+            end_time: Time at which the round has to end
+
+        Returns:
+            RoundTimer which ends the round early when set
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (end_time - datetime.now(self.tz)).total_seconds()
+        self.cancel(game_id, round_id)
+        timer = RoundTimer(self, game_id, round_id, deadline)
+        self.__timers[(game_id, round_id)] = timer
+        heapq.heappush(self.__heap, (deadline, next(self.__sequence), timer))
+        if self.__runner is None or self.__runner.done():
+            self.__runner = loop.create_task(self.__run())
+        self.__wakeup.set()
+        return timer
+
+    def cancel(self, game_id: str, round_id: str):
+        """
+        Cancels the scheduled end of a round without firing it
+        Args:
+            game_id: Game ID
+            round_id: Round ID
+
+        Returns:
+            None
+        """
+        if timer := self.__timers.pop((game_id, round_id), None):
+            # The heap entry is skipped lazily once it reaches the top
+            timer.fired = True
+
+    def expire(self, timer: RoundTimer):
+        """
+        Marks the round timer as due so that it fires without waiting for its deadline
+        Args:
+            timer: Round timer to fire
+
+        Returns:
+            None
+        """
+        if not timer.fired:
+            self.__expired.append(timer)
+            self.__wakeup.set()
+
+    async def close(self):
+        """
+        Stops the scheduler task. Pending rounds will not fire anymore.
+
+        Returns:
+            None
+        """
+        if self.__runner is not None:
+            self.__runner.cancel()
+            try:
+                await self.__runner
+            except asyncio.CancelledError:
+                pass
+            self.__runner = None
+
+    def __fire(self, timer: RoundTimer):
+        if timer.fired:
+            return
+        timer.fired = True
+        timer.set()
+        self.__timers.pop((timer.game_id, timer.round_id), None)
+        task = asyncio.get_running_loop().create_task(self.on_round_end(timer.game_id, timer.round_id))
+        self.__callbacks.add(task)
+        task.add_done_callback(self.__on_callback_done)
+
+    def __on_callback_done(self, task: asyncio.Task):
+        self.__callbacks.discard(task)
+        if not task.cancelled() and (error := task.exception()):
+            logging.getLogger(LogConstants.APP_NAME).error("Failed to end the round", exc_info=error)
+
+    async def __run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            self.__wakeup.clear()
+            while self.__expired:
+                self.__fire(self.__expired.pop())
+            now = loop.time()
+            while self.__heap and (self.__heap[0][2].fired or self.__heap[0][0] <= now):
+                _, _, timer = heapq.heappop(self.__heap)
+                self.__fire(timer)
+            timeout = self.__heap[0][0] - now if self.__heap else None
+            try:
+                await asyncio.wait_for(self.__wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            if asyncio.current_task().cancelling():
+                # wait_for drops a cancellation which arrives as the wakeup is set
+                raise asyncio.CancelledError()
@@ -0,0 +1,91 @@
+import asyncio
+import logging
+from typing import Any, Dict
+
+from api.constants import LogConstants, WriteBehindConstants
+from api.dal import documents
+from api.dal.database import Database
+from api.lib.metrics import DB_REQUEST_SECONDS
+
+
+class WriteBehindBuffer:
+    """
+    Write-behind buffer between the game manager and the database. Updates of a game are coalesced into one
+    pending update per game, and all the pending updates are written every `flush_interval` seconds, so the
+    number of writes grows with the number of games rather than with the number of guesses.
+
+    Attributes:
+        db_client: Database the updates are written to
+        flush_interval: Seconds between two flushes
+    """
+    def __init__(self, db_client: Database, flush_interval: float = WriteBehindConstants.FLUSH_INTERVAL_SECONDS):
+        self.db_client = db_client
+        self.flush_interval = flush_interval
+        self.__pending: dict[str, Dict[str, Any]] = {}
+        self.__flusher: asyncio.Task | None = None
+
+    def __len__(self) -> int:
+        return len(self.__pending)
+
+    def stage(self, game_id: str, updates: Dict[str, Any]):
+        """
+        Adds updates to the pending updates of the game
+        Args:
+            game_id: Game ID
+            updates: New values by field path
+
+        Returns:
+            None
+        """
+        documents.merge_updates(self.__pending.setdefault(game_id, {}), updates)
+        if self.__flusher is None or self.__flusher.done():
+            self.__flusher = asyncio.get_running_loop().create_task(self.__flush_periodically())
+
+    async def flush(self, game_id: str | None = None):
+        """
+        Writes the pending updates right away
+        Args:
+            game_id: Game ID to flush the updates of, all the games are flushed if not given
+
+        Returns:
+            None
+        """
+        game_ids = [game_id] if game_id is not None else list(self.__pending.keys())
+        error = None
+        for pending_game_id in game_ids:
+            if updates := self.__pending.pop(pending_game_id, None):
+                try:
+                    with DB_REQUEST_SECONDS.time("update_game"):
+                        await self.db_client.update_game(pending_game_id, updates)
+                except Exception as e:
+                    # Keep the updates, and the ones staged in the meantime, for the next flush
+                    self.__pending[pending_game_id] = documents.merge_updates(
+                        updates, self.__pending.get(pending_game_id, {})
+                    )
+                    error = error or e
+        if error is not None:
+            raise error
+
+    async def close(self):
+        """
+        Stops the periodic flush and writes everything which is still pending
+
+        Returns:
+            None
+        """
+        if self.__flusher is not None:
+            self.__flusher.cancel()
+            try:
+                await self.__flusher
+            except asyncio.CancelledError:
+                pass
+            self.__flusher = None
+        await self.flush()
+
+    async def __flush_periodically(self):
+        while self.__pending:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logging.getLogger(LogConstants.APP_NAME).error(f"Failed to write the pending game updates: {e!r}")
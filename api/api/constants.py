@@ -10,7 +10,104 @@ class EntityNames:
 
 class ENVConstants:
     OPENAI_API_KEY = "OPENAI_API_KEY"
+    DATABASE_BACKEND = "DATABASE_BACKEND"
+    SQLITE_PATH = "SQLITE_PATH"
+    MESSAGE_BUS_URL = "MESSAGE_BUS_URL"
+    PROFILING_ENABLED = "PROFILING_ENABLED"
+    TIMELINE_ENABLED = "TIMELINE_ENABLED"
+    GUESS_RATE_PER_PLAYER = "GUESS_RATE_PER_PLAYER"
+    GUESS_BURST_PER_PLAYER = "GUESS_BURST_PER_PLAYER"
+    GUESS_RATE_PER_GAME = "GUESS_RATE_PER_GAME"
+    GUESS_BURST_PER_GAME = "GUESS_BURST_PER_GAME"
+    CREATE_GAME_MAX_CONCURRENCY = "CREATE_GAME_MAX_CONCURRENCY"
+    CREATE_GAME_MAX_QUEUE = "CREATE_GAME_MAX_QUEUE"
+    CREATE_GAME_QUEUE_TIMEOUT = "CREATE_GAME_QUEUE_TIMEOUT"
+    HEARTBEAT_INTERVAL_SECONDS = "HEARTBEAT_INTERVAL_SECONDS"
+    HEARTBEAT_MAX_MISSED_PONGS = "HEARTBEAT_MAX_MISSED_PONGS"
+
+
+class DatabaseBackends:
+    FIRESTORE = "firestore"
+    SQLITE = "sqlite"
+    DEFAULT_SQLITE_PATH = "filmemo.db"
+
+
+class LLMConstants:
+    MAX_CONCURRENT_REQUESTS = 16
+    REQUEST_TIMEOUT_SECONDS = 15
+    CONNECTION_POOL_SIZE = 32
+    VERDICT_CACHE_SIZE = 10000
+    VERDICT_CACHE_TTL_SECONDS = 24 * 60 * 60
+    MAX_MOVIES_PER_PROMPT = 60
+
+
+class WriteBehindConstants:
+    FLUSH_INTERVAL_SECONDS = 0.5
+
+
+class RoundPoolConstants:
+    TARGET_SIZE = 100
+    LOW_WATERMARK = 30
+    BATCH_SIZE = 20
+
+
+class MatcherConstants:
+    ACCEPT_THRESHOLD = 0.85
+    REJECT_THRESHOLD = 0.3
 
 
 class LogConstants:
     APP_NAME = "filmemo"
+
+
+class BroadcastConstants:
+    SEND_QUEUE_SIZE = 64
+
+
+class HeartbeatConstants:
+    INTERVAL_SECONDS = 5
+    MAX_MISSED_PONGS = 3
+
+
+class BusConstants:
+    CHANNEL = "filmemo:games"
+    BROADCAST = "broadcast"
+    SEND = "send"
+    ANSWERED = "answered"
+    CLOSE_GAME = "close_game"
+    PRESENCE = "presence"
+    PLAYERS = "players"
+    GAME_CHANGED = "game_changed"
+    NO_TARGET = "-"
+
+
+class MetricsConstants:
+    LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class TracingConstants:
+    MAX_GAMES = 1000
+    MAX_SPANS = 500
+
+
+class ProfilingConstants:
+    SAMPLE_INTERVAL_SECONDS = 0.005
+    DEFAULT_SECONDS = 5
+    MAX_SECONDS = 60
+    TOP_FUNCTIONS = 40
+
+
+class SupervisorConstants:
+    SWEEP_INTERVAL_SECONDS = 5
+    ABANDON_AFTER_SECONDS = 120
+
+
+class RateLimitConstants:
+    GUESS_RATE_PER_PLAYER = 2
+    GUESS_BURST_PER_PLAYER = 5
+    GUESS_RATE_PER_GAME = 20
+    GUESS_BURST_PER_GAME = 40
+    CREATE_GAME_MAX_CONCURRENCY = 8
+    CREATE_GAME_MAX_QUEUE = 32
+    CREATE_GAME_QUEUE_TIMEOUT = 5
+    MAX_TRACKED_KEYS = 100000
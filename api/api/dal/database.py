@@ -1,15 +1,17 @@
-from typing import Protocol, Dict
+from typing import Protocol, Dict, Any
 
 
 class Database(Protocol):
     """
-    Database interface to be implemented by all database stores.
+    Async database interface to be implemented by all database stores.
 
     Methods:
         get_game(game_id: str) -> Game: Get a game by ID.
         upsert_game(game: Dict) -> Game: Upsert a game.
+        update_game(game_id: str, updates: Dict[str, Any]) -> None: Update some fields of a game.
+        add_player(game_id: str, player: Dict, max_players: int) -> bool: Add a player unless the game is full.
     """
-    def get_game(self, game_id: str) -> Dict:
+    async def get_game(self, game_id: str) -> Dict:
         """
         Gets the game with the given ID.
         Args:
@@ -20,7 +22,7 @@ class Database(Protocol):
         """
         ...
 
-    def upsert_game(self, game: Dict) -> Dict:
+    async def upsert_game(self, game: Dict) -> Dict:
         """
         Creates or updates a game object in the database
         Args:
@@ -30,3 +32,30 @@ class Database(Protocol):
             Game: The upserted game object
         """
         ...
+
+    async def update_game(self, game_id: str, updates: Dict[str, Any]) -> None:
+        """
+        Updates only the given fields of an existing game. See api.dal.documents for the field paths.
+        Args:
+            game_id: ID of the game
+            updates: New values by dotted field path, e.g. `rounds.<round_id>.results.<player_id>`
+
+        Returns:
+            None
+        """
+        ...
+
+    async def add_player(self, game_id: str, player: Dict, max_players: int) -> bool:
+        """
+        Adds a player after the players of an existing game, unless the game already has `max_players` players.
+        The check and the write are atomic, so that players added by several workers at once are neither given
+        the same position nor let past the limit.
+        Args:
+            game_id: ID of the game
+            player: Player dictionary
+            max_players: Maximum number of players of the game
+
+        Returns:
+            True if the player was added, False if the game is full
+        """
+        ...
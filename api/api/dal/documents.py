@@ -0,0 +1,200 @@
+import copy
+from datetime import datetime
+from typing import Any, Dict
+
+from api.constants import EntityNames
+
+ORDER = "order"
+START_TIME = "start_time"
+END_TIME = "end_time"
+SCORE = "score"
+LIST_FIELDS = (EntityNames.ROUNDS, EntityNames.PLAYERS)
+
+
+def field_path(*parts: str) -> str:
+    """
+    Joins the parts of a field path
+    Args:
+        *parts: Field names and IDs
+
+    Returns:
+        Dotted field path
+    """
+    return ".".join(parts)
+
+
+def to_document(game: Dict) -> Dict:
+    """
+    Converts a game dictionary into the stored document layout. Rounds and players are stored as maps keyed by
+    their ID, with an `order` field to keep the list order, so that a single round, round result or player can be
+    updated by a dotted field path such as `rounds.<round_id>.results.<player_id>`.
+    Args:
+        game: Game dictionary, as returned by Game.dict()
+
+    Returns:
+        Game document
+    """
+    document = dict(game)
+    for field in LIST_FIELDS:
+        if isinstance(items := document.get(field), list):
+            document[field] = {item[EntityNames.ID]: {**item, ORDER: i} for i, item in enumerate(items)}
+    return document
+
+
+def has_list_layout(document: Dict) -> bool:
+    """
+    Checks if the document was stored before rounds and players were keyed by their ID. Such documents must be
+    written again with to_document before any update, as dotted field paths can't address list items.
+    Args:
+        document: Game document
+
+    Returns:
+        True if the rounds or players of the document are lists
+    """
+    return any(isinstance(document.get(field), list) for field in LIST_FIELDS)
+
+
+def from_document(document: Dict) -> Dict:
+    """
+    Converts a stored game document back into a game dictionary. Documents stored with rounds and players as
+    lists are returned as they are.
+    Args:
+        document: Game document
+
+    Returns:
+        Game dictionary
+    """
+    game = dict(document)
+    for field in LIST_FIELDS:
+        if isinstance(items := game.get(field), dict):
+            ordered_items = sorted(items.values(), key=lambda item: item.get(ORDER, 0))
+            game[field] = [{k: v for k, v in item.items() if k != ORDER} for item in ordered_items]
+    return game
+
+
+def apply_updates(document: Dict, updates: Dict[str, Any]) -> Dict:
+    """
+    Applies targeted updates to a game document in place, creating the intermediate maps when needed
+    Args:
+        document: Game document
+        updates: New values by dotted field path
+
+    Returns:
+        The updated document
+    """
+    for path, value in updates.items():
+        *parents, name = path.split(".")
+        target = document
+        for parent in parents:
+            target = target.setdefault(parent, {})
+        target[name] = value
+    return document
+
+
+def merge_updates(pending: Dict[str, Any], updates: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Merges updates into pending updates in place, so that applying the merged updates once has the same effect
+    as applying both in order. A pending update of a parent field absorbs the new update of a nested field, and
+    a new update of a parent field replaces the pending updates of its nested fields.
+    Args:
+        pending: Pending updates by field path
+        updates: Newer updates by field path
+
+    Returns:
+        The merged pending updates
+    """
+    for path, value in updates.items():
+        parts = path.split(".")
+        parent_path = next(
+            (p for p in (field_path(*parts[:i]) for i in range(1, len(parts))) if p in pending), None
+        )
+        if parent_path is not None and isinstance(pending[parent_path], dict):
+            nested_path = path[len(parent_path) + 1:]
+            pending[parent_path] = apply_updates(copy.deepcopy(pending[parent_path]), {nested_path: value})
+            continue
+        for nested_path in [p for p in pending if p.startswith(path + ".")]:
+            del pending[nested_path]
+        pending[path] = value
+    return pending
+
+
+def player_added(player: Dict, index: int) -> Dict[str, Any]:
+    """
+    Update which adds a player to the game
+    Args:
+        player: Player dictionary
+        index: Position of the player in the game's players
+
+    Returns:
+        Updates by field path
+    """
+    return {field_path(EntityNames.PLAYERS, player[EntityNames.ID]): {**player, ORDER: index}}
+
+
+def round_started(round_id: str, start_time: datetime) -> Dict[str, Any]:
+    """
+    Update which sets the start time of a round
+    Args:
+        round_id: Round ID
+        start_time: Start time of the round
+
+    Returns:
+        Updates by field path
+    """
+    return {field_path(EntityNames.ROUNDS, round_id, START_TIME): start_time}
+
+
+def guess_recorded(round_id: str, player_id: str, is_guess_correct: bool) -> Dict[str, Any]:
+    """
+    Update which records the result of a player's guess in a round
+    Args:
+        round_id: Round ID
+        player_id: Player ID
+        is_guess_correct: Result of the guess
+
+    Returns:
+        Updates by field path
+    """
+    return {field_path(EntityNames.ROUNDS, round_id, EntityNames.RESULTS, player_id): is_guess_correct}
+
+
+def player_scored(player_id: str, score: int) -> Dict[str, Any]:
+    """
+    Update which sets the score of a player
+    Args:
+        player_id: Player ID
+        score: New score of the player
+
+    Returns:
+        Updates by field path
+    """
+    return {field_path(EntityNames.PLAYERS, player_id, SCORE): score}
+
+
+def round_ended(round_id: str, end_time: datetime, missing_results: Dict[str, bool]) -> Dict[str, Any]:
+    """
+    Update which ends a round and records the results of the players who didn't guess
+    Args:
+        round_id: Round ID
+        end_time: End time of the round
+        missing_results: Results of the players who didn't guess, by player ID
+
+    Returns:
+        Updates by field path
+    """
+    updates = {field_path(EntityNames.ROUNDS, round_id, END_TIME): end_time}
+    for player_id, result in missing_results.items():
+        updates.update(guess_recorded(round_id, player_id, result))
+    return updates
+
+
+def game_results_set(results: Dict[str, int]) -> Dict[str, Any]:
+    """
+    Update which sets the final results of the game
+    Args:
+        results: Scores by player ID
+
+    Returns:
+        Updates by field path
+    """
+    return {EntityNames.RESULTS: results}
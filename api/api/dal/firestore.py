@@ -1,36 +1,42 @@
-from typing import Dict
+from typing import Dict, Any
 
 from google.cloud import firestore
 
 from api.constants import EntityNames
 from api.dal.database import Database
-from api.models.game import Game
+from api.dal.documents import to_document, from_document, has_list_layout, player_added
 
 
-class Firestore(Database):
+class AsyncFirestore(Database):
     """
-    Firestore Database store which is the implementation of the interface Database
+    Firestore Database store which is the implementation of the interface Database, on the async Firestore client
 
     """
     def __init__(self):
-        self.client = firestore.Client()
+        self.client = firestore.AsyncClient()
 
-    def get_game(self, game_id: str) -> Dict:
+    async def get_game(self, game_id: str) -> Dict:
         """
-        Gets the game from the firestore document collection for the given game id
+        Gets the game from the firestore document collection for the given game id. Documents with rounds and
+        players stored as lists are rewritten in the current layout first.
         Args:
             game_id: ID of the game.
 
         Returns:
             Game: Game object retrieved from the database
         """
-        game_ref = self.client.collection(EntityNames.GAMES).document(game_id).get()
-        if game_ref.exists:
-            return game_ref.to_dict()
-        else:
+        document_ref = self.client.collection(EntityNames.GAMES).document(game_id)
+        game_ref = await document_ref.get()
+        if not game_ref.exists:
             return {}
+        document = game_ref.to_dict()
+        if has_list_layout(document):
+            # Games stored before rounds and players were keyed by ID are migrated before they are updated
+            document = to_document(document)
+            await document_ref.set(document)
+        return from_document(document)
 
-    def upsert_game(self, game: Dict) -> Dict:
+    async def upsert_game(self, game: Dict) -> Dict:
         """
         Upserts the game object with merge enabled
         Args:
@@ -39,5 +45,41 @@ class Firestore(Database):
         Returns:
             Game: Upserted Game object
         """
-        self.client.collection(EntityNames.GAMES).document(game.get("id")).set(game, merge=True)
+        await self.client.collection(EntityNames.GAMES).document(game.get("id")).set(to_document(game), merge=True)
         return game
+
+    async def update_game(self, game_id: str, updates: Dict[str, Any]) -> None:
+        """
+        Updates only the given fields of the game document
+        Args:
+            game_id: ID of the game
+            updates: New values by dotted field path
+
+        Returns:
+            None
+        """
+        await self.client.collection(EntityNames.GAMES).document(game_id).update(updates)
+
+    async def add_player(self, game_id: str, player: Dict, max_players: int) -> bool:
+        """
+        Adds the player in a transaction which counts the players of the game first
+        Args:
+            game_id: ID of the game
+            player: Player dictionary
+            max_players: Maximum number of players of the game
+
+        Returns:
+            True if the player was added, False if the game is full
+        """
+        document_ref = self.client.collection(EntityNames.GAMES).document(game_id)
+
+        @firestore.async_transactional
+        async def add(transaction) -> bool:
+            game_ref = await document_ref.get(transaction=transaction)
+            players = (game_ref.to_dict() or {}).get(EntityNames.PLAYERS) or {}
+            if len(players) >= max_players:
+                return False
+            transaction.update(document_ref, player_added(player, len(players)))
+            return True
+
+        return await add(self.client.transaction())
@@ -0,0 +1,113 @@
+import sqlite3
+from typing import Dict, Any
+
+from api.constants import EntityNames
+from api.dal.database import Database
+from api.dal.documents import to_document, from_document, apply_updates, player_added
+from api.lib import serialization
+
+CREATE_GAMES_TABLE = "CREATE TABLE IF NOT EXISTS games (id TEXT PRIMARY KEY, document TEXT NOT NULL) WITHOUT ROWID"
+SELECT_GAME = "SELECT document FROM games WHERE id = ?"
+UPSERT_GAME = "INSERT INTO games (id, document) VALUES (?, ?) " \
+              "ON CONFLICT (id) DO UPDATE SET document = excluded.document"
+UPDATE_GAME = "UPDATE games SET document = ? WHERE id = ?"
+
+
+def encode_document(document: Dict) -> str:
+    """
+    Encodes a game document as compact JSON, with datetimes in ISO 8601 format
+    Args:
+        document: Game document
+
+    Returns:
+        JSON text
+    """
+    return serialization.dumps(document).decode()
+
+
+class SQLiteDatabase(Database):
+    """
+    Embedded SQLite Database store for single node deployments, local development and benchmarks.
+
+    Each game is one row holding its document as compact JSON, looked up by the game ID primary key. The database
+    runs in WAL mode so reads don't block on writes, and the statements are compiled once and reused from the
+    connection's statement cache. SQLite calls are made on the event loop thread as they take microseconds.
+    """
+    def __init__(self, path: str = ":memory:"):
+        self.connection = sqlite3.connect(path, check_same_thread=False, cached_statements=16)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        with self.connection:
+            self.connection.execute(CREATE_GAMES_TABLE)
+
+    async def get_game(self, game_id: str) -> Dict:
+        """
+        Gets the game with the given ID
+        Args:
+            game_id: ID of the game.
+
+        Returns:
+            Game dictionary, empty if the game doesn't exist
+        """
+        if row := self.connection.execute(SELECT_GAME, (game_id,)).fetchone():
+            return from_document(serialization.loads(row[0]))
+        return {}
+
+    async def upsert_game(self, game: Dict) -> Dict:
+        """
+        Creates or replaces the game
+        Args:
+            game: Game object which is to be upserted
+
+        Returns:
+            Game: Upserted Game object
+        """
+        with self.connection:
+            self.connection.execute(UPSERT_GAME, (game.get(EntityNames.ID), encode_document(to_document(game))))
+        return game
+
+    async def update_game(self, game_id: str, updates: Dict[str, Any]) -> None:
+        """
+        Updates only the given fields of the game document
+        Args:
+            game_id: ID of the game
+            updates: New values by dotted field path
+
+        Returns:
+            None
+        """
+        with self.connection:
+            if row := self.connection.execute(SELECT_GAME, (game_id,)).fetchone():
+                document = apply_updates(serialization.loads(row[0]), updates)
+                self.connection.execute(UPDATE_GAME, (encode_document(document), game_id))
+
+    async def add_player(self, game_id: str, player: Dict, max_players: int) -> bool:
+        """
+        Adds the player after counting the players of the game, in one transaction
+        Args:
+            game_id: ID of the game
+            player: Player dictionary
+            max_players: Maximum number of players of the game
+
+        Returns:
+            True if the player was added, False if the game is full
+        """
+        with self.connection:
+            if row := self.connection.execute(SELECT_GAME, (game_id,)).fetchone():
+                document = serialization.loads(row[0])
+                players = document.get(EntityNames.PLAYERS) or {}
+                if len(players) >= max_players:
+                    return False
+                apply_updates(document, player_added(player, len(players)))
+                self.connection.execute(UPDATE_GAME, (encode_document(document), game_id))
+                return True
+        return False
+
+    def close(self):
+        """
+        Closes the database connection
+
+        Returns:
+            None
+        """
+        self.connection.close()
@@ -0,0 +1,2 @@
+class MessageBusError(Exception):
+    """Raise when the message bus server replies with an error"""
@@ -0,0 +1,2 @@
+class ProfilerBusyError(Exception):
+    """Raise when a profile is requested while another one is running"""
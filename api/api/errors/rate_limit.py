@@ -0,0 +1,9 @@
+class RateLimitedError(Exception):
+    """Raise when a player or a game sends requests faster than its rate limit"""
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ServerBusyError(Exception):
+    """Raise when a request can't be admitted because the worker is already at capacity"""
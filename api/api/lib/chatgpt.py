@@ -1,10 +1,15 @@
+import asyncio
 import json
+import logging
 import random
+from collections import deque
 
+import aiohttp
 import openai
 
-from api.constants import ENVConstants
+from api.constants import ENVConstants, LLMConstants, LogConstants, EntityNames
 from api.lib.config import get_env
+from api.lib.metrics import LLM_REQUEST_SECONDS
 from api.lib.movies import emoji_movies
 
 
@@ -39,6 +44,30 @@ Please note that the answer can considered right if the guess is a slight variat
         Returns:
 
         """
+        response = openai.ChatCompletion.create(
+            model=self.model,
+            messages=self._get_movie_names_messages(count),
+        )
+        return self._parse_movie_names(response, count)
+
+    def check_if_right_guess(self, movie_list: list[dict[str:str]], emoji: str, guessed_name: str) -> bool:
+        """
+        Checks if the given movie name is a correct guess for the given emoji form the movie list.
+        Args:
+            movie_list: List of movie name and emoji dictionary
+            emoji: Emoji for against which the movie name guess has to be checked
+            guessed_name: Guessed movie name from the emoji
+
+        Returns:
+            Boolean value; True if correct guess, False otherwise
+        """
+        response = openai.ChatCompletion.create(
+            model=self.model,
+            messages=self._check_guess_messages(movie_list, emoji, guessed_name),
+        )
+        return self._parse_guess_check(response)
+
+    def _get_movie_names_messages(self, count: int) -> list[dict[str:str]]:
         prompt = {
             "role": "system",
             "content": self.game_helper_content
@@ -47,14 +76,13 @@ Please note that the answer can considered right if the guess is a slight variat
             "role": "user",
             "content": str(count)
         }
-        messages = [
+        return [
             prompt,
             movie_emojis_message
         ]
-        response = openai.ChatCompletion.create(
-            model=self.model,
-            messages=messages,
-        )
+
+    @staticmethod
+    def _parse_movie_names(response, count: int) -> list[dict[str:str]]:
         if choices := response.choices:
             content = choices[0].message.content
             content = content.strip()
@@ -70,22 +98,12 @@ Please note that the answer can considered right if the guess is a slight variat
                     "movie_name": item[emoji]
                 }
                 movies.append(movie)
-            print(movies)
             return movies
         else:
             return random.choices(emoji_movies, k=count)
 
-    def check_if_right_guess(self, movie_list: list[dict[str:str]], emoji: str, guessed_name: str) -> bool:
-        """
-        Checks if the given movie name is a correct guess for the given emoji form the movie list.
-        Args:
-            movie_list: List of movie name and emoji dictionary
-            emoji: Emoji for against which the movie name guess has to be checked
-            guessed_name: Guessed movie name from the emoji
-
-        Returns:
-            Boolean value; True if correct guess, False otherwise
-        """
+    def _check_guess_messages(self, movie_list: list[dict[str:str]], emoji: str,
+                              guessed_name: str) -> list[dict[str:str]]:
         prompt = {
             "role": "system",
             "content": self.result_helper_content
@@ -96,14 +114,13 @@ Please note that the answer can considered right if the guess is a slight variat
             "role": "user",
             "content": question
         }
-        messages = [
+        return [
             prompt,
             question_message
         ]
-        response = openai.ChatCompletion.create(
-            model=self.model,
-            messages=messages,
-        )
+
+    @staticmethod
+    def _parse_guess_check(response) -> bool:
         if choices := response.choices:
             message_content = choices[0].message
             message = message_content.content
@@ -112,3 +129,180 @@ Please note that the answer can considered right if the guess is a slight variat
                 return True
             else:
                 return False
+
+
+class AsyncChatGPTManager(ChatGPTManager):
+    """
+    ChatGPTManager which doesn't block the event loop. All the requests share one pooled aiohttp session,
+    at most `max_concurrency` requests are in flight at a time and each request gives up after `timeout` seconds,
+    including the time spent waiting for its turn.
+
+    Movie generation is single-flight: one prompt is in flight at a time, and the requests made meanwhile are
+    merged into the next prompt, for up to `max_movies_per_prompt` movies, whose answer is split among them.
+    """
+    def __init__(
+            self,
+            max_concurrency: int = LLMConstants.MAX_CONCURRENT_REQUESTS,
+            timeout: float = LLMConstants.REQUEST_TIMEOUT_SECONDS,
+            pool_size: int = LLMConstants.CONNECTION_POOL_SIZE,
+            max_movies_per_prompt: int = LLMConstants.MAX_MOVIES_PER_PROMPT,
+    ):
+        super().__init__()
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.max_movies_per_prompt = max_movies_per_prompt
+        self.__semaphore = asyncio.Semaphore(max_concurrency)
+        self.__session: aiohttp.ClientSession | None = None
+        self.__movie_requests: deque[tuple[int, asyncio.Future]] = deque()
+        self.__movie_generator: asyncio.Task | None = None
+
+    async def get_movie_names_in_emoji_repr(self, count=10) -> list[dict[str:str]]:
+        """
+        Gets the list of movie emoji dictionary in the required format, without duplicate movie names as long as
+        there are enough different movies. Concurrent requests share the same prompt, and the built-in movie list
+        makes up for the movies ChatGPT didn't give, e.g. when it doesn't answer in time.
+        Args:
+            count: Number of movies
+
+        Returns:
+            List of movie emoji dictionary
+        """
+        future = asyncio.get_running_loop().create_future()
+        self.__movie_requests.append((count, future))
+        if self.__movie_generator is None or self.__movie_generator.done():
+            self.__movie_generator = asyncio.get_running_loop().create_task(self.__generate_movies())
+        return await future
+
+    @staticmethod
+    def split_movies(movies: list[dict[str:str]], counts: list[int]) -> list[list[dict[str:str]]]:
+        """
+        Splits generated movies among several requests. Every movie name is given once, and a request is topped
+        up from the built-in movie list if there aren't enough generated movies.
+        Args:
+            movies: Movie emoji dictionaries from ChatGPT
+            counts: Number of movies of each request
+
+        Returns:
+            List of movie emoji dictionary for each request
+        """
+        unique_movies = {}
+        for movie in movies:
+            emoji, movie_name = movie.get(EntityNames.EMOJI), movie.get(EntityNames.MOVIE_NAME)
+            if isinstance(emoji, str) and isinstance(movie_name, str) and emoji.strip() and movie_name.strip():
+                unique_movies.setdefault(movie_name, movie)
+        generated = iter(unique_movies.values())
+        splits = []
+        for count in counts:
+            split = [movie for _, movie in zip(range(count), generated)]
+            if len(split) < count:
+                # The built-in list has several emoji for some movies, so the names are added while topping up
+                movie_names = {movie[EntityNames.MOVIE_NAME] for movie in split}
+                for movie in random.sample(emoji_movies, k=len(emoji_movies)):
+                    if len(split) == count:
+                        break
+                    if movie[EntityNames.MOVIE_NAME] not in movie_names:
+                        movie_names.add(movie[EntityNames.MOVIE_NAME])
+                        split.append(movie)
+            if len(split) < count:
+                split.extend(random.choices(emoji_movies, k=count - len(split)))
+            splits.append(split)
+        return splits
+
+    async def __generate_movies(self):
+        while self.__movie_requests:
+            requests, total = [], 0
+            while self.__movie_requests and (
+                    not requests or total + self.__movie_requests[0][0] <= self.max_movies_per_prompt):
+                count, future = self.__movie_requests.popleft()
+                if not future.done():
+                    requests.append((count, future))
+                    total += count
+            if not requests:
+                continue
+            try:
+                movies = await self.__request_movies(total)
+            except asyncio.CancelledError:
+                for _, future in requests:
+                    future.cancel()
+                raise
+            except Exception as e:
+                for _, future in requests:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), split in zip(requests, self.split_movies(movies, [count for count, _ in requests])):
+                if not future.done():
+                    future.set_result(split)
+
+    async def __request_movies(self, count: int) -> list[dict[str:str]]:
+        try:
+            with LLM_REQUEST_SECONDS.time("get_movie_names_in_emoji_repr"):
+                response = await self.__create_chat_completion(self._get_movie_names_messages(count))
+        except asyncio.TimeoutError:
+            logging.getLogger(LogConstants.APP_NAME).warning("Timed out getting movies from chatgpt!")
+            return []
+        return self._parse_movie_names(response, count)
+
+    async def check_if_right_guess(self, movie_list: list[dict[str:str]], emoji: str,
+                                   guessed_name: str) -> bool | None:
+        """
+        Checks if the given movie name is a correct guess for the given emoji form the movie list.
+        Args:
+            movie_list: List of movie name and emoji dictionary
+            emoji: Emoji for against which the movie name guess has to be checked
+            guessed_name: Guessed movie name from the emoji
+
+        Returns:
+            Boolean value; True if correct guess, False otherwise. None if ChatGPT didn't answer in time.
+        """
+        try:
+            with LLM_REQUEST_SECONDS.time("check_if_right_guess"):
+                response = await self.__create_chat_completion(
+                    self._check_guess_messages(movie_list, emoji, guessed_name)
+                )
+        except asyncio.TimeoutError:
+            logging.getLogger(LogConstants.APP_NAME).warning("Timed out checking the guess with chatgpt!")
+            return None
+        return self._parse_guess_check(response)
+
+    async def close(self):
+        """
+        Stops generating movies and closes the pooled http session
+
+        Returns:
+            None
+        """
+        if self.__movie_generator is not None:
+            self.__movie_generator.cancel()
+            try:
+                await self.__movie_generator
+            except asyncio.CancelledError:
+                pass
+            self.__movie_generator = None
+        while self.__movie_requests:
+            self.__movie_requests.popleft()[1].cancel()
+        if self.__session is not None:
+            await self.__session.close()
+            self.__session = None
+
+    async def __create_chat_completion(self, messages: list[dict[str:str]]):
+        if self.__session is None or self.__session.closed:
+            self.__session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.pool_size))
+        # openai keeps the session in a context variable, which has to be set in the task making the request
+        openai.aiosession.set(self.__session)
+        # The timeout covers the wait for a free slot too, so a saturated pool can't hold a request any longer
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        await asyncio.wait_for(self.__semaphore.acquire(), self.timeout)
+        try:
+            time_left = max(deadline - loop.time(), 0)
+            return await asyncio.wait_for(
+                openai.ChatCompletion.acreate(
+                    model=self.model,
+                    messages=messages,
+                    request_timeout=time_left,
+                ),
+                time_left,
+            )
+        finally:
+            self.__semaphore.release()
@@ -14,3 +14,17 @@ def get_env(env_key: str) -> str:
         String value of the env key
     """
     return os.environ.get(env_key)
+
+
+def get_env_float(env_key: str, default: float) -> float:
+    """
+    Gets the os environment variable value as a number
+    Args:
+        env_key: Environment variable name
+        default: Value to use if the variable is not set
+
+    Returns:
+        Float value of the env key
+    """
+    value = get_env(env_key)
+    return float(value) if value else default
@@ -0,0 +1,122 @@
+import re
+import unicodedata
+from enum import Enum
+
+from api.constants import MatcherConstants
+
+ARTICLES = frozenset(["the", "a", "an"])
+NON_WORD_CHARACTERS = re.compile(r"[^\w\s]|_")
+# Arabic numbers, and roman numerals up to 39, which tell sequels apart
+SEQUEL_NUMBER = re.compile(r"\d+|(?=[ivx])x{0,3}(ix|iv|v?i{0,3})")
+
+
+class Verdict(str, Enum):
+    """
+    Result of grading a guess locally.
+
+    UNSURE means the guess is neither close enough nor far enough from the answer to decide without ChatGPT.
+    """
+    CORRECT = "correct"
+    INCORRECT = "incorrect"
+    UNSURE = "unsure"
+
+
+def normalize_title(title: str) -> str:
+    """
+    Normalizes a movie name for comparison: strips accents, ignores case and punctuation, spells out `&`,
+    joins initials such as `E.T.` and drops articles
+    Args:
+        title: Movie name
+
+    Returns:
+        Normalized movie name with single spaces between the words
+    """
+    title = unicodedata.normalize("NFKD", title)
+    title = "".join(c for c in title if not unicodedata.combining(c)).casefold()
+    title = title.replace("&", " and ").replace("'", "")
+    words = []
+    for word in NON_WORD_CHARACTERS.sub(" ", title).split():
+        if len(word) == 1 and words and len(words[-1]) == 1 and word not in ARTICLES:
+            words[-1] += word
+        else:
+            words.append(word)
+    return " ".join(w for w in words if w not in ARTICLES)
+
+
+def edit_distance(a: str, b: str) -> int:
+    """
+    Levenshtein distance between two strings
+    Args:
+        a: First string
+        b: Second string
+
+    Returns:
+        Minimum number of single character insertions, deletions and substitutions to turn a into b
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        current = [i]
+        for j, cb in enumerate(b, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def sequel_numbers(words: set[str]) -> set[str]:
+    """
+    Finds the numbers of a normalized movie name
+    Args:
+        words: Words of the normalized movie name
+
+    Returns:
+        Words which are arabic numbers or roman numerals
+    """
+    return {word for word in words if SEQUEL_NUMBER.fullmatch(word)}
+
+
+class AnswerMatcher:
+    """
+    Grades guesses against the movie name of the round without calling ChatGPT. Only the obvious cases are
+    decided locally, everything else is UNSURE.
+
+    Attributes:
+        accept_threshold: Minimum similarity (1 - edit distance / length) to accept a guess
+        reject_threshold: Guesses with both similarity and word overlap below this are rejected
+    """
+    def __init__(
+            self,
+            accept_threshold: float = MatcherConstants.ACCEPT_THRESHOLD,
+            reject_threshold: float = MatcherConstants.REJECT_THRESHOLD,
+    ):
+        self.accept_threshold = accept_threshold
+        self.reject_threshold = reject_threshold
+
+    def grade(self, movie_name: str, guessed_name: str) -> Verdict:
+        """
+        Grades the guessed movie name
+        Args:
+            movie_name: Movie name of the round
+            guessed_name: Guessed movie name
+
+        Returns:
+            Verdict
+        """
+        answer = normalize_title(movie_name)
+        guess = normalize_title(guessed_name)
+        if not guess:
+            return Verdict.INCORRECT
+        if guess == answer:
+            return Verdict.CORRECT
+        answer_words, guess_words = set(answer.split()), set(guess.split())
+        if answer_words == guess_words:
+            return Verdict.CORRECT
+        similarity = 1 - edit_distance(answer, guess) / max(len(answer), len(guess))
+        # A close guess with another number is most likely another movie of the series, e.g. Rocky IV for Rocky II
+        if similarity >= self.accept_threshold and sequel_numbers(answer_words) == sequel_numbers(guess_words):
+            return Verdict.CORRECT
+        overlap = len(answer_words & guess_words) / len(answer_words | guess_words)
+        if similarity < self.reject_threshold and overlap < self.reject_threshold:
+            return Verdict.INCORRECT
+        return Verdict.UNSURE
@@ -0,0 +1,242 @@
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Protocol, Callable, Awaitable
+from urllib.parse import urlparse
+
+from api.constants import LogConstants
+from api.errors.message_bus import MessageBusError
+
+MessageHandler = Callable[[str], Awaitable[None]]
+
+
+class MessageBus(Protocol):
+    """
+    Publish/subscribe interface used to reach the players and rounds of a game from any worker.
+
+    Attributes:
+        shared: True if the messages reach other workers too
+
+    Methods:
+        publish(channel: str, message: str) -> None: Publish a message to every subscriber of the channel.
+        subscribe(channel: str, handler: MessageHandler) -> None: Call the handler for every message of the channel.
+        close() -> None: Close the connections of the bus.
+    """
+    shared: bool
+
+    async def publish(self, channel: str, message: str) -> None:
+        """
+        Publishes a message to a channel
+        Args:
+            channel: Channel name
+            message: Message to publish
+
+        Returns:
+            None
+        """
+        ...
+
+    async def subscribe(self, channel: str, handler: MessageHandler) -> None:
+        """
+        Subscribes a handler to a channel
+        Args:
+            channel: Channel name
+            handler: Coroutine function called with every message published to the channel
+
+        Returns:
+            None
+        """
+        ...
+
+    async def close(self) -> None:
+        """
+        Closes the message bus
+
+        Returns:
+            None
+        """
+        ...
+
+
+class InProcessMessageBus(MessageBus):
+    """
+    Message bus for a single worker, which calls the subscribed handlers directly
+    """
+    shared = False
+
+    def __init__(self):
+        self.__handlers: defaultdict[str, list[MessageHandler]] = defaultdict(list)
+
+    async def publish(self, channel: str, message: str) -> None:
+        for handler in self.__handlers.get(channel, []):
+            await handler(message)
+
+    async def subscribe(self, channel: str, handler: MessageHandler) -> None:
+        self.__handlers[channel].append(handler)
+
+    async def close(self) -> None:
+        self.__handlers.clear()
+
+
+def encode_command(*args: str) -> bytes:
+    """
+    Encodes a command in the Redis serialization protocol (RESP)
+    Args:
+        *args: Command name and arguments
+
+    Returns:
+        Encoded command
+    """
+    encoded_args = [arg.encode() for arg in args]
+    return b"*%d\r\n" % len(encoded_args) + b"".join(b"$%d\r\n%s\r\n" % (len(a), a) for a in encoded_args)
+
+
+async def read_reply(reader: asyncio.StreamReader):
+    """
+    Reads one RESP reply
+    Args:
+        reader: Stream of the server connection
+
+    Returns:
+        bytes for strings, int for integers, list for arrays and None for null replies
+    """
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("The message bus server closed the connection.")
+    kind, value = line[:1], line[1:-2]
+    if kind == b"+":
+        return value
+    if kind == b"-":
+        raise MessageBusError(value.decode())
+    if kind == b":":
+        return int(value)
+    if kind == b"$":
+        if (length := int(value)) < 0:
+            return None
+        return (await reader.readexactly(length + 2))[:-2]
+    if kind == b"*":
+        if (length := int(value)) < 0:
+            return None
+        return [await read_reply(reader) for _ in range(length)]
+    raise MessageBusError(f"Unexpected reply from the message bus server: {line!r}")
+
+
+class RedisMessageBus(MessageBus):
+    """
+    Message bus on a Redis compatible server, for games whose players are connected to several workers.
+
+    Messages are published over one connection and received over a second one, which is subscribed to all the
+    channels. The subscriber reconnects and subscribes again if the connection is lost. Every message is handled
+    in its own task so that a slow handler doesn't hold up the messages of the other games. The tasks start in the
+    order the messages arrive, so handlers see them in order up to their first await.
+
+    Attributes:
+        host: Server host
+        port: Server port
+        password: Password sent with AUTH, if set
+    """
+    shared = True
+
+    def __init__(self, host: str = "localhost", port: int = 6379, password: str | None = None):
+        self.host = host
+        self.port = port
+        self.password = password
+        self.__handlers: defaultdict[str, list[MessageHandler]] = defaultdict(list)
+        self.__publisher: tuple[asyncio.StreamReader, asyncio.StreamWriter] | None = None
+        self.__publish_lock = asyncio.Lock()
+        self.__subscriber: asyncio.StreamWriter | None = None
+        self.__subscriber_task: asyncio.Task | None = None
+        self.__subscribed = asyncio.Event()
+        self.__handler_tasks: set[asyncio.Task] = set()
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisMessageBus":
+        """
+        Creates the message bus from a url like `redis://:password@host:port`
+        Args:
+            url: Server url
+
+        Returns:
+            RedisMessageBus
+        """
+        parsed_url = urlparse(url)
+        return cls(host=parsed_url.hostname or "localhost", port=parsed_url.port or 6379,
+                   password=parsed_url.password)
+
+    async def publish(self, channel: str, message: str) -> None:
+        async with self.__publish_lock:
+            if self.__publisher is None:
+                self.__publisher = await self.__connect()
+            reader, writer = self.__publisher
+            try:
+                writer.write(encode_command("PUBLISH", channel, message))
+                await read_reply(reader)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                writer.close()
+                self.__publisher = None
+                raise
+
+    async def subscribe(self, channel: str, handler: MessageHandler) -> None:
+        self.__handlers[channel].append(handler)
+        if len(self.__handlers[channel]) > 1:
+            return
+        if self.__subscriber_task is None or self.__subscriber_task.done():
+            self.__subscribed.clear()
+            self.__subscriber_task = asyncio.get_running_loop().create_task(self.__receive())
+            await self.__subscribed.wait()
+        else:
+            await self.__subscribed.wait()
+            self.__subscriber.write(encode_command("SUBSCRIBE", channel))
+
+    async def close(self) -> None:
+        if self.__subscriber_task is not None:
+            self.__subscriber_task.cancel()
+            try:
+                await self.__subscriber_task
+            except asyncio.CancelledError:
+                pass
+            self.__subscriber_task = None
+        for task in self.__handler_tasks:
+            task.cancel()
+        if self.__publisher is not None:
+            self.__publisher[1].close()
+            self.__publisher = None
+
+    async def __connect(self) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        if self.password:
+            writer.write(encode_command("AUTH", self.password))
+            await read_reply(reader)
+        return reader, writer
+
+    async def __receive(self):
+        while True:
+            try:
+                reader, self.__subscriber = await self.__connect()
+                self.__subscriber.write(encode_command("SUBSCRIBE", *self.__handlers.keys()))
+                self.__subscribed.set()
+                while True:
+                    reply = await read_reply(reader)
+                    if isinstance(reply, list) and reply[0] == b"message":
+                        task = asyncio.get_running_loop().create_task(
+                            self.__dispatch(reply[1].decode(), reply[2].decode())
+                        )
+                        self.__handler_tasks.add(task)
+                        task.add_done_callback(self.__handler_tasks.discard)
+            except asyncio.CancelledError:
+                if self.__subscriber is not None:
+                    self.__subscriber.close()
+                raise
+            except (ConnectionError, asyncio.IncompleteReadError, MessageBusError) as e:
+                logging.getLogger(LogConstants.APP_NAME).error(f"Lost the message bus subscription: {e!r}")
+                self.__subscribed.clear()
+                if self.__subscriber is not None:
+                    self.__subscriber.close()
+                await asyncio.sleep(1)
+
+    async def __dispatch(self, channel: str, message: str):
+        for handler in self.__handlers.get(channel, []):
+            try:
+                await handler(message)
+            except Exception as e:
+                logging.getLogger(LogConstants.APP_NAME).error(f"Failed to handle a message bus message: {e!r}")
@@ -0,0 +1,205 @@
+import bisect
+import time
+from contextlib import contextmanager
+from typing import Callable
+
+from api.constants import MetricsConstants
+
+
+class Histogram:
+    """
+    Prometheus histogram of durations in seconds, with one series per combination of label values.
+    Observing a value is a bisect and two additions, so it can be used on the hot paths.
+
+    Attributes:
+        name: Metric name
+        description: Help text of the metric
+        label_names: Names of the labels of every series
+        buckets: Upper bounds of the buckets, in increasing order
+    """
+    def __init__(self, name: str, description: str, label_names: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = MetricsConstants.LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.label_names = label_names
+        self.buckets = buckets
+        # Bucket counts (not cumulative), sum and count by label values
+        self.__series: dict[tuple[str, ...], list] = {}
+
+    def observe(self, seconds: float, *label_values: str):
+        """
+        Adds a duration to the histogram
+        Args:
+            seconds: Duration
+            *label_values: Values of the labels, in the order of label_names
+
+        Returns:
+            None
+        """
+        if (series := self.__series.get(label_values)) is None:
+            series = self.__series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, seconds)] += 1
+        series[1] += seconds
+        series[2] += 1
+
+    @contextmanager
+    def time(self, *label_values: str):
+        """
+        Observes the duration of the with block, including when it raises
+        Args:
+            *label_values: Values of the labels, in the order of label_names
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *label_values)
+
+    def count(self, *label_values: str) -> int:
+        """
+        Gets the number of observations of a series
+        Args:
+            *label_values: Values of the labels, in the order of label_names
+
+        Returns:
+            Number of observations
+        """
+        series = self.__series.get(label_values)
+        return series[2] if series else 0
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        for label_values, (bucket_counts, total, count) in sorted(self.__series.items()):
+            labels = [f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, label_values)]
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, float("inf")), bucket_counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_labels = ",".join([*labels, f'le="{le}"'])
+                lines.append(f"{self.name}_bucket{{{bucket_labels}}} {cumulative}")
+            label_text = "{" + ",".join(labels) + "}" if labels else ""
+            lines.append(f"{self.name}_sum{label_text} {total}")
+            lines.append(f"{self.name}_count{label_text} {count}")
+        return lines
+
+
+class Gauge:
+    """
+    Prometheus gauge read from a callback when the metrics are scraped, so keeping it up to date costs nothing.
+
+    Attributes:
+        name: Metric name
+        description: Help text of the metric
+        read: Returns the current value
+    """
+    def __init__(self, name: str, description: str, read: Callable[[], float]):
+        self.name = name
+        self.description = description
+        self.read = read
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} gauge", f"{self.name} {self.read()}"]
+
+
+class MetricsRegistry:
+    """
+    Metrics served in the Prometheus text format. Registering a metric with the name of an existing one
+    replaces it.
+    """
+    def __init__(self):
+        self.__metrics: dict[str, Histogram | Gauge] = {}
+
+    def histogram(self, name: str, description: str, label_names: tuple[str, ...] = (),
+                  buckets: tuple[float, ...] = MetricsConstants.LATENCY_BUCKETS) -> Histogram:
+        """
+        Registers a histogram
+        Args:
+            name: Metric name
+            description: Help text of the metric
+            label_names: Names of the labels of every series
+            buckets: Upper bounds of the buckets, in increasing order
+
+        Returns:
+            Histogram
+        """
+        histogram = Histogram(name, description, label_names, buckets)
+        self.__metrics[name] = histogram
+        return histogram
+
+    def gauge(self, name: str, description: str, read: Callable[[], float]) -> Gauge:
+        """
+        Registers a gauge
+        Args:
+            name: Metric name
+            description: Help text of the metric
+            read: Returns the current value
+
+        Returns:
+            Gauge
+        """
+        gauge = Gauge(name, description, read)
+        self.__metrics[name] = gauge
+        return gauge
+
+    def render(self) -> str:
+        """
+        Renders all the metrics
+
+        Returns:
+            Metrics in the Prometheus text exposition format
+        """
+        lines = []
+        for metric in self.__metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware observing the latency of every HTTP request by method, route and status code. Requests
+    which don't match a route are labelled with `unmatched` to keep the number of series bounded.
+    """
+    def __init__(self, app, histogram: Histogram | None = None):
+        self.app = app
+        self.histogram = histogram or HTTP_REQUEST_SECONDS
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = ["500"]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = str(message["status"])
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            self.histogram.observe(
+                time.perf_counter() - start,
+                scope["method"], getattr(route, "path", "unmatched"), status[0],
+            )
+
+
+registry = MetricsRegistry()
+
+LLM_REQUEST_SECONDS = registry.histogram(
+    "filmemo_llm_request_seconds", "Duration of the ChatGPT requests", ("operation",)
+)
+DB_REQUEST_SECONDS = registry.histogram(
+    "filmemo_db_request_seconds", "Duration of the database calls", ("operation",)
+)
+FANOUT_SECONDS = registry.histogram(
+    "filmemo_broadcast_fanout_seconds", "Time between a message being queued and it reaching the last player"
+)
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "filmemo_http_request_seconds", "Duration of the HTTP requests", ("method", "route", "status")
+)
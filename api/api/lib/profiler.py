@@ -0,0 +1,116 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from api.constants import ProfilingConstants
+from api.errors.profiler import ProfilerBusyError
+
+
+class ProfileReport:
+    """
+    Stacks sampled by the SamplingProfiler.
+
+    Attributes:
+        seconds: Duration of the profile
+        samples: Number of samples taken
+        stacks: Number of samples by stack, outermost frame first
+    """
+    def __init__(self, seconds: float, samples: int, stacks: Counter[tuple[str, ...]]):
+        self.seconds = seconds
+        self.samples = samples
+        self.stacks = stacks
+
+    def collapsed(self) -> str:
+        """
+        Formats the stacks in the collapsed format read by flame graph tools
+
+        Returns:
+            One `frame;frame;frame count` line per stack
+        """
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in self.stacks.most_common())
+
+    def top(self, limit: int = ProfilingConstants.TOP_FUNCTIONS) -> str:
+        """
+        Formats the functions the sampled thread spent the most time in
+
+        Args:
+            limit: Number of functions to list
+
+        Returns:
+            Table of the share of samples in which each function was running (self) or on the stack (total)
+        """
+        self_counts: Counter[str] = Counter()
+        total_counts: Counter[str] = Counter()
+        for stack, count in self.stacks.items():
+            self_counts[stack[-1]] += count
+            for frame in set(stack):
+                total_counts[frame] += count
+        samples = max(self.samples, 1)
+        lines = [f"{self.samples} samples in {self.seconds:.1f}s", f"{'self':>7} {'total':>7}  function"]
+        for frame, count in total_counts.most_common(limit):
+            lines.append(
+                f"{100 * self_counts[frame] / samples:6.1f}% {100 * count / samples:6.1f}%  {frame}"
+            )
+        return "\n".join(lines) + "\n"
+
+
+class SamplingProfiler:
+    """
+    Profiler which can be switched on at runtime. While a profile runs, a background thread samples the stack
+    of the profiled thread every `interval` seconds; nothing is added to the code being profiled.
+
+    Attributes:
+        interval: Seconds between two samples
+    """
+    def __init__(self, interval: float = ProfilingConstants.SAMPLE_INTERVAL_SECONDS):
+        self.interval = interval
+        self.__running = False
+
+    @property
+    def running(self) -> bool:
+        return self.__running
+
+    async def profile(self, seconds: float, thread_id: int | None = None) -> ProfileReport:
+        """
+        Samples a thread for a few seconds without blocking the event loop
+        Args:
+            seconds: Duration of the profile
+            thread_id: Thread to sample, the thread running the event loop by default
+
+        Returns:
+            ProfileReport
+        """
+        if self.__running:
+            raise ProfilerBusyError("A profile is already running.")
+        self.__running = True
+        try:
+            return await asyncio.to_thread(self.__sample, thread_id or threading.get_ident(), seconds)
+        finally:
+            self.__running = False
+
+    def __sample(self, thread_id: int, seconds: float) -> ProfileReport:
+        stacks: Counter[tuple[str, ...]] = Counter()
+        samples = 0
+        # The sampler can only look at the profiled thread when that thread lets go of the GIL, which it does
+        # mostly while waiting on I/O. Forcing more frequent switches lets the samples land in busy code too.
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(switch_interval, self.interval / 10))
+        start = time.perf_counter()
+        deadline = start + seconds
+        try:
+            while time.perf_counter() < deadline:
+                if (frame := sys._current_frames().get(thread_id)) is not None:
+                    stack = []
+                    while frame is not None:
+                        code = frame.f_code
+                        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                        frame = frame.f_back
+                    stacks[tuple(reversed(stack))] += 1
+                    samples += 1
+                time.sleep(self.interval)
+        finally:
+            sys.setswitchinterval(switch_interval)
+        return ProfileReport(time.perf_counter() - start, samples, stacks)
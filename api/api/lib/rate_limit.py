@@ -0,0 +1,90 @@
+import asyncio
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+from api.constants import RateLimitConstants
+from api.errors.rate_limit import RateLimitedError, ServerBusyError
+
+
+class TokenBucketLimiter:
+    """
+    Token bucket per key: each key may spend `burst` tokens at once, and gets `rate` tokens back per second.
+    Only the `max_keys` most recently used buckets are kept; a forgotten bucket starts over full, which is what
+    it would have refilled to anyway unless it was used very recently.
+
+    Attributes:
+        rate: Tokens added to a bucket per second
+        burst: Size of a bucket
+        max_keys: Number of buckets kept in memory
+    """
+    def __init__(self, rate: float, burst: float, max_keys: int = RateLimitConstants.MAX_TRACKED_KEYS):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        # Tokens left and time of the last refill by key
+        self.__buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.__buckets)
+
+    def acquire(self, key: str):
+        """
+        Takes a token from the bucket of the key, or raises a RateLimitedError if the bucket is empty
+        Args:
+            key: Player ID, game ID or any other key to limit
+
+        Returns:
+            None
+        """
+        now = time.monotonic()
+        tokens, refilled_at = self.__buckets.pop(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - refilled_at) * self.rate)
+        if tokens < 1:
+            self.__buckets[key] = (tokens, now)
+            raise RateLimitedError("Too many requests, slow down.", retry_after=(1 - tokens) / self.rate)
+        self.__buckets[key] = (tokens - 1, now)
+        if len(self.__buckets) > self.max_keys:
+            self.__buckets.popitem(last=False)
+
+
+class AdmissionController:
+    """
+    Caps the number of concurrent calls of an expensive operation. Calls over the cap wait in a bounded queue,
+    and are rejected right away once the queue is full or after waiting `queue_timeout` seconds, so that an
+    overloaded worker answers fast instead of piling up work.
+
+    Attributes:
+        max_concurrency: Number of calls running at a time
+        max_queue: Number of calls waiting for their turn
+        queue_timeout: Seconds a call may wait for its turn
+    """
+    def __init__(self, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.waiting = 0
+        self.__semaphore = asyncio.Semaphore(max_concurrency)
+
+    @asynccontextmanager
+    async def admit(self):
+        """
+        Runs the with block once there is room for it, or raises a ServerBusyError if the queue is full or the
+        call waited for too long
+        """
+        if self.__semaphore.locked():
+            if self.waiting >= self.max_queue:
+                raise ServerBusyError("The server is busy, try again later.")
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self.__semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                raise ServerBusyError("The server is busy, try again later.")
+            finally:
+                self.waiting -= 1
+        else:
+            await self.__semaphore.acquire()
+        try:
+            yield
+        finally:
+            self.__semaphore.release()
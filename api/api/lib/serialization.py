@@ -0,0 +1,38 @@
+from datetime import timedelta
+from typing import Any
+
+import orjson
+from pydantic import BaseModel
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    if isinstance(value, BaseModel):
+        return value.dict()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(value: Any) -> bytes:
+    """
+    Encodes a value as compact JSON with orjson. Datetimes are encoded in ISO 8601 format and timedeltas as
+    seconds, the same way FastAPI encodes them.
+    Args:
+        value: Value to encode
+
+    Returns:
+        UTF-8 encoded JSON
+    """
+    return orjson.dumps(value, default=_default)
+
+
+def loads(data: bytes | str) -> Any:
+    """
+    Decodes JSON with orjson
+    Args:
+        data: JSON bytes or text
+
+    Returns:
+        Decoded value
+    """
+    return orjson.loads(data)
@@ -0,0 +1,107 @@
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+from api.constants import TracingConstants
+
+
+class Tracer:
+    """
+    Records a timeline of spans for each game, so that a laggy game can be reconstructed afterwards. Spans are
+    kept in memory, for at most `max_games` games and the last `max_spans` spans of each game, the least
+    recently traced games being forgotten first.
+
+    Attributes:
+        max_games: Number of games to keep the timeline of
+        max_spans: Number of spans kept for each game
+    """
+    def __init__(self, max_games: int = TracingConstants.MAX_GAMES, max_spans: int = TracingConstants.MAX_SPANS):
+        self.max_games = max_games
+        self.max_spans = max_spans
+        # Spans as (name, start, end, attributes) tuples by game ID, start and end being perf_counter times
+        self.__timelines: OrderedDict[str, deque[tuple[str, float, float, dict]]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.__timelines)
+
+    def record(self, game_id: str, name: str, start: float, end: float, **attributes):
+        """
+        Adds a finished span to the timeline of the game
+        Args:
+            game_id: Game ID
+            name: Span name
+            start: time.perf_counter() at the start of the span
+            end: time.perf_counter() at the end of the span
+            **attributes: Details of the span, e.g. the round ID
+
+        Returns:
+            None
+        """
+        if (timeline := self.__timelines.get(game_id)) is None:
+            timeline = self.__timelines[game_id] = deque(maxlen=self.max_spans)
+            if len(self.__timelines) > self.max_games:
+                self.__timelines.popitem(last=False)
+        else:
+            self.__timelines.move_to_end(game_id)
+        timeline.append((name, start, end, attributes))
+
+    @contextmanager
+    def span(self, game_id: str, name: str, **attributes):
+        """
+        Records the with block as a span of the game. The block can add attributes to the yielded dictionary,
+        and the name of the exception is added as the `error` attribute if the block raises.
+        Args:
+            game_id: Game ID
+            name: Span name
+            **attributes: Details of the span
+        """
+        start = time.perf_counter()
+        try:
+            yield attributes
+        except BaseException as e:
+            attributes["error"] = type(e).__name__
+            raise
+        finally:
+            self.record(game_id, name, start, time.perf_counter(), **attributes)
+
+    def timeline(self, game_id: str) -> dict | None:
+        """
+        Gets the timeline of the game, with the span times in seconds since the first span of the game, and a
+        summary of every round:
+            new_round_delivered_seconds: From the start of the round to the new round message reaching every
+                connected player
+            guess_verdict_seconds: Time taken to grade each guess of the round
+        Args:
+            game_id: Game ID
+
+        Returns:
+            Spans and round summaries, None if the game wasn't traced
+        """
+        if (timeline := self.__timelines.get(game_id)) is None:
+            return None
+        spans = sorted(timeline, key=lambda span: span[1])
+        origin = spans[0][1]
+        rounds: dict[str, dict] = {}
+        round_start: tuple[str, float] | None = None
+        for name, start, end, attributes in spans:
+            if name == "start_round" and "round_id" in attributes:
+                round_start = (attributes["round_id"], start)
+                rounds[attributes["round_id"]] = {
+                    "round_id": attributes["round_id"],
+                    "new_round_delivered_seconds": None,
+                    "guess_verdict_seconds": [],
+                }
+            elif name == "broadcast" and round_start is not None:
+                round_summary = rounds[round_start[0]]
+                if round_summary["new_round_delivered_seconds"] is None:
+                    round_summary["new_round_delivered_seconds"] = round(end - round_start[1], 6)
+            elif name == "check_guess" and attributes.get("round_id") in rounds:
+                rounds[attributes["round_id"]]["guess_verdict_seconds"].append(round(end - start, 6))
+        return {
+            "game_id": game_id,
+            "spans": [
+                {"name": name, "start": round(start - origin, 6), "duration": round(end - start, 6), **attributes}
+                for name, start, end, attributes in spans
+            ],
+            "rounds": list(rounds.values()),
+        }
@@ -0,0 +1,75 @@
+import time
+from collections import OrderedDict
+
+from api.constants import LLMConstants
+from api.lib.matcher import normalize_title
+
+
+class VerdictCache:
+    """
+    Bounded LRU cache of ChatGPT guess verdicts, keyed on the movie name and emoji of the round and the
+    normalized guess. Entries expire after `ttl_seconds`.
+
+    Attributes:
+        max_size: Maximum number of verdicts kept
+        ttl_seconds: Seconds a verdict stays valid
+        hits: Number of lookups answered from the cache
+        misses: Number of lookups which had to go to ChatGPT
+    """
+    def __init__(
+            self,
+            max_size: int = LLMConstants.VERDICT_CACHE_SIZE,
+            ttl_seconds: float = LLMConstants.VERDICT_CACHE_TTL_SECONDS,
+    ):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.__verdicts: OrderedDict[tuple[str, str, str], tuple[bool, float]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.__verdicts)
+
+    @staticmethod
+    def __key(movie_name: str, emoji: str, guessed_name: str) -> tuple[str, str, str]:
+        return movie_name, emoji, normalize_title(guessed_name)
+
+    def get(self, movie_name: str, emoji: str, guessed_name: str) -> bool | None:
+        """
+        Gets the cached verdict of a guess
+        Args:
+            movie_name: Movie name of the round
+            emoji: Emoji of the round
+            guessed_name: Guessed movie name
+
+        Returns:
+            The cached verdict, None if the guess is not cached
+        """
+        key = self.__key(movie_name, emoji, guessed_name)
+        if entry := self.__verdicts.get(key):
+            is_guess_correct, expires_at = entry
+            if expires_at > time.monotonic():
+                self.__verdicts.move_to_end(key)
+                self.hits += 1
+                return is_guess_correct
+            del self.__verdicts[key]
+        self.misses += 1
+        return None
+
+    def put(self, movie_name: str, emoji: str, guessed_name: str, is_guess_correct: bool):
+        """
+        Caches the verdict of a guess, evicting the least recently used verdict if the cache is full
+        Args:
+            movie_name: Movie name of the round
+            emoji: Emoji of the round
+            guessed_name: Guessed movie name
+            is_guess_correct: Verdict of the guess
+
+        Returns:
+            None
+        """
+        key = self.__key(movie_name, emoji, guessed_name)
+        self.__verdicts[key] = (is_guess_correct, time.monotonic() + self.ttl_seconds)
+        self.__verdicts.move_to_end(key)
+        while len(self.__verdicts) > self.max_size:
+            self.__verdicts.popitem(last=False)
@@ -1,15 +1,20 @@
-import asyncio
 import logging
+import math
 from datetime import timedelta
 
-from fastapi import FastAPI, WebSocket, Request, HTTPException
+from fastapi import FastAPI, WebSocket, Request, HTTPException, Response
 from starlette.middleware.cors import CORSMiddleware
-from websockets.exceptions import ConnectionClosedError
+from starlette.websockets import WebSocketDisconnect, WebSocketState
 
 from api.bal.game_manager import GameManager
-from api.constants import LogConstants
+from api.constants import LogConstants, ENVConstants, ProfilingConstants
 from api.errors.database import GameNotFoundError
 from api.errors.game import RoundNotExistsError, RoundAlreadyEndedError, ActionNotPermittedError
+from api.errors.profiler import ProfilerBusyError
+from api.errors.rate_limit import RateLimitedError, ServerBusyError
+from api.lib import metrics, serialization
+from api.lib.config import get_env
+from api.lib.profiler import SamplingProfiler
 from api.models.game import CreateGameResponse, AddPlayerResponse, APIResponse, VerifyGameResponse, \
     GetGameWithResultsResponse
 
@@ -31,8 +36,31 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(metrics.MetricsMiddleware)
 
 game_mgr = GameManager()
+profiler = SamplingProfiler()
+
+metrics.registry.gauge(
+    "filmemo_live_games", "Games which started and haven't ended", lambda: len(game_mgr.started_games)
+)
+metrics.registry.gauge(
+    "filmemo_open_websockets", "Connected player websockets",
+    lambda: sum(len(connections) for connections in game_mgr.player_connections.values()),
+)
+metrics.registry.gauge(
+    "filmemo_pending_round_timers", "Rounds waiting for their end time", lambda: len(game_mgr.round_scheduler)
+)
+
+
+@app.on_event("startup")
+async def startup():
+    await game_mgr.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await game_mgr.close()
 
 
 @app.get("/")
@@ -40,16 +68,24 @@ async def root():
     return {"message": "Welcome to filmemo's API", "version": "1.1.*"}
 
 
+@app.get("/metrics")
+async def get_metrics():
+    return Response(content=metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.post("/game/create")
 async def create_game(request: Request):
     data = await request.json()
-    game = await game_mgr.create_game(
-        handle=data.get("handle"),
-        avatar=data.get("avatar"),
-        user_count=int(data.get("user_count")),
-        round_count=int(data.get("round_count")),
-        round_duration=timedelta(minutes=int(data.get("round_duration")))
-    )
+    try:
+        game = await game_mgr.create_game(
+            handle=data.get("handle"),
+            avatar=data.get("avatar"),
+            user_count=int(data.get("user_count")),
+            round_count=int(data.get("round_count")),
+            round_duration=timedelta(minutes=int(data.get("round_duration")))
+        )
+    except ServerBusyError:
+        raise HTTPException(status_code=429, detail="Server Busy", headers={"Retry-After": "1"})
     return CreateGameResponse(
         status="OK",
         game_id=game.id,
@@ -76,7 +112,7 @@ async def start_game(request: Request):
 @app.post("/player/add")
 async def add_player(request: Request):
     data = await request.json()
-    player = game_mgr.add_player(
+    player = await game_mgr.add_player(
         game_id=data.get("game_id"),
         handle=data.get("handle"),
         avatar=data.get("avatar"),
@@ -89,23 +125,22 @@ async def add_player(request: Request):
 
 @app.websocket("/ws/{game_id}/{player_id}")
 async def websocket_endpoint(websocket: WebSocket, game_id: str, player_id: str):
-    await game_mgr.join_game(
-        game_id=game_id,
-        player_id=player_id,
-        websocket=websocket
-    )
-
-    while True:
-        try:
-            await asyncio.sleep(1)
-            message_to_send = {
-                "status": "success",
-                "message": "heartbeat",
-                "message_type": "heartbeat"
-            }
-            await websocket.send_json(message_to_send)
-        except ConnectionClosedError:
-            break
+    try:
+        await game_mgr.join_game(
+            game_id=game_id,
+            player_id=player_id,
+            websocket=websocket
+        )
+        if websocket.application_state != WebSocketState.CONNECTED:
+            return
+        # Heartbeats are sent by the game manager, this only reads what the player sends
+        while True:
+            message = await websocket.receive_text()
+            await game_mgr.receive_message(game_id, player_id, message)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        game_mgr.leave_game(game_id, player_id, websocket)
 
 
 @app.post("/game/submit")
@@ -123,6 +158,10 @@ async def submit_answer(request: Request):
         raise HTTPException(status_code=404, detail="Invalid Round")
     except RoundAlreadyEndedError:
         raise HTTPException(status_code=404, detail="Round Ended")
+    except RateLimitedError as e:
+        raise HTTPException(
+            status_code=429, detail="Too Many Guesses", headers={"Retry-After": str(math.ceil(e.retry_after))}
+        )
 
 
 @app.post("/game/verify")
@@ -131,11 +170,11 @@ async def check_if_game_id_is_valid(request: Request):
     game_id = data.get("game_id")
     game = None
     try:
-        is_valid, game = game_mgr.is_game_valid(game_id)
+        is_valid, game = await game_mgr.is_game_valid(game_id)
     except GameNotFoundError:
         is_valid = False
     if is_valid:
-        return VerifyGameResponse(
+        response = VerifyGameResponse(
             status="OK",
             game_id=game_id,
             user_count=game.user_count,
@@ -143,19 +182,62 @@ async def check_if_game_id_is_valid(request: Request):
             round_duration=game.round_duration,
             created_by=game.created_by
         )
+        return Response(content=response.json_bytes(), media_type="application/json")
     else:
         raise HTTPException(status_code=404, detail="Invalid Game")
 
 
+@app.post("/game/leaderboard")
+async def get_leaderboard(request: Request):
+    data = await request.json()
+    try:
+        leaderboard = await game_mgr.get_leaderboard(data.get("game_id"))
+    except GameNotFoundError:
+        raise HTTPException(status_code=404, detail="Invalid Game")
+    return Response(content=b'{"status":"OK","leaderboard":' + leaderboard + b"}", media_type="application/json")
+
+
 @app.post("/game/results")
 async def get_game(request: Request):
     data = await request.json()
     game_id = data.get("game_id")
-    game = game_mgr.get_game_with_results(game_id)
+    game = await game_mgr.get_game_with_results(game_id)
     if game.results:
-        return GetGameWithResultsResponse(
+        response = GetGameWithResultsResponse(
             status="OK",
             game=game
         )
+        return Response(content=response.json_bytes(), media_type="application/json")
     else:
         raise HTTPException(status_code=404, detail="Invalid Game")
+
+
+@app.post("/debug/timeline")
+async def get_game_timeline(request: Request):
+    if get_env(ENVConstants.TIMELINE_ENABLED) != "true":
+        raise HTTPException(status_code=404, detail="Game timelines are disabled")
+    data = await request.json()
+    timeline = game_mgr.tracer.timeline(data.get("game_id"))
+    if timeline is None:
+        raise HTTPException(status_code=404, detail="Game not traced")
+    return Response(content=serialization.dumps(timeline), media_type="application/json")
+
+
+@app.post("/debug/profile")
+async def profile(request: Request):
+    if get_env(ENVConstants.PROFILING_ENABLED) != "true":
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    data = await request.json()
+    try:
+        seconds = float(data.get("seconds", ProfilingConstants.DEFAULT_SECONDS))
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="seconds must be a number")
+    if not seconds > 0:
+        raise HTTPException(status_code=400, detail="seconds must be more than 0")
+    seconds = min(seconds, ProfilingConstants.MAX_SECONDS)
+    try:
+        report = await profiler.profile(seconds)
+    except ProfilerBusyError:
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    content = report.collapsed() if data.get("format") == "collapsed" else report.top()
+    return Response(content=content, media_type="text/plain")
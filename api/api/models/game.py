@@ -1,9 +1,11 @@
 import uuid
 from typing import Dict, Any
 
-from pydantic import BaseModel, validator, Field
+from pydantic import BaseModel, validator, Field, PrivateAttr
 from datetime import timedelta, datetime
 
+from api.lib import serialization
+
 
 class Player(BaseModel):
     """
@@ -20,6 +22,15 @@ class Player(BaseModel):
     avatar: str
     score: int
 
+    def to_dict(self) -> Dict[str, Any]:
+        """Same as `dict()`, built directly from the attributes."""
+        return {
+            "id": self.id,
+            "handle": self.handle,
+            "avatar": self.avatar,
+            "score": self.score,
+        }
+
 
 class Round(BaseModel):
     """
@@ -40,6 +51,17 @@ class Round(BaseModel):
     end_time: datetime | None = None
     results: Dict[str, bool] = {}
 
+    def to_dict(self) -> Dict[str, Any]:
+        """Same as `dict()`, built directly from the attributes."""
+        return {
+            "id": self.id,
+            "emoji": self.emoji,
+            "movie_name": self.movie_name,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "results": dict(self.results),
+        }
+
 
 class Game(BaseModel):
     """
@@ -63,6 +85,107 @@ class Game(BaseModel):
     players: list[Player] = []
     rounds: list[Round] = []
     results: Dict = {}
+    _encoded: bytes | None = PrivateAttr(default=None)
+    _leaderboard: bytes | None = PrivateAttr(default=None)
+    _rounds_by_id: Dict[str, Round] = PrivateAttr(default_factory=dict)
+    _players_by_id: Dict[str, Player] = PrivateAttr(default_factory=dict)
+    _next_round_index: int = PrivateAttr(default=0)
+    _movie_emojis: list[Dict[str, str]] | None = PrivateAttr(default=None)
+
+    def __init__(self, **data):
+        super().__init__(**data)
+        self.reindex()
+
+    def reindex(self):
+        """
+        Builds the ID indexes of the rounds and players and finds the next round to start. Rounds are started in
+        order, so the next round is the first one without a start time.
+        """
+        self._rounds_by_id = {r.id: r for r in self.rounds}
+        self._players_by_id = {p.id: p for p in self.players}
+        self._next_round_index = next(
+            (i for i, r in enumerate(self.rounds) if r.start_time is None), len(self.rounds)
+        )
+        self._movie_emojis = None
+
+    def get_round(self, round_id: str) -> Round | None:
+        """
+        Gets a round by its ID
+        Args:
+            round_id: Round ID
+
+        Returns:
+            Round, None if the game has no round with this ID
+        """
+        if len(self._rounds_by_id) != len(self.rounds):
+            self.reindex()
+        return self._rounds_by_id.get(round_id)
+
+    def get_player(self, player_id: str) -> Player | None:
+        """
+        Gets a player by its ID
+        Args:
+            player_id: Player ID
+
+        Returns:
+            Player, None if the player is not in the game
+        """
+        if len(self._players_by_id) != len(self.players):
+            self.reindex()
+        return self._players_by_id.get(player_id)
+
+    def add_player(self, player: Player):
+        """
+        Adds a player to the game
+        Args:
+            player: Player object
+
+        Returns:
+            None
+        """
+        self.players.append(player)
+        self._players_by_id[player.id] = player
+
+    @property
+    def has_started(self) -> bool:
+        """True once the first round has started."""
+        return self._next_round_index > 0
+
+    @property
+    def current_round(self) -> Round | None:
+        """The last started round while it hasn't ended, None otherwise."""
+        if self._next_round_index == 0:
+            return None
+        last_started_round = self.rounds[self._next_round_index - 1]
+        return last_started_round if last_started_round.end_time is None else None
+
+    def start_next_round(self, start_time: datetime) -> Round | None:
+        """
+        Starts the next round of the game
+        Args:
+            start_time: Start time of the round
+
+        Returns:
+            The started round, None if all the rounds have been played
+        """
+        if self._next_round_index >= len(self.rounds):
+            return None
+        next_round = self.rounds[self._next_round_index]
+        next_round.start_time = start_time
+        self._next_round_index += 1
+        return next_round
+
+    def movie_emojis(self) -> list[Dict[str, str]]:
+        """
+        Movie names and emojis of the rounds, as given to ChatGPT to check the guesses. Built once per game, as
+        the movies of a game don't change.
+
+        Returns:
+            List of movie emoji dictionaries
+        """
+        if self._movie_emojis is None:
+            self._movie_emojis = [{"movie_name": r.movie_name, "emoji": r.emoji} for r in self.rounds]
+        return self._movie_emojis
 
     def dict(self, *args, **kwargs) -> Dict[str, Any]:
         """Overrides the default dict implementation to convert the `rounds` attribute to a list of dicts."""
@@ -70,6 +193,66 @@ class Game(BaseModel):
         d["round_duration"] = self.round_duration.seconds / 60
         return d
 
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Same as `dict()`, built directly from the attributes instead of going through pydantic's field iteration,
+        which is several times slower for the nested rounds and players.
+        """
+        return {
+            "id": self.id,
+            "user_count": self.user_count,
+            "round_count": self.round_count,
+            "round_duration": self.round_duration.seconds / 60,
+            "created_by": self.created_by,
+            "players": [p.to_dict() for p in self.players],
+            "rounds": [r.to_dict() for r in self.rounds],
+            "results": dict(self.results),
+        }
+
+    def json_bytes(self) -> bytes:
+        """
+        Encodes the game with orjson as `dict()` represents it. The encoded game is cached until `invalidate()`
+        is called, so the game manager invalidates it whenever it mutates the game.
+
+        Returns:
+            UTF-8 encoded JSON
+        """
+        if self._encoded is None:
+            self._encoded = serialization.dumps(self.to_dict())
+        return self._encoded
+
+    def standings(self) -> list[Dict[str, Any]]:
+        """
+        Ranks the players by score, highest first. Players with the same score share a rank and keep the order
+        in which they joined.
+
+        Returns:
+            List of player dictionaries with their rank
+        """
+        standings = []
+        rank, previous_score = 0, None
+        for i, player in enumerate(sorted(self.players, key=lambda p: -p.score), start=1):
+            if player.score != previous_score:
+                rank, previous_score = i, player.score
+            standings.append({"rank": rank, **player.to_dict()})
+        return standings
+
+    def leaderboard_bytes(self) -> bytes:
+        """
+        Encodes the standings of the game with orjson, cached until `invalidate()` is called.
+
+        Returns:
+            UTF-8 encoded JSON
+        """
+        if self._leaderboard is None:
+            self._leaderboard = serialization.dumps(self.standings())
+        return self._leaderboard
+
+    def invalidate(self):
+        """Drops the cached encodings after the game was changed."""
+        self._encoded = None
+        self._leaderboard = None
+
     @validator('user_count', 'round_count')
     def must_be_positive(cls, value: int):
         if value <= 0:
@@ -130,6 +313,21 @@ class VerifyGameResponse(APIResponse):
     round_duration: timedelta = timedelta(minutes=1)
     created_by: str
 
+    def json_bytes(self) -> bytes:
+        """Encodes the response body the same way FastAPI does, with orjson."""
+        return serialization.dumps({
+            "status": self.status,
+            "game_id": self.game_id,
+            "user_count": self.user_count,
+            "round_count": self.round_count,
+            "round_duration": self.round_duration,
+            "created_by": self.created_by,
+        })
+
 
 class GetGameWithResultsResponse(APIResponse):
     game: Game
+
+    def json_bytes(self) -> bytes:
+        """Encodes the response body the same way FastAPI does, reusing the cached encoding of the game."""
+        return b'{"status":' + serialization.dumps(self.status) + b',"game":' + self.game.json_bytes() + b"}"
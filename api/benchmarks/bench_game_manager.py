@@ -0,0 +1,223 @@
+"""
+Benchmarks the hot paths of the GameManager with in-memory stand-ins for the database and ChatGPT.
+
+Every scenario plays `games` concurrent games of `players` players and `rounds` rounds, and times each call of
+create_game, add_player, start_round, submit_guess, broadcast_to_all_players, end_round and end_game. A third
+of the guesses are right, a third are wrong and a third need ChatGPT to be checked.
+
+Usage:
+    python -m benchmarks.bench_game_manager [--games 1 20] [--players 2 8] [--rounds 5]
+                                            [--db-latency 0] [--llm-latency 0]
+                                            [--save-baseline | --compare [--tolerance 0.25]]
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import statistics
+import sys
+import time
+from collections import defaultdict
+from datetime import timedelta
+from pathlib import Path
+
+from api.bal.game_manager import GameManager
+from api.constants import LogConstants
+from api.lib.message_bus import InProcessMessageBus
+from api.models.game import Game
+from benchmarks.fakes import LatencyDatabase, LatencyGPTManager, NullWebSocket
+
+BASELINE_PATH = Path(__file__).parent / "baseline.json"
+
+
+def guess_for(player_index: int, movie_name: str) -> str:
+    """
+    Picks the guess of a player: the movie name, a wrong guess, or a close guess which has to go to ChatGPT
+    Args:
+        player_index: Position of the player in the game
+        movie_name: Movie name of the round
+
+    Returns:
+        Guessed movie name
+    """
+    if player_index % 3 == 0:
+        return movie_name
+    if player_index % 3 == 1:
+        return "zzzz qqqq"
+    return f"{movie_name} {player_index} returns"
+
+
+async def _ignore_round_end(game_id: str, round_id: str):
+    pass
+
+
+class Timings:
+    """
+    Durations of the timed calls, by operation name
+    """
+    def __init__(self):
+        self.durations: defaultdict[str, list[float]] = defaultdict(list)
+
+    async def measure(self, operation: str, awaitable):
+        """
+        Awaits and times a call
+        Args:
+            operation: Operation name
+            awaitable: Call to time
+
+        Returns:
+            Result of the call
+        """
+        start = time.perf_counter()
+        result = await awaitable
+        self.durations[operation].append(time.perf_counter() - start)
+        return result
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """
+        Summarizes the durations of every operation
+
+        Returns:
+            Number of calls and mean, median and 95th percentile durations in microseconds, by operation name
+        """
+        summary = {}
+        for operation, durations in self.durations.items():
+            durations = sorted(durations)
+            summary[operation] = {
+                "calls": len(durations),
+                "mean_us": round(statistics.fmean(durations) * 1e6, 1),
+                "p50_us": round(durations[len(durations) // 2] * 1e6, 1),
+                "p95_us": round(durations[min(len(durations) - 1, int(len(durations) * 0.95))] * 1e6, 1),
+            }
+        return summary
+
+
+async def play_game(game_manager: GameManager, timings: Timings, players: int, rounds: int):
+    """
+    Plays one game from its creation to its end, timing every game manager call
+    Args:
+        game_manager: Game manager under test
+        timings: Timings to add the durations to
+        players: Number of players
+        rounds: Number of rounds
+
+    Returns:
+        None
+    """
+    game: Game = await timings.measure("create_game", game_manager.create_game(
+        handle="creator", avatar="avatar", user_count=players, round_count=rounds,
+        round_duration=timedelta(minutes=1),
+    ))
+    player_ids = [game.created_by]
+    for i in range(1, players):
+        player = await timings.measure("add_player", game_manager.add_player(game.id, f"player_{i}", "avatar"))
+        player_ids.append(player.id)
+    for player_id in player_ids:
+        game_manager.broadcaster.register(game.id, player_id, NullWebSocket())
+    for _ in range(rounds):
+        await timings.measure("start_round", game_manager.start_round(game.id))
+        current_round = game.current_round
+        for i, player_id in enumerate(player_ids):
+            await timings.measure("submit_guess", game_manager.submit_guess(
+                game.id, current_round.id, player_id, guess_for(i, current_round.movie_name)
+            ))
+        await timings.measure("broadcast_to_all_players", game_manager.broadcast_to_all_players(
+            game.id, {"status": "success", "message": "Round is over", "message_type": "round_over"}
+        ))
+        await timings.measure("end_round", game_manager.end_round(game.id, current_round.id))
+    await timings.measure("end_game", game_manager.end_game(game.id))
+
+
+async def run_scenario(games: int, players: int, rounds: int, db_latency: float, llm_latency: float) -> dict:
+    """
+    Plays concurrent games on a new game manager
+    Args:
+        games: Number of concurrent games
+        players: Number of players per game
+        rounds: Number of rounds per game
+        db_latency: Seconds added to every database call
+        llm_latency: Seconds added to every ChatGPT call
+
+    Returns:
+        Timing summary by operation name
+    """
+    db_client, gpt_client = LatencyDatabase(db_latency), LatencyGPTManager(llm_latency)
+    game_manager = GameManager(db_client=db_client, gpt_client=gpt_client, message_bus=InProcessMessageBus())
+    # The benchmark ends the rounds itself instead of the round timers, and guesses as fast as it can
+    game_manager.round_scheduler.on_round_end = _ignore_round_end
+    game_manager.player_guess_limiter.burst = rounds
+    game_manager.game_guess_limiter.burst = players * rounds
+    timings = Timings()
+    await game_manager.start()
+    try:
+        await asyncio.gather(*(play_game(game_manager, timings, players, rounds) for _ in range(games)))
+    finally:
+        await game_manager.close()
+    return timings.summary()
+
+
+def scenario_key(games: int, players: int, rounds: int, db_latency: float, llm_latency: float) -> str:
+    return f"games={games},players={players},rounds={rounds},db_latency={db_latency},llm_latency={llm_latency}"
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Compares the mean durations with the baseline
+    Args:
+        results: Timing summaries by scenario key
+        baseline: Baseline timing summaries by scenario key
+        tolerance: Allowed slowdown, 0.25 allows means up to 25% slower than the baseline
+
+    Returns:
+        Descriptions of the regressions
+    """
+    regressions = []
+    for key, summary in results.items():
+        for operation, timing in summary.items():
+            baseline_timing = baseline.get(key, {}).get(operation)
+            if baseline_timing and timing["mean_us"] > baseline_timing["mean_us"] * (1 + tolerance):
+                regressions.append(
+                    f"{key} {operation}: {timing['mean_us']} us, baseline {baseline_timing['mean_us']} us"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, nargs="+", default=[1, 20])
+    parser.add_argument("--players", type=int, nargs="+", default=[2, 8])
+    parser.add_argument("--rounds", type=int, nargs="+", default=[5])
+    parser.add_argument("--db-latency", type=float, default=0.0, help="Seconds added to every database call")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Seconds added to every ChatGPT call")
+    action = parser.add_mutually_exclusive_group()
+    action.add_argument("--save-baseline", action="store_true", help=f"Store the results in {BASELINE_PATH.name}")
+    action.add_argument("--compare", action="store_true", help="Fail if the results are slower than the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+    logging.getLogger(LogConstants.APP_NAME).setLevel(logging.ERROR)
+
+    results = {}
+    for games, players, rounds in itertools.product(args.games, args.players, args.rounds):
+        key = scenario_key(games, players, rounds, args.db_latency, args.llm_latency)
+        results[key] = asyncio.run(run_scenario(games, players, rounds, args.db_latency, args.llm_latency))
+        print(key)
+        for operation, timing in results[key].items():
+            print(f"  {operation:<26}{timing['calls']:>7} calls{timing['mean_us']:>12.1f} us mean"
+                  f"{timing['p50_us']:>12.1f} us p50{timing['p95_us']:>12.1f} us p95")
+
+    if args.save_baseline:
+        baseline = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+        baseline.update(results)
+        BASELINE_PATH.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+        print(f"Baseline saved to {BASELINE_PATH}")
+    elif args.compare:
+        baseline = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+        if regressions := compare(results, baseline, args.tolerance):
+            print("Regressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print("No regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
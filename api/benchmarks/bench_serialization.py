@@ -0,0 +1,82 @@
+"""
+Compares the pydantic and orjson serialization paths of a game.
+
+Usage:
+    python -m benchmarks.bench_serialization [--players 10] [--rounds 10] [--number 2000]
+"""
+import argparse
+import json
+import timeit
+from datetime import datetime, timedelta
+
+import pytz
+from fastapi.encoders import jsonable_encoder
+
+from api.dal.documents import to_document
+from api.lib import movies, serialization
+from api.models.game import Game, Player, Round, GetGameWithResultsResponse
+
+
+def create_game(player_count: int, round_count: int) -> Game:
+    """
+    Creates a finished game with the given number of players and rounds
+    Args:
+        player_count: Number of players
+        round_count: Number of rounds
+
+    Returns:
+        Game object
+    """
+    players = [Player(handle=f"player_{i}", avatar=f"avatar_{i}", score=0) for i in range(player_count)]
+    now = datetime.now(pytz.timezone('UTC'))
+    rounds = [
+        Round(
+            emoji=movie["emoji"],
+            movie_name=movie["movie_name"],
+            start_time=now,
+            end_time=now + timedelta(minutes=1),
+            results={p.id: i % 2 == 0 for p in players},
+        )
+        for i, movie in zip(range(round_count), movies.emoji_movies * round_count)
+    ]
+    return Game(
+        created_by=players[0].id,
+        user_count=player_count,
+        round_count=round_count,
+        round_duration=timedelta(minutes=1),
+        players=players,
+        rounds=rounds,
+        results={p.id: round_count // 2 for p in players},
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+    game = create_game(args.players, args.rounds)
+    response = GetGameWithResultsResponse(status="OK", game=game)
+
+    def uncached_json_bytes():
+        response.game.invalidate()
+        return response.json_bytes()
+
+    cases = {
+        "document: Game.dict()": lambda: to_document(game.dict()),
+        "document: Game.to_dict()": lambda: to_document(game.to_dict()),
+        "players: Game.dict() + json.dumps": lambda: json.dumps(game.dict()["players"]),
+        "players: Player.to_dict() + orjson": lambda: serialization.dumps([p.to_dict() for p in game.players]),
+        "response: jsonable_encoder + json.dumps": lambda: json.dumps(jsonable_encoder(response)).encode(),
+        "response: json_bytes, uncached": uncached_json_bytes,
+        "response: json_bytes, cached": response.json_bytes,
+    }
+    print(f"{args.players} players, {args.rounds} rounds, {args.number} runs")
+    for name, case in cases.items():
+        seconds = min(timeit.repeat(case, number=args.number, repeat=3)) / args.number
+        print(f"{name:<45}{seconds * 1e6:>10.1f} us")
+
+
+if __name__ == "__main__":
+    main()
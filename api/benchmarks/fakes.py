@@ -0,0 +1,100 @@
+import asyncio
+import random
+from typing import Any, Dict
+
+from api.dal import documents
+from api.dal.database import Database
+from api.lib.movies import emoji_movies
+
+
+async def _wait(latency: float):
+    if latency > 0:
+        await asyncio.sleep(latency)
+
+
+class LatencyDatabase(Database):
+    """
+    In-memory Database store which waits `latency` seconds on every call, to stand in for Firestore.
+
+    Attributes:
+        latency: Seconds added to every call
+        calls: Number of calls by method name
+    """
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = {"get_game": 0, "upsert_game": 0, "update_game": 0, "add_player": 0}
+        self.__games: dict[str, Dict] = {}
+
+    async def get_game(self, game_id: str) -> Dict:
+        self.calls["get_game"] += 1
+        await _wait(self.latency)
+        if document := self.__games.get(game_id):
+            return documents.from_document(document)
+        return {}
+
+    async def upsert_game(self, game: Dict) -> Dict:
+        self.calls["upsert_game"] += 1
+        await _wait(self.latency)
+        self.__games[game["id"]] = documents.to_document(game)
+        return game
+
+    async def update_game(self, game_id: str, updates: Dict[str, Any]) -> None:
+        self.calls["update_game"] += 1
+        await _wait(self.latency)
+        documents.apply_updates(self.__games[game_id], updates)
+
+    async def add_player(self, game_id: str, player: Dict, max_players: int) -> bool:
+        self.calls["add_player"] += 1
+        await _wait(self.latency)
+        players = self.__games[game_id].get("players") or {}
+        if len(players) >= max_players:
+            return False
+        documents.apply_updates(self.__games[game_id], documents.player_added(player, len(players)))
+        return True
+
+
+class LatencyGPTManager:
+    """
+    Stand-in for AsyncChatGPTManager which answers from the built-in movie list after waiting `latency` seconds.
+
+    Attributes:
+        latency: Seconds added to every call
+        calls: Number of calls
+    """
+    def __init__(self, latency: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.calls = 0
+        self.__random = random.Random(seed)
+
+    async def get_movie_names_in_emoji_repr(self, count: int) -> list[dict[str:str]]:
+        self.calls += 1
+        await _wait(self.latency)
+        return self.__random.sample(emoji_movies, k=min(count, len(emoji_movies)))
+
+    async def check_if_right_guess(self, movie_list: list[dict], emoji: str, guessed_name: str) -> bool:
+        self.calls += 1
+        await _wait(self.latency)
+        return any(m["emoji"] == emoji and m["movie_name"] == guessed_name for m in movie_list)
+
+    async def close(self):
+        pass
+
+
+class NullWebSocket:
+    """
+    Websocket which accepts every message without sending it anywhere.
+
+    Attributes:
+        received: Number of messages sent to the socket
+    """
+    def __init__(self):
+        self.received = 0
+
+    async def accept(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def send_text(self, payload: str):
+        self.received += 1
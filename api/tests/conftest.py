@@ -0,0 +1,80 @@
+import asyncio
+import json
+
+from api.dal import documents
+from api.dal.database import Database
+from api.lib import movies
+
+
+class MockFirestore(Database):
+    def __init__(self):
+        self.games = {}
+
+    async def upsert_game(self, game):
+        self.games[game.get("id")] = documents.to_document(game)
+
+    async def get_game(self, game_id):
+        if game_id in self.games:
+            if documents.has_list_layout(self.games[game_id]):
+                self.games[game_id] = documents.to_document(self.games[game_id])
+            return documents.from_document(self.games[game_id])
+
+    async def update_game(self, game_id, updates):
+        documents.apply_updates(self.games[game_id], updates)
+
+    async def add_player(self, game_id, player, max_players):
+        players = self.games[game_id].get("players") or {}
+        if len(players) >= max_players:
+            return False
+        documents.apply_updates(self.games[game_id], documents.player_added(player, len(players)))
+        return True
+
+
+class MockGPTManager:
+    def __init__(self):
+        self.movies = movies.emoji_movies
+
+    async def get_movie_names_in_emoji_repr(self, count):
+        return [self.movies[0]] * count
+
+    async def check_if_right_guess(self, movie_list, emoji, guessed_name):
+        if self.movies[0][emoji] == guessed_name:
+            return True
+        else:
+            return False
+
+    async def close(self):
+        pass
+
+
+class MockWebSocket:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.accepted = False
+        self.closed = False
+        self.messages = []
+
+    async def accept(self):
+        self.accepted = True
+
+    async def close(self):
+        self.closed = True
+
+    async def send_json(self, message):
+        self.messages.append(message)
+
+    async def send_text(self, payload):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.messages.append(json.loads(payload))
+
+    def message_types(self):
+        return [m.get("message_type") for m in self.messages]
+
+
+async def wait_until(condition, timeout=1.0):
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    assert condition()
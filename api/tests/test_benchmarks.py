@@ -0,0 +1,22 @@
+import pytest
+
+from benchmarks.bench_game_manager import compare, run_scenario, scenario_key
+
+
+class TestBenchmarks:
+    @pytest.mark.asyncio
+    async def test_scenario_times_every_operation(self):
+        summary = await run_scenario(games=2, players=3, rounds=2, db_latency=0, llm_latency=0)
+        assert summary["create_game"]["calls"] == 2
+        assert summary["add_player"]["calls"] == 4
+        assert summary["submit_guess"]["calls"] == 12
+        assert summary["end_round"]["calls"] == 4
+        assert summary["end_game"]["calls"] == 2
+
+    def test_slower_operations_are_regressions(self):
+        key = scenario_key(1, 2, 5, 0, 0)
+        baseline = {key: {"submit_guess": {"mean_us": 100.0}, "end_round": {"mean_us": 100.0}}}
+        results = {key: {"submit_guess": {"mean_us": 120.0}, "end_round": {"mean_us": 130.0},
+                         "end_game": {"mean_us": 500.0}}}
+        regressions = compare(results, baseline, tolerance=0.25)
+        assert len(regressions) == 1 and "end_round" in regressions[0]
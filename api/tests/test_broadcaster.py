@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+from api.bal.broadcaster import Broadcaster, SlowConsumerPolicy
+from tests.conftest import MockWebSocket
+
+
+class ClosedWebSocket(MockWebSocket):
+    async def send_text(self, payload):
+        raise RuntimeError("Cannot call \"send\" once a close message has been sent.")
+
+
+class TestBroadcaster:
+    @pytest.mark.asyncio
+    async def test_broadcast_reaches_every_player(self):
+        broadcaster = Broadcaster()
+        sockets = [MockWebSocket() for _ in range(3)]
+        for i, websocket in enumerate(sockets):
+            broadcaster.register("game", f"player_{i}", websocket)
+        fanout = broadcaster.broadcast("game", {"message_type": "new_round"})
+        assert await fanout.wait(1)
+        assert fanout.recipients == 3
+        assert all(websocket.messages == [{"message_type": "new_round"}] for websocket in sockets)
+        assert broadcaster.fanout_stats.count == 1
+        assert broadcaster.fanout_stats.last_seconds == fanout.seconds
+
+    @pytest.mark.asyncio
+    async def test_slow_player_does_not_delay_the_others(self):
+        broadcaster = Broadcaster()
+        slow_socket, fast_socket = MockWebSocket(delay=0.5), MockWebSocket()
+        broadcaster.register("game", "slow", slow_socket)
+        broadcaster.register("game", "fast", fast_socket)
+        fanout = broadcaster.broadcast("game", {"message_type": "new_round"})
+        await asyncio.sleep(0.05)
+        assert fast_socket.messages == [{"message_type": "new_round"}]
+        assert slow_socket.messages == []
+        assert await fanout.wait(1)
+
+    @pytest.mark.asyncio
+    async def test_slow_consumer_is_evicted_when_its_queue_is_full(self):
+        broadcaster = Broadcaster(queue_size=1, slow_consumer_policy=SlowConsumerPolicy.EVICT)
+        slow_socket = MockWebSocket(delay=1)
+        broadcaster.register("game", "slow", slow_socket)
+        for i in range(3):
+            broadcaster.broadcast("game", {"message": i})
+        await asyncio.sleep(0)
+        assert "slow" not in broadcaster.connections["game"]
+        assert slow_socket.closed
+        assert broadcaster.fanout_stats.evicted == 1
+
+    @pytest.mark.asyncio
+    async def test_slow_consumer_misses_messages_when_dropping(self):
+        broadcaster = Broadcaster(queue_size=1, slow_consumer_policy=SlowConsumerPolicy.DROP)
+        slow_socket = MockWebSocket(delay=0.05)
+        broadcaster.register("game", "slow", slow_socket)
+        fanouts = [broadcaster.broadcast("game", {"message": i}) for i in range(3)]
+        for fanout in fanouts:
+            assert await fanout.wait(1)
+        assert "slow" in broadcaster.connections["game"]
+        assert broadcaster.fanout_stats.dropped == 2
+        assert slow_socket.messages == [{"message": 0}]
+
+    @pytest.mark.asyncio
+    async def test_closed_connection_is_removed(self):
+        broadcaster = Broadcaster()
+        broadcaster.register("game", "closed", ClosedWebSocket())
+        fanout = broadcaster.broadcast("game", {"message_type": "new_round"})
+        assert await fanout.wait(1)
+        assert "closed" not in broadcaster.connections["game"]
+
+    @pytest.mark.asyncio
+    async def test_closing_the_game_sends_queued_messages(self):
+        broadcaster = Broadcaster()
+        websocket = MockWebSocket(delay=0.01)
+        broadcaster.register("game", "player", websocket)
+        fanout = broadcaster.broadcast("game", {"message_type": "end_game"})
+        broadcaster.close_game("game")
+        assert "game" not in broadcaster.connections
+        assert await fanout.wait(1)
+        assert websocket.messages == [{"message_type": "end_game"}]
@@ -0,0 +1,98 @@
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+import openai
+import pytest
+
+from api.lib.chatgpt import AsyncChatGPTManager
+from api.lib.movies import emoji_movies
+
+
+def chat_response(content):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+class TestAsyncChatGPTManager:
+    def initialize_tests(self, monkeypatch, content="yes", delay=0.0, **kwargs):
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+        async def acreate(**_):
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            try:
+                await asyncio.sleep(delay)
+            finally:
+                self.in_flight -= 1
+            return chat_response(content)
+
+        monkeypatch.setattr(openai.ChatCompletion, "acreate", acreate)
+        self.gpt_manager = AsyncChatGPTManager(**kwargs)
+
+    @pytest.mark.asyncio
+    async def test_check_if_right_guess(self, monkeypatch):
+        self.initialize_tests(monkeypatch, content="Yes")
+        assert await self.gpt_manager.check_if_right_guess(emoji_movies[:1], "🦁👑", "lion king")
+        await self.gpt_manager.close()
+
+    @pytest.mark.asyncio
+    async def test_get_movie_names_in_emoji_repr(self, monkeypatch):
+        self.initialize_tests(monkeypatch, content='Sure: [{"🦁👑": "The Lion King"}]')
+        movies = await self.gpt_manager.get_movie_names_in_emoji_repr(1)
+        assert movies == [{"emoji": "🦁👑", "movie_name": "The Lion King"}]
+        await self.gpt_manager.close()
+
+    @pytest.mark.asyncio
+    async def test_requests_are_limited_and_time_out(self, monkeypatch):
+        self.initialize_tests(monkeypatch, delay=1, max_concurrency=2, timeout=0.1)
+        start = time.perf_counter()
+        results = await asyncio.gather(*[
+            self.gpt_manager.check_if_right_guess(emoji_movies[:1], "🦁👑", "lion king") for _ in range(4)
+        ])
+        assert results == [None] * 4
+        assert self.max_in_flight == 2
+        # The requests waiting for a slot time out along with the ones in flight, not one timeout later
+        assert time.perf_counter() - start < 0.18
+        movies = await self.gpt_manager.get_movie_names_in_emoji_repr(3)
+        assert len(movies) == 3
+        await self.gpt_manager.close()
+
+    @pytest.mark.asyncio
+    async def test_concurrent_movie_requests_share_a_prompt(self, monkeypatch):
+        prompts = []
+
+        async def acreate(messages, **_):
+            count = int(messages[-1]["content"])
+            prompts.append(count)
+            await asyncio.sleep(0.01)
+            # Every movie is returned twice, the duplicates must not be given out
+            movies = [{f"emoji_{i}": f"movie_{i}"} for i in range(count - 2) for _ in range(2)]
+            return chat_response(json.dumps(movies))
+
+        monkeypatch.setattr(openai.ChatCompletion, "acreate", acreate)
+        gpt_manager = AsyncChatGPTManager(max_movies_per_prompt=10)
+        first = asyncio.get_running_loop().create_task(gpt_manager.get_movie_names_in_emoji_repr(2))
+        await asyncio.sleep(0)
+        results = await asyncio.gather(first, *[gpt_manager.get_movie_names_in_emoji_repr(4) for _ in range(3)])
+        # The first request is sent right away, the others are merged while it's in flight
+        assert prompts == [2, 8, 4]
+        assert [len(movies) for movies in results] == [2, 4, 4, 4]
+        for movies in results:
+            assert len({m["movie_name"] for m in movies}) == len(movies)
+        # The merged prompt gave 6 different movies, the built-in list makes up for the 2 missing ones
+        assert [m["movie_name"] for m in results[1] + results[2][:2]] == [f"movie_{i}" for i in range(6)]
+        assert all(not m["movie_name"].startswith("movie_") for m in results[2][2:])
+        await gpt_manager.close()
+
+    def test_split_movies_tops_up_from_the_built_in_list(self):
+        generated = [{"emoji": "🦁👑", "movie_name": "The Lion King"}, {"emoji": "", "movie_name": "Invalid"}]
+        first, second = AsyncChatGPTManager.split_movies(generated, [2, 3])
+        assert first[0] == generated[0] and len(first) == 2 and len(second) == 3
+        assert "Invalid" not in {m["movie_name"] for m in first + second}
+        assert len({m["movie_name"] for m in second}) == 3
+        # Some built-in movies have several emoji, each name is still given once
+        unique_names = {m["movie_name"] for m in emoji_movies}
+        [every_movie] = AsyncChatGPTManager.split_movies([], [len(unique_names)])
+        assert {m["movie_name"] for m in every_movie} == unique_names
@@ -1,21 +1,26 @@
 import asyncio
+import copy
 import json
-from collections import defaultdict
 from datetime import timedelta
 
 import pytest
-import pytz
 from fastapi import FastAPI
 from fastapi.testclient import TestClient
-from starlette.websockets import WebSocket
 
+from api.bal.game_cache import GameCache
 from api.bal.game_manager import GameManager
-from api.dal.database import Database
+from api.bal.round_completion import RoundCompletionTracker
+from api.bal.round_pool import RoundPool
+from api.dal import documents
 from api.errors.database import GameNotFoundError
+from api.errors.rate_limit import RateLimitedError
 from api.errors.game import PlayerLimitMetError, RoundNotExistsError, RoundNotStartedError, \
-    GameNotFinishedError
-from api.lib import movies
-from api.models.game import Game, Player
+    GameNotFinishedError, ActionNotPermittedError, RoundAlreadyEndedError
+from api.lib.matcher import Verdict
+from api.lib.rate_limit import TokenBucketLimiter
+from api.lib.verdict_cache import VerdictCache
+from api.models.game import Game, Player, Round
+from tests.conftest import MockFirestore, MockGPTManager, MockWebSocket, wait_until
 
 
 @pytest.fixture
@@ -25,44 +30,11 @@ async def test_client():
     return client
 
 
-class MockFirestore(Database):
-    def __init__(self):
-        self.games = {}
-
-    def upsert_game(self, game):
-        self.games[game.get("id")] = game
-
-    def get_game(self, game_id):
-        return self.games.get(game_id)
-
-
-class MockGPTManager:
-    def __init__(self):
-        self.movies = movies.emoji_movies
-
-    def get_movie_names_in_emoji_repr(self, count):
-        return [self.movies[0]] * count
-
-    def check_if_right_guess(self, movie_list, emoji, guessed_name):
-        if self.movies[0][emoji] == guessed_name:
-            return True
-        else:
-            return False
-
-
 @pytest.fixture
 def patched_game_manager():
     class PatchedGameManager(GameManager):
         def __init__(self):
-            # super().__init__()
-            # do something here
-            self.db_client: Database = MockFirestore()
-            self.gpt_client = MockGPTManager()
-            self.game = None
-            self.player_connections = defaultdict(dict[str:WebSocket])
-            self.game_events: dict[str:dict[str:asyncio.Event]] = {}
-            self.game_started_flag = False
-            self.tz = pytz.timezone('UTC')
+            super().__init__(db_client=MockFirestore(), gpt_client=MockGPTManager())
     return PatchedGameManager
 
 
@@ -75,6 +47,7 @@ class TestGameManager:
         monkeypatch.setattr(self.game_manager.db_client, "__init__", lambda x: x)
         monkeypatch.setattr(self.game_manager.db_client, "upsert_game", self.mock_firestore.upsert_game)
         monkeypatch.setattr(self.game_manager.db_client, "get_game", self.mock_firestore.get_game)
+        monkeypatch.setattr(self.game_manager.db_client, "update_game", self.mock_firestore.update_game)
         monkeypatch.setattr(self.game_manager.gpt_client, "get_movie_names_in_emoji_repr",
                             self.mock_gpt.get_movie_names_in_emoji_repr)
         monkeypatch.setattr(self.game_manager.gpt_client, "check_if_right_guess", self.mock_gpt.check_if_right_guess)
@@ -100,7 +73,7 @@ class TestGameManager:
         game = await self.game_manager.create_game(handle="test_handle", avatar="test_avatar", user_count=3,
                                                    round_count=2,
                                                    round_duration=timedelta(minutes=1))
-        player = self.game_manager.add_player(game_id=game.id, handle="player_handle", avatar="player_avatar")
+        player = await self.game_manager.add_player(game_id=game.id, handle="player_handle", avatar="player_avatar")
         assert isinstance(player, Player)
         assert player.handle == "player_handle"
         assert player.avatar == "player_avatar"
@@ -121,7 +94,7 @@ class TestGameManager:
                                                    round_count=2,
                                                    round_duration=timedelta(minutes=1))
         with pytest.raises(PlayerLimitMetError):
-            self.game_manager.add_player(game_id=game.id, handle="player_handle", avatar="player_avatar")
+            await self.game_manager.add_player(game_id=game.id, handle="player_handle", avatar="player_avatar")
 
     @pytest.mark.asyncio
     async def test_add_player_invalid_game_id(self, monkeypatch, patched_game_manager):
@@ -130,7 +103,7 @@ class TestGameManager:
                                                    round_count=2,
                                                    round_duration=timedelta(minutes=1))
         with pytest.raises(GameNotFoundError):
-            self.game_manager.add_player(game_id="invalid_id", handle="player_handle", avatar="player_avatar")
+            await self.game_manager.add_player(game_id="invalid_id", handle="player_handle", avatar="player_avatar")
 
     @pytest.mark.asyncio
     async def test_submit_guess_invalid_player_id(self, monkeypatch, patched_game_manager):
@@ -174,8 +147,8 @@ class TestGameManager:
                                                    round_duration=timedelta(minutes=1))
         results = {game.players[0].id: 1}
         game.results = results
-        self.game_manager.db_client.upsert_game(game.dict())
-        game_with_result = self.game_manager.get_game_with_results(game.id)
+        await self.game_manager.db_client.upsert_game(game.dict())
+        game_with_result = await self.game_manager.get_game_with_results(game.id)
         results = game_with_result.results
         assert game.results.get(game.players[0].id) == results.get(game.players[0].id)
         assert game.players[0].id in results.keys()
@@ -187,7 +160,526 @@ class TestGameManager:
                                                    round_count=1,
                                                    round_duration=timedelta(minutes=1))
         with pytest.raises(GameNotFinishedError):
-            self.game_manager.get_game_with_results(game.id)
+            await self.game_manager.get_game_with_results(game.id)
+
+    @pytest.mark.asyncio
+    async def test_cached_game_is_not_read_from_db(self, monkeypatch, patched_game_manager):
+        self.initialize_tests(monkeypatch, patched_game_manager)
+        game = await self.game_manager.create_game(handle="test_handle", avatar="test_avatar", user_count=3,
+                                                   round_count=1,
+                                                   round_duration=timedelta(minutes=1))
+        db_reads = []
+
+        async def get_game(game_id):
+            db_reads.append(game_id)
+
+        monkeypatch.setattr(self.game_manager.db_client, "get_game", get_game)
+        await self.game_manager.add_player(game_id=game.id, handle="player_handle", avatar="player_avatar")
+        is_valid, cached_game = await self.game_manager.is_game_valid(game.id)
+        assert is_valid
+        assert cached_game is game
+        assert len(game.players) == 2
+        await self.game_manager.write_behind.flush(game.id)
+        assert (await self.mock_firestore.get_game(game.id))["players"][1]["handle"] == "player_handle"
+        assert db_reads == []
+
+    @pytest.mark.asyncio
+    async def test_evicted_game_is_loaded_from_db(self, monkeypatch, patched_game_manager):
+        self.initialize_tests(monkeypatch, patched_game_manager)
+        game = await self.game_manager.create_game(handle="test_handle", avatar="test_avatar", user_count=3,
+                                                   round_count=1,
+                                                   round_duration=timedelta(minutes=1))
+        self.game_manager.games.evict(game.id)
+        loaded_games = await asyncio.gather(*[self.game_manager.is_game_valid(game.id) for _ in range(3)])
+        loaded_game = loaded_games[0][1]
+        assert all(g is loaded_game for _, g in loaded_games)
+        assert loaded_game is not game
+        assert loaded_game.id == game.id
+        assert game.id in self.game_manager.games
+
+    @pytest.mark.asyncio
+    async def test_round_end_event_starts_the_next_round(self, monkeypatch, patched_game_manager):
+        self.initialize_tests(monkeypatch, patched_game_manager)
+        game = await self.game_manager.create_game(handle="test_handle", avatar="test_avatar", user_count=1,
+                                                   round_count=2,
+                                                   round_duration=timedelta(minutes=1))
+        await self.game_manager.start_round(game.id)
+        first_round, second_round = game.rounds[0], game.rounds[1]
+        assert first_round.start_time is not None
+        self.game_manager.game_events[game.id][first_round.id].set()
+        for _ in range(100):
+            if second_round.start_time is not None:
+                break
+            await asyncio.sleep(0.01)
+        assert first_round.end_time is not None
+        assert first_round.results == {game.players[0].id: False}
+        assert second_round.start_time is not None
+        await self.game_manager.write_behind.flush(game.id)
+        stored_rounds = (await self.mock_firestore.get_game(game.id))["rounds"]
+        assert stored_rounds[0]["end_time"] == first_round.end_time
+        assert stored_rounds[0]["results"] == first_round.results
+        assert stored_rounds[1]["start_time"] == second_round.start_time
+        assert list(self.game_manager.game_events[game.id].keys()) == [second_round.id]
+        await self.game_manager.round_scheduler.close()
+
+    @pytest.mark.asyncio
+    async def test_last_player_joining_starts_the_game(self, monkeypatch, patched_game_manager):
+        self.initialize_tests(monkeypatch, patched_game_manager)
+        game = await self.game_manager.create_game(handle="test_handle", avatar="test_avatar", user_count=2,
+                                                   round_count=1,
+                                                   round_duration=timedelta(minutes=1))
+        player = await self.game_manager.add_player(game_id=game.id, handle="player_handle", avatar="player_avatar")
+        creator_socket, player_socket = MockWebSocket(), MockWebSocket()
+        await asyncio.wait_for(self.game_manager.join_game(game.id, game.created_by, creator_socket), 1)
+        assert game.rounds[0].start_time is None
+        await asyncio.wait_for(self.game_manager.join_game(game.id, player.id, player_socket), 1)
+        assert game.rounds[0].start_time is not None
+        await wait_until(lambda: len(creator_socket.messages) == 4 and len(player_socket.messages) == 3)
+        assert creator_socket.message_types() == ["player_join", "player_join", "game_start", "new_round"]
+        assert player_socket.message_types() == ["player_join", "game_start", "new_round"]
+        with pytest.raises(ActionNotPermittedError):
+            await self.game_manager.start_round_if_everyone_joined(game.id, game.created_by, force_start=True)
+        await self.game_manager.round_scheduler.close()
+
+    @pytest.mark.asyncio
+    async def test_players_can_reconnect_to_started_and_finished_games(self, monkeypatch, patched_game_manager):
+        self.initialize_tests(monkeypatch, patched_game_manager)
+        game = await self.game_manager.create_game(handle="test_handle", avatar="test_avatar", user_count=1,
+                                                   round_count=2,
+                                                   round_duration=timedelta(minutes=1))
+        websocket = MockWebSocket()
+        await asyncio.wait_for(self.game_manager.join_game(game.id, game.created_by, websocket), 1)
+        assert game.rounds[0].start_time is not None
+        self.game_manager.leave_game(game.id, game.created_by, websocket)
+        # After an eviction or a restart, the game is loaded again and nothing knows it was started
+        self.game_manager.games.evict(game.id)
+        self.game_manager.started_games.clear()
+        websocket = MockWebSocket()
+        await asyncio.wait_for(self.game_manager.join_game(game.id, game.created_by, websocket), 1)
+        assert websocket.accepted
+        self.game_manager.leave_game(game.id, game.created_by, websocket)
+        await self.game_manager.end_game(game.id)
+        websocket = MockWebSocket()
+        await asyncio.wait_for(self.game_manager.join_game(game.id, game.created_by, websocket), 1)
+        assert websocket.message_types() == ["player_join"]
+        await self.game_manager.close()
+
+    @pytest.mark.asyncio
+    async def test_obvious_guesses_are_graded_without_chatgpt(self, monkeypatch, patched_game_manager):
+        self.initialize_tests(monkeypatch, patched_game_manager)
+        game = await self.game_manager.create_game(handle="test_handle", avatar="test_avatar", user_count=2,
+                                                   round_count=1,
+                                                   round_duration=timedelta(minutes=1))
+        player = await self.game_manager.add_player(game_id=game.id, handle="player_handle", avatar="player_avatar")
+        gpt_calls = []
+
+        async def check_if_right_guess(movie_list, emoji, guessed_name):
+            gpt_calls.append(guessed_name)
+            return True
+
+        monkeypatch.setattr(self.game_manager.gpt_client, "check_if_right_guess", check_if_right_guess)
+        current_round = game.rounds[0]
+        current_round.emoji, current_round.movie_name = "🦁👑", "The Lion King"
+        await self.game_manager.start_round(game.id)
+        await self.game_manager.submit_guess(game.id, current_round.id, game.created_by, "the lion king")
+        await self.game_manager.submit_guess(game.id, current_round.id, player.id, "Toy Story")
+        assert current_round.results == {game.created_by: True, player.id: False}
+        assert gpt_calls == []
+        await self.game_manager.submit_guess(game.id, current_round.id, player.id, "Lion")
+        assert gpt_calls == ["Lion"]
+        await self.game_manager.submit_guess(game.id, current_round.id, game.created_by, "lion!")
+        assert gpt_calls == ["Lion"]
+        assert current_round.results == {game.created_by: True, player.id: True}
+        assert (self.game_manager.verdict_cache.hits, self.game_manager.verdict_cache.misses) == (1, 1)
+        assert (await self.mock_firestore.get_game(game.id))["rounds"][0]["results"] == {}
+        await self.game_manager.write_behind.flush(game.id)
+        assert (await self.mock_firestore.get_game(game.id))["rounds"][0]["results"] == current_round.results
+        await self.game_manager.round_scheduler.close()
+
+    @pytest.mark.asyncio
+    async def test_guesses_are_submitted_over_the_websocket(self, monkeypatch, patched_game_manager):
+        self.initialize_tests(monkeypatch, patched_game_manager)
+        game = await self.game_manager.create_game(handle="test_handle", avatar="test_avatar", user_count=1,
+                                                   round_count=2,
+                                                   round_duration=timedelta(minutes=1))
+        websocket = MockWebSocket()
+        await asyncio.wait_for(self.game_manager.join_game(game.id, game.created_by, websocket), 1)
+        current_round = game.rounds[0]
+        await self.game_manager.receive_message(game.id, game.created_by, "not json")
+        await self.game_manager.receive_message(game.id, game.created_by, json.dumps({
+            "message_type": "submit_guess",
+            "meta": {"round_id": game.rounds[1].id, "movie_name": current_round.movie_name},
+        }))
+        await wait_until(lambda: websocket.message_types()[-1] == "guess_error")
+        assert websocket.messages[-1]["meta"]["round_id"] == game.rounds[1].id
+        await self.game_manager.receive_message(game.id, game.created_by, json.dumps({
+            "message_type": "submit_guess",
+            "meta": {"round_id": current_round.id, "movie_name": current_round.movie_name},
+        }))
+        await wait_until(lambda: "guess_result" in websocket.message_types())
+        assert websocket.messages[websocket.message_types().index("guess_result")]["meta"]["guess_result"] is True
+        assert current_round.results == {game.created_by: True}
+        assert self.game_manager.player_connections[game.id][game.created_by].last_pong is not None
+        await self.game_manager.close()
+
+    @pytest.mark.asyncio
+    async def test_scores_and_leaderboard_follow_the_guesses(self, monkeypatch, patched_game_manager):
+        self.initialize_tests(monkeypatch, patched_game_manager)
+        game = await self.game_manager.create_game(handle="test_handle", avatar="test_avatar", user_count=3,
+                                                   round_count=1,
+                                                   round_duration=timedelta(minutes=1))
+        second = await self.game_manager.add_player(game_id=game.id, handle="second", avatar="avatar")
+        third = await self.game_manager.add_player(game_id=game.id, handle="third", avatar="avatar")
+        websocket = MockWebSocket()
+        self.game_manager.broadcaster.register(game.id, game.created_by, websocket)
+        current_round = game.rounds[0]
+        await self.game_manager.start_round(game.id)
+        await self.game_manager.submit_guess(game.id, current_round.id, second.id, current_round.movie_name)
+        await self.game_manager.submit_guess(game.id, current_round.id, third.id, current_round.movie_name)
+        await self.game_manager.submit_guess(game.id, current_round.id, third.id, "zzzz qqqq")
+        assert [p.score for p in game.players] == [0, 1, 0]
+        leaderboard = json.loads(await self.game_manager.get_leaderboard(game.id))
+        assert [(s["rank"], s["id"], s["score"]) for s in leaderboard] == \
+               [(1, second.id, 1), (2, game.created_by, 0), (2, third.id, 0)]
+        assert await self.game_manager.get_leaderboard(game.id) is await self.game_manager.get_leaderboard(game.id)
+
+        await self.game_manager.end_round(game.id, current_round.id)
+        stored_players = (await self.mock_firestore.get_game(game.id))["players"]
+        assert [p["score"] for p in stored_players] == [0, 1, 0]
+        await wait_until(lambda: "leaderboard" in websocket.message_types())
+        assert websocket.messages[-1]["meta"]["leaderboard"] == leaderboard
+        await self.game_manager.end_game(game.id)
+        assert list(game.results.items()) == [(second.id, 1), (game.created_by, 0), (third.id, 0)]
+        await self.game_manager.round_scheduler.close()
+
+    @pytest.mark.asyncio
+    async def test_guesses_graded_after_the_round_ended_are_rejected(self, monkeypatch, patched_game_manager):
+        self.initialize_tests(monkeypatch, patched_game_manager)
+        game = await self.game_manager.create_game(handle="test_handle", avatar="test_avatar", user_count=2,
+                                                   round_count=1,
+                                                   round_duration=timedelta(minutes=1))
+        second = await self.game_manager.add_player(game_id=game.id, handle="second", avatar="avatar")
+        current_round = game.rounds[0]
+        await self.game_manager.start_round(game.id)
+        grading = asyncio.Event()
+
+        async def slow_check(movie_list, emoji, guessed_name):
+            grading.set()
+            await asyncio.sleep(0.2)
+            return True
+
+        monkeypatch.setattr(self.game_manager.answer_matcher, "grade", lambda movie_name, guess: Verdict.UNSURE)
+        monkeypatch.setattr(self.game_manager.gpt_client, "check_if_right_guess", slow_check)
+        guess = asyncio.create_task(
+            self.game_manager.submit_guess(game.id, current_round.id, second.id, "a late guess")
+        )
+        await grading.wait()
+        await self.game_manager.end_round(game.id, current_round.id)
+        await self.game_manager.end_game(game.id)
+        with pytest.raises(RoundAlreadyEndedError):
+            await guess
+        assert current_round.results == {game.created_by: False, second.id: False}
+        assert [p.score for p in game.players] == [0, 0]
+        assert game.id not in self.game_manager.games
+        stored_game = await self.mock_firestore.get_game(game.id)
+        assert [p["score"] for p in stored_game["players"]] == [0, 0]
+        assert stored_game["results"] == {game.created_by: 0, second.id: 0}
+        await self.game_manager.round_scheduler.close()
+
+    @pytest.mark.asyncio
+    async def test_round_ends_once_every_connected_player_answered(self, monkeypatch, patched_game_manager):
+        self.initialize_tests(monkeypatch, patched_game_manager)
+        game = await self.game_manager.create_game(handle="test_handle", avatar="test_avatar", user_count=3,
+                                                   round_count=2,
+                                                   round_duration=timedelta(minutes=1))
+        second = await self.game_manager.add_player(game_id=game.id, handle="second", avatar="avatar")
+        third = await self.game_manager.add_player(game_id=game.id, handle="third", avatar="avatar")
+        sockets = {player_id: MockWebSocket() for player_id in (game.created_by, second.id)}
+        for player_id, websocket in sockets.items():
+            await asyncio.wait_for(self.game_manager.join_game(game.id, player_id, websocket), 1)
+        await self.game_manager.start_round_if_everyone_joined(game.id, game.created_by, force_start=True)
+        first_round, second_round = game.rounds
+        assert self.game_manager.round_completion.pending(game.id) == {game.created_by, second.id}
+
+        # A player joining mid-round has to answer too, and a player leaving doesn't have to anymore
+        third_socket = MockWebSocket()
+        await asyncio.wait_for(self.game_manager.join_game(game.id, third.id, third_socket), 1)
+        await self.game_manager.submit_guess(game.id, first_round.id, game.created_by, "zzzz qqqq")
+        await self.game_manager.submit_guess(game.id, first_round.id, game.created_by, "qqqq zzzz")
+        assert self.game_manager.round_completion.pending(game.id) == {second.id, third.id}
+        self.game_manager.leave_game(game.id, third.id, third_socket)
+        await self.game_manager.submit_guess(game.id, first_round.id, second.id, first_round.movie_name)
+        await wait_until(lambda: second_round.start_time is not None)
+        assert first_round.end_time is not None
+        assert self.game_manager.round_completion.pending(game.id) == {game.created_by, second.id}
+
+        await self.game_manager.submit_guess(game.id, second_round.id, second.id, second_round.movie_name)
+        self.game_manager.leave_game(game.id, game.created_by, sockets[game.created_by])
+        await wait_until(lambda: second_round.end_time is not None)
+        await self.game_manager.close()
+
+    def test_round_completion_tracker(self):
+        tracker = RoundCompletionTracker()
+        tracker.start("game", "round", {"first", "second"})
+        assert not tracker.answered("game", "other_round", "first")
+        assert not tracker.answered("game", "round", "first")
+        assert not tracker.answered("game", "round", "first")
+        tracker.joined("game", "round", "third")
+        assert tracker.left("game", "third") is None
+        assert tracker.answered("game", "round", "second")
+        tracker.start("game", "next_round", {"first"})
+        assert tracker.left("game", "first") == "next_round"
+        tracker.finish("game")
+        assert len(tracker) == 0 and tracker.left("game", "first") is None
+
+    @pytest.mark.asyncio
+    async def test_abandoned_games_are_paused_ended_and_forgotten(self, monkeypatch, patched_game_manager):
+        self.initialize_tests(monkeypatch, patched_game_manager)
+        supervisor = self.game_manager.supervisor
+        game = await self.game_manager.create_game(handle="test_handle", avatar="test_avatar", user_count=2,
+                                                   round_count=2,
+                                                   round_duration=timedelta(minutes=1))
+        second = await self.game_manager.add_player(game_id=game.id, handle="second", avatar="avatar")
+        websocket = MockWebSocket()
+        await asyncio.wait_for(self.game_manager.join_game(game.id, game.created_by, websocket), 1)
+        await self.game_manager.start_round_if_everyone_joined(game.id, game.created_by, force_start=True)
+        first_round = game.rounds[0]
+        await supervisor.sweep()
+        assert first_round.id in self.game_manager.game_events[game.id]
+
+        # Everyone leaving pauses the round, and a player coming back resumes it with the time it had left
+        self.game_manager.leave_game(game.id, game.created_by, websocket)
+        await supervisor.sweep()
+        assert game.id not in self.game_manager.game_events and len(self.game_manager.round_scheduler) == 0
+        round_id, seconds_left = self.game_manager.paused_rounds[game.id]
+        assert round_id == first_round.id and 55 < seconds_left <= 60
+        await asyncio.wait_for(self.game_manager.join_game(game.id, second.id, MockWebSocket()), 1)
+        assert game.id not in self.game_manager.paused_rounds and len(self.game_manager.round_scheduler) == 1
+
+        # Past the grace period, the game is ended with the scores it has and its state is freed
+        second_socket = self.game_manager.player_connections[game.id][second.id].websocket
+        self.game_manager.leave_game(game.id, second.id, second_socket)
+        supervisor.grace_seconds = 0
+        await supervisor.sweep()
+        assert await supervisor.sweep() == [game.id]
+        stored_game = await self.mock_firestore.get_game(game.id)
+        assert stored_game["results"] == {game.created_by: 0, second.id: 0}
+        assert stored_game["rounds"][0]["end_time"] is not None and stored_game["rounds"][1]["start_time"] is None
+        assert game.id not in self.game_manager.games and game.id not in self.game_manager.started_games
+        assert not self.game_manager.game_events and not self.game_manager.paused_rounds
+        assert not self.game_manager.player_connections and len(self.game_manager.round_completion) == 0
+        assert len(self.game_manager.round_scheduler) == 0
+        await self.game_manager.close()
+
+    @pytest.mark.asyncio
+    async def test_lobbies_nobody_joins_are_evicted(self, monkeypatch, patched_game_manager):
+        self.initialize_tests(monkeypatch, patched_game_manager)
+        supervisor = self.game_manager.supervisor
+        supervisor.grace_seconds = 0
+        game = await self.game_manager.create_game(handle="test_handle", avatar="test_avatar", user_count=2,
+                                                   round_count=1,
+                                                   round_duration=timedelta(minutes=1))
+        second = await self.game_manager.add_player(game_id=game.id, handle="second", avatar="avatar")
+        await supervisor.sweep()
+        assert await supervisor.sweep() == [game.id]
+        assert game.id not in self.game_manager.games
+        is_valid, loaded_game = await self.game_manager.is_game_valid(game.id)
+        assert loaded_game.get_player(second.id) is not None and not loaded_game.results
+
+    @pytest.mark.asyncio
+    async def test_guesses_are_rate_limited_per_player(self, monkeypatch, patched_game_manager):
+        self.initialize_tests(monkeypatch, patched_game_manager)
+        self.game_manager.player_guess_limiter = TokenBucketLimiter(rate=0.01, burst=2)
+        game = await self.game_manager.create_game(handle="test_handle", avatar="test_avatar", user_count=2,
+                                                   round_count=1,
+                                                   round_duration=timedelta(minutes=1))
+        second = await self.game_manager.add_player(game_id=game.id, handle="second", avatar="avatar")
+        websocket = MockWebSocket()
+        self.game_manager.broadcaster.register(game.id, game.created_by, MockWebSocket())
+        self.game_manager.broadcaster.register(game.id, second.id, websocket)
+        await self.game_manager.start_round(game.id)
+        current_round = game.rounds[0]
+        for _ in range(2):
+            await self.game_manager.submit_guess(game.id, current_round.id, second.id, "zzzz qqqq")
+        with pytest.raises(RateLimitedError):
+            await self.game_manager.submit_guess(game.id, current_round.id, second.id, current_round.movie_name)
+        await self.game_manager.receive_message(game.id, second.id, json.dumps({
+            "message_type": "submit_guess",
+            "meta": {"round_id": current_round.id, "movie_name": current_round.movie_name},
+        }))
+        await wait_until(lambda: "guess_error" in websocket.message_types())
+        assert current_round.results[second.id] is False
+        await self.game_manager.submit_guess(game.id, current_round.id, game.created_by, current_round.movie_name)
+        assert current_round.results[game.created_by] is True
+        await self.game_manager.round_scheduler.close()
+
+    @pytest.mark.asyncio
+    async def test_game_timeline_is_traced(self, monkeypatch, patched_game_manager):
+        self.initialize_tests(monkeypatch, patched_game_manager)
+        game = await self.game_manager.create_game(handle="test_handle", avatar="test_avatar", user_count=2,
+                                                   round_count=1,
+                                                   round_duration=timedelta(minutes=1))
+        second = await self.game_manager.add_player(game_id=game.id, handle="second", avatar="avatar")
+        sockets = {player_id: MockWebSocket() for player_id in (game.created_by, second.id)}
+        for player_id, websocket in sockets.items():
+            await asyncio.wait_for(self.game_manager.join_game(game.id, player_id, websocket), 1)
+        current_round = game.rounds[0]
+        await wait_until(lambda: all("new_round" in s.message_types() for s in sockets.values()))
+        await self.game_manager.submit_guess(game.id, current_round.id, second.id, "zzzz qqqq")
+        await self.game_manager.end_round(game.id, current_round.id)
+        await self.game_manager.end_game(game.id)
+
+        timeline = self.game_manager.tracer.timeline(game.id)
+        names = [span["name"] for span in timeline["spans"]]
+        for name in ("create_rounds", "create_game", "join_game", "start_round", "broadcast", "submit_guess",
+                     "check_guess", "end_round", "end_game"):
+            assert name in names
+        assert timeline["spans"][0]["start"] == 0
+        [round_summary] = timeline["rounds"]
+        assert round_summary["round_id"] == current_round.id
+        assert round_summary["new_round_delivered_seconds"] > 0
+        assert len(round_summary["guess_verdict_seconds"]) == 1
+        assert self.game_manager.tracer.timeline("missing") is None
+        await self.game_manager.round_scheduler.close()
+
+    @pytest.mark.asyncio
+    async def test_rounds_are_taken_from_the_pool(self, monkeypatch, patched_game_manager):
+        self.initialize_tests(monkeypatch, patched_game_manager)
+        llm_calls = []
+
+        async def get_movie_names_in_emoji_repr(count):
+            llm_calls.append(count)
+            return [{"emoji": f"emoji_{i}", "movie_name": f"movie_{i}"} for i in range(3 * len(llm_calls))] + \
+                [{"emoji": ""}]
+
+        monkeypatch.setattr(self.game_manager.gpt_client, "get_movie_names_in_emoji_repr",
+                            get_movie_names_in_emoji_repr)
+        pool = self.game_manager.round_pool = RoundPool(self.game_manager.gpt_client, target_size=6,
+                                                        low_watermark=3, batch_size=4)
+        game = await self.game_manager.create_game(handle="test_handle", avatar="test_avatar", user_count=1,
+                                                   round_count=5,
+                                                   round_duration=timedelta(minutes=1))
+        assert llm_calls == []
+        assert len(game.rounds) == 5
+        assert len({r.movie_name for r in game.rounds}) == 5
+        await wait_until(lambda: len(pool) == 6)
+        assert llm_calls == [4, 4]
+        game = await self.game_manager.create_game(handle="test_handle", avatar="test_avatar", user_count=1,
+                                                   round_count=5,
+                                                   round_duration=timedelta(minutes=1))
+        assert [r.movie_name for r in game.rounds] == [f"movie_{i}" for i in range(5)]
+        await pool.close()
+
+    @pytest.mark.asyncio
+    async def test_updates_are_coalesced_per_game(self, monkeypatch, patched_game_manager):
+        self.initialize_tests(monkeypatch, patched_game_manager)
+        game = await self.game_manager.create_game(handle="test_handle", avatar="test_avatar", user_count=3,
+                                                   round_count=1,
+                                                   round_duration=timedelta(minutes=1))
+        writes = []
+
+        async def update_game(game_id, updates):
+            writes.append((game_id, dict(updates)))
+
+        monkeypatch.setattr(self.game_manager.db_client, "update_game", update_game)
+        self.game_manager.write_behind.flush_interval = 0.01
+        first = await self.game_manager.add_player(game_id=game.id, handle="player_1", avatar="player_avatar")
+        second = await self.game_manager.add_player(game_id=game.id, handle="player_2", avatar="player_avatar")
+        await self.game_manager.start_round(game.id)
+        await wait_until(lambda: writes)
+        assert len(writes) == 1
+        assert set(writes[0][1].keys()) == {f"players.{first.id}", f"players.{second.id}",
+                                            f"rounds.{game.rounds[0].id}.start_time"}
+        await self.game_manager.submit_guess(game.id, game.rounds[0].id, first.id, game.rounds[0].movie_name)
+        await self.game_manager.end_round(game.id, game.rounds[0].id)
+        assert len(writes) == 2
+        assert writes[1][1][f"rounds.{game.rounds[0].id}.results.{first.id}"] is True
+        assert writes[1][1][f"rounds.{game.rounds[0].id}.results.{second.id}"] is False
+        assert len(self.game_manager.write_behind) == 0
+        await self.game_manager.round_scheduler.close()
+
+    def test_merged_updates_apply_like_the_separate_updates(self):
+        document = {"players": {"p1": {"score": 0}}, "rounds": {"r1": {"results": {}}}}
+        updates = [
+            {"players.p2": {"score": 0}},
+            {"players.p2.score": 1},
+            {"rounds.r1.results.p1": True},
+            {"rounds.r1.results": {"p2": False}},
+            {"rounds.r1.results.p1": False},
+        ]
+        pending = {}
+        for update in updates:
+            documents.merge_updates(pending, update)
+        separately = copy.deepcopy(document)
+        for update in updates:
+            documents.apply_updates(separately, copy.deepcopy(update))
+        assert documents.apply_updates(copy.deepcopy(document), pending) == separately
+        assert updates[0] == {"players.p2": {"score": 0}}
+
+    def test_game_documents_round_trip_with_targeted_updates(self):
+        player = Player(handle="h", avatar="a", score=0)
+        game = Game(created_by=player.id, players=[player], rounds=[Round(emoji="e", movie_name="m"),
+                                                                     Round(emoji="f", movie_name="n")])
+        document = documents.to_document(game.dict())
+        assert set(document["rounds"].keys()) == {r.id for r in game.rounds}
+        new_player = Player(handle="h2", avatar="a2", score=0)
+        documents.apply_updates(document, documents.player_added(new_player.dict(), 1))
+        documents.apply_updates(document, documents.guess_recorded(game.rounds[1].id, new_player.id, True))
+        stored_game = documents.from_document(document)
+        assert [p["id"] for p in stored_game["players"]] == [player.id, new_player.id]
+        assert [r["id"] for r in stored_game["rounds"]] == [r.id for r in game.rounds]
+        assert stored_game["rounds"][1]["results"] == {new_player.id: True}
+        assert "order" not in stored_game["rounds"][0]
+        assert documents.from_document(game.dict()) == game.dict()
+
+    def test_game_documents_stored_as_lists_are_migrated_before_updates(self):
+        player = Player(handle="h", avatar="a", score=0)
+        game = Game(created_by=player.id, players=[player], rounds=[Round(emoji="e", movie_name="m")])
+        legacy_document = game.dict()
+        assert documents.has_list_layout(legacy_document)
+        document = documents.to_document(legacy_document)
+        assert not documents.has_list_layout(document)
+        documents.apply_updates(document, documents.guess_recorded(game.rounds[0].id, player.id, True))
+        documents.apply_updates(document, documents.player_scored(player.id, 1))
+        stored_game = documents.from_document(document)
+        assert stored_game["rounds"][0]["results"] == {player.id: True} and stored_game["players"][0]["score"] == 1
+
+    @pytest.mark.asyncio
+    async def test_games_stored_as_lists_can_still_be_played(self, monkeypatch, patched_game_manager):
+        self.initialize_tests(monkeypatch, patched_game_manager)
+        player = Player(handle="h", avatar="a", score=0)
+        game = Game(created_by=player.id, players=[player], rounds=[Round(emoji="e", movie_name="m")],
+                    user_count=2, round_count=1, round_duration=timedelta(minutes=1))
+        self.mock_firestore.games[game.id] = game.dict()
+        new_player = await self.game_manager.add_player(game_id=game.id, handle="h2", avatar="a2")
+        await self.game_manager.write_behind.flush(game.id)
+        stored_game = await self.mock_firestore.get_game(game.id)
+        assert [p["id"] for p in stored_game["players"]] == [player.id, new_player.id]
+
+    def test_verdict_cache_is_bounded_and_expires(self):
+        cache = VerdictCache(max_size=2, ttl_seconds=3600)
+        cache.put("The Lion King", "🦁👑", "Lion", True)
+        cache.put("The Lion King", "🦁👑", "Tiger King", False)
+        assert cache.get("The Lion King", "🦁👑", "the lion") is True
+        cache.put("Up", "🎈", "Balloon", False)
+        assert cache.get("The Lion King", "🦁👑", "Tiger King") is None
+        assert len(cache) == 2
+        cache.ttl_seconds = 0
+        cache.put("Up", "🎈", "Balloon", False)
+        assert cache.get("Up", "🎈", "Balloon") is None
+        assert (cache.hits, cache.misses) == (1, 2)
+
+    def test_game_cache_evicts_idle_and_overflowing_games(self):
+        games = [Game(created_by="p", players=[Player(handle="h", avatar="a", score=0)],
+                      rounds=[Round(emoji="e", movie_name="m")]) for _ in range(3)]
+        cache = GameCache(max_idle_seconds=3600, max_size=2)
+        for game in games:
+            cache.put(game)
+        assert games[0].id not in cache
+        assert len(cache) == 2
+        cache.max_idle_seconds = 0
+        assert sorted(cache.evict_idle()) == sorted([games[1].id, games[2].id])
+        assert len(cache) == 0
 
     # @pytest.mark.anyio
     # async def test_submit_guess_ended_round_id(self, monkeypatch):
@@ -248,7 +740,7 @@ class TestGameManager:
     #     self.initialize_tests(monkeypatch)
     #     game = self.game_manager.create_game(handle="test_handle", avatar="test_avatar", user_count=2, round_count=1,
     #                                          round_duration=timedelta(minutes=1))
-    #     player = self.game_manager.add_player(game_id=game.id, handle="player_handle", avatar="player_avatar")
+    #     player = await self.game_manager.add_player(game_id=game.id, handle="player_handle", avatar="player_avatar")
     #     websocket = test_client.websocket_connect(f"/ws")
     #     await self.game_manager.join_game(game.id, player.id, websocket)
     #     response = await websocket.receive_json()
@@ -263,7 +755,7 @@ class TestGameManager:
     #         game = self.game_manager.create_game(handle="test_handle", avatar="test_avatar", user_count=1,
     #                                              round_count=1,
     #                                              round_duration=timedelta(minutes=1))
-    #         _ = self.game_manager.add_player(game_id=game.id, handle="player_handle", avatar="player_avatar")
+    #         _ = await self.game_manager.add_player(game_id=game.id, handle="player_handle", avatar="player_avatar")
     #         async with test_client.websocket_connect(f"/ws") as websocket:
     #             await self.game_manager.join_game(game.id, "Invalid player id", websocket)
     #
@@ -274,6 +766,6 @@ class TestGameManager:
     #         game = self.game_manager.create_game(handle="test_handle", avatar="test_avatar", user_count=1,
     #                                              round_count=1,
     #                                              round_duration=timedelta(minutes=1))
-    #         _ = self.game_manager.add_player(game_id=game.id, handle="player_handle", avatar="player_avatar")
+    #         _ = await self.game_manager.add_player(game_id=game.id, handle="player_handle", avatar="player_avatar")
     #         async with test_client.websocket_connect(f"/ws") as websocket:
     #             await self.game_manager.join_game(game.id, "Invalid player id", websocket)
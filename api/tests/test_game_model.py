@@ -0,0 +1,42 @@
+from datetime import datetime
+
+import pytz
+
+from api.dal.documents import to_document, from_document
+from api.models.game import Game, Player
+from benchmarks.bench_serialization import create_game
+
+
+class TestGameModel:
+    def test_rounds_and_players_are_indexed_by_id(self):
+        game = create_game(player_count=3, round_count=3)
+        assert all(game.get_round(r.id) is r for r in game.rounds)
+        assert all(game.get_player(p.id) is p for p in game.players)
+        assert game.get_round("missing") is None and game.get_player("missing") is None
+        player = Player(handle="late_player", avatar="avatar", score=0)
+        game.add_player(player)
+        assert game.get_player(player.id) is player and game.players[-1] is player
+
+    def test_rounds_are_started_in_order(self):
+        game = create_game(player_count=1, round_count=2)
+        for r in game.rounds:
+            r.start_time = r.end_time = None
+        game.reindex()
+        assert not game.has_started and game.current_round is None
+        now = datetime.now(pytz.timezone('UTC'))
+        first_round = game.start_next_round(now)
+        assert first_round is game.rounds[0] and game.current_round is first_round and game.has_started
+        first_round.end_time = now
+        assert game.current_round is None
+        assert game.start_next_round(now) is game.rounds[1]
+        assert game.start_next_round(now) is None
+
+    def test_next_round_is_found_when_loading_a_game(self):
+        game = create_game(player_count=1, round_count=3)
+        game.rounds[2].start_time = game.rounds[2].end_time = None
+        game_dict = from_document(to_document(game.to_dict()))
+        game_dict["round_duration"] = game.round_duration
+        loaded_game = Game(**game_dict)
+        assert loaded_game.get_round(game.rounds[1].id).movie_name == game.rounds[1].movie_name
+        assert loaded_game.start_next_round(datetime.now(pytz.timezone('UTC'))).id == game.rounds[2].id
+        assert [m["emoji"] for m in loaded_game.movie_emojis()] == [r.emoji for r in game.rounds]
@@ -0,0 +1,78 @@
+import time
+
+import pytest
+
+from api.bal.broadcaster import Broadcaster
+from api.bal.game_supervisor import GameSupervisor
+from tests.conftest import MockWebSocket
+
+
+class SupervisorCalls:
+    def __init__(self):
+        self.empty = []
+        self.occupied = []
+        self.abandoned = []
+        self.published = []
+
+    async def abandon(self, game_id):
+        self.abandoned.append(game_id)
+
+    async def publish(self, players):
+        self.published.append(players)
+
+
+def create_supervisor(broadcaster, games, calls, grace_seconds=0):
+    return GameSupervisor(
+        broadcaster,
+        "local_worker",
+        watched_games=lambda: games,
+        on_empty=calls.empty.append,
+        on_occupied=calls.occupied.append,
+        on_abandoned=calls.abandon,
+        publish_presence=calls.publish,
+        interval=60,
+        grace_seconds=grace_seconds,
+    )
+
+
+class TestGameSupervisor:
+    @pytest.mark.asyncio
+    async def test_empty_games_are_paused_then_abandoned(self):
+        broadcaster, calls = Broadcaster(), SupervisorCalls()
+        broadcaster.register("connected", "player", MockWebSocket())
+        supervisor = create_supervisor(broadcaster, {"connected", "empty"}, calls)
+        assert await supervisor.sweep() == []
+        assert calls.empty == ["empty"] and supervisor.is_empty("empty")
+        assert calls.published == [{"connected": ["player"]}]
+        assert await supervisor.sweep() == ["empty"]
+        assert calls.abandoned == ["empty"] and not supervisor.is_empty("empty")
+
+    @pytest.mark.asyncio
+    async def test_players_coming_back_resume_the_game(self):
+        broadcaster, calls = Broadcaster(), SupervisorCalls()
+        supervisor = create_supervisor(broadcaster, {"local", "remote"}, calls, grace_seconds=60)
+        await supervisor.sweep()
+        assert sorted(calls.empty) == ["local", "remote"]
+        broadcaster.register("local", "player", MockWebSocket())
+        supervisor.joined("local")
+        supervisor.presence("remote_worker", {"remote": ["remote_player"]})
+        assert calls.occupied == ["local"]
+        await supervisor.sweep()
+        assert sorted(calls.occupied) == ["local", "remote"] and calls.abandoned == []
+        broadcaster.unregister("local", "player")
+        assert "local" not in broadcaster.connections
+
+    @pytest.mark.asyncio
+    async def test_players_of_other_workers_are_counted_until_their_worker_goes_silent(self, monkeypatch):
+        broadcaster, calls = Broadcaster(), SupervisorCalls()
+        broadcaster.register("game", "local_player", MockWebSocket())
+        supervisor = create_supervisor(broadcaster, {"game"}, calls)
+        supervisor.presence("remote_worker", {"game": ["first", "second"]})
+        assert supervisor.connected_players("game") == {
+            "local_player": "local_worker", "first": "remote_worker", "second": "remote_worker"
+        }
+        assert supervisor.players_changed("remote_worker", "game", ["second", "third"]) == ({"third"}, {"first"})
+        assert set(supervisor.connected_players("game")) == {"local_player", "second", "third"}
+        now = time.monotonic()
+        monkeypatch.setattr(time, "monotonic", lambda: now + 2 * supervisor.interval + 1)
+        assert supervisor.connected_players("game") == {"local_player": "local_worker"}
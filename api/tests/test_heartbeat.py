@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+
+from api.bal.broadcaster import Broadcaster
+from api.bal.game_manager import GameManager
+from api.bal.heartbeat import HeartbeatScheduler
+from tests.conftest import MockFirestore, MockGPTManager, MockWebSocket, wait_until
+
+
+class TestHeartbeatScheduler:
+    @pytest.mark.asyncio
+    async def test_heartbeat_reaches_every_player(self):
+        broadcaster = Broadcaster()
+        sockets = [MockWebSocket() for _ in range(3)]
+        for i, websocket in enumerate(sockets):
+            broadcaster.register(f"game_{i % 2}", f"player_{i}", websocket)
+        heartbeat = HeartbeatScheduler(broadcaster, interval=0.05)
+        heartbeat.start()
+        await wait_until(lambda: all(len(websocket.messages) >= 2 for websocket in sockets))
+        await heartbeat.close()
+        assert all(m["message_type"] == "heartbeat" for websocket in sockets for m in websocket.messages)
+
+    @pytest.mark.asyncio
+    async def test_player_missing_pongs_is_disconnected(self):
+        broadcaster = Broadcaster()
+        silent_socket, answering_socket, legacy_socket = MockWebSocket(), MockWebSocket(), MockWebSocket()
+        broadcaster.register("game", "silent", silent_socket)
+        broadcaster.register("game", "answering", answering_socket)
+        broadcaster.register("game", "legacy", legacy_socket)
+        heartbeat = HeartbeatScheduler(broadcaster, interval=0.05, max_missed_pongs=2)
+        heartbeat.pong("game", "silent")
+        heartbeat.pong("game", "answering")
+        assert heartbeat.beat() == 0
+        await asyncio.sleep(0.12)
+        heartbeat.pong("game", "answering")
+        assert heartbeat.beat() == 1
+        assert set(broadcaster.connections["game"].keys()) == {"answering", "legacy"}
+        await wait_until(lambda: silent_socket.closed)
+        assert not answering_socket.closed and not legacy_socket.closed
+
+    def test_heartbeat_settings_are_read_from_the_environment(self, monkeypatch):
+        monkeypatch.setenv("HEARTBEAT_INTERVAL_SECONDS", "0.5")
+        monkeypatch.setenv("HEARTBEAT_MAX_MISSED_PONGS", "5")
+        game_manager = GameManager(db_client=MockFirestore(), gpt_client=MockGPTManager())
+        assert game_manager.heartbeat.interval == 0.5 and game_manager.heartbeat.max_missed_pongs == 5
@@ -0,0 +1,48 @@
+import pytest
+
+from api.lib.matcher import AnswerMatcher, Verdict, normalize_title, edit_distance
+
+
+@pytest.mark.parametrize("title, normalized", [
+    ("The Lion King", "lion king"),
+    ("  the LION king!! ", "lion king"),
+    ("E.T. the Extra-Terrestrial", "et extra terrestrial"),
+    ("Pete's Dragon", "petes dragon"),
+    ("Fast & Furious", "fast and furious"),
+    ("Amélie", "amelie"),
+])
+def test_normalize_title(title, normalized):
+    assert normalize_title(title) == normalized
+
+
+def test_edit_distance():
+    assert edit_distance("kitten", "sitting") == 3
+    assert edit_distance("", "up") == 2
+    assert edit_distance("heat", "heat") == 0
+
+
+@pytest.mark.parametrize("movie_name, guessed_name, verdict", [
+    ("The Lion King", "the lion king", Verdict.CORRECT),
+    ("The Lion King", "Lion King", Verdict.CORRECT),
+    ("Fast and Furious", "fast & furious", Verdict.CORRECT),
+    ("Jurassic Park", "jurasic park", Verdict.CORRECT),
+    ("Spider-Man", "spiderman", Verdict.CORRECT),
+    ("The Lion King", "Toy Story", Verdict.INCORRECT),
+    ("Up", "", Verdict.INCORRECT),
+    ("Harry Potter", "Harry Potter and the Chamber of Secrets", Verdict.UNSURE),
+    ("E.T. the Extra-Terrestrial", "ET", Verdict.UNSURE),
+    ("Jurassic Park", "Jurassic World", Verdict.UNSURE),
+    ("Rocky II", "rocky ii", Verdict.CORRECT),
+    ("Toy Story 3", "Toy Story 2", Verdict.UNSURE),
+    ("Rocky II", "Rocky IV", Verdict.UNSURE),
+    ("Iron Man 2", "Iron Man 3", Verdict.UNSURE),
+    ("The Godfather Part II", "The Godfather Part III", Verdict.UNSURE),
+])
+def test_grade(movie_name, guessed_name, verdict):
+    assert AnswerMatcher().grade(movie_name, guessed_name) == verdict
+
+
+def test_grade_thresholds_are_tunable():
+    assert AnswerMatcher().grade("Jurassic Park", "Jurassic World") == Verdict.UNSURE
+    assert AnswerMatcher(reject_threshold=0.9).grade("Jurassic Park", "Jurassic World") == Verdict.INCORRECT
+    assert AnswerMatcher(accept_threshold=0.6).grade("Jurassic Park", "Jurassic World") == Verdict.CORRECT
@@ -0,0 +1,270 @@
+import asyncio
+import copy
+from collections import defaultdict
+from datetime import timedelta
+
+import pytest
+import pytest_asyncio
+
+from api.bal.game_manager import GameManager
+from api.errors.game import PlayerLimitMetError
+from api.errors.message_bus import MessageBusError
+from api.lib.message_bus import InProcessMessageBus, RedisMessageBus, encode_command, read_reply
+from api.models.game import Player
+from tests.conftest import MockFirestore, MockGPTManager, MockWebSocket, wait_until
+
+
+def encode_reply(reply) -> bytes:
+    if isinstance(reply, int):
+        return b":%d\r\n" % reply
+    if isinstance(reply, list):
+        return b"*%d\r\n" % len(reply) + b"".join(encode_reply(r) for r in reply)
+    return b"$%d\r\n%s\r\n" % (len(reply), reply)
+
+
+class FakeRedisServer:
+    """
+    Local server speaking enough of the Redis protocol for the pub/sub commands of RedisMessageBus
+    """
+    def __init__(self, password=None):
+        self.password = password
+        self.subscribers: defaultdict[bytes, set[asyncio.StreamWriter]] = defaultdict(set)
+        self.connections: set[asyncio.StreamWriter] = set()
+        self.server = None
+
+    @property
+    def url(self):
+        password = f":{self.password}@" if self.password else ""
+        return f"redis://{password}127.0.0.1:{self.server.sockets[0].getsockname()[1]}"
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.__handle, "127.0.0.1", 0)
+
+    async def close(self):
+        self.disconnect_all()
+        self.server.close()
+        await self.server.wait_closed()
+
+    def disconnect_all(self):
+        for writer in self.connections:
+            writer.close()
+        self.connections.clear()
+        self.subscribers.clear()
+
+    async def __handle(self, reader, writer):
+        self.connections.add(writer)
+        try:
+            while True:
+                command, *args = await read_reply(reader)
+                command = command.upper()
+                if command == b"AUTH":
+                    writer.write(b"+OK\r\n" if args[0].decode() == self.password else b"-ERR invalid password\r\n")
+                elif command == b"SUBSCRIBE":
+                    for channel in args:
+                        self.subscribers[channel].add(writer)
+                        writer.write(encode_reply([b"subscribe", channel, len(self.subscribers)]))
+                elif command == b"PUBLISH":
+                    channel, message = args
+                    subscribers = list(self.subscribers.get(channel, []))
+                    for subscriber in subscribers:
+                        subscriber.write(encode_reply([b"message", channel, message]))
+                    writer.write(encode_reply(len(subscribers)))
+                else:
+                    writer.write(b"-ERR unknown command\r\n")
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for subscribers in self.subscribers.values():
+                subscribers.discard(writer)
+            self.connections.discard(writer)
+            writer.close()
+
+
+@pytest_asyncio.fixture
+async def redis_server():
+    server = FakeRedisServer(password="secret")
+    await server.start()
+    yield server
+    await server.close()
+
+
+class BusGameManager(GameManager):
+    def __init__(self, db_client, message_bus):
+        super().__init__(db_client=db_client, gpt_client=MockGPTManager(), message_bus=message_bus)
+
+
+class TestMessageBus:
+    def test_commands_are_encoded_in_resp(self):
+        assert encode_command("PUBLISH", "games", "héllo") == \
+            b"*3\r\n$7\r\nPUBLISH\r\n$5\r\ngames\r\n$6\r\nh\xc3\xa9llo\r\n"
+
+    @pytest.mark.asyncio
+    async def test_in_process_bus_calls_the_subscribed_handlers(self):
+        bus = InProcessMessageBus()
+        received = []
+
+        async def handler(message):
+            received.append(message)
+
+        await bus.subscribe("games", handler)
+        await bus.publish("games", "hello")
+        await bus.publish("other", "ignored")
+        assert received == ["hello"]
+
+    @pytest.mark.asyncio
+    async def test_redis_bus_reaches_every_subscribed_worker(self, redis_server):
+        buses = [RedisMessageBus.from_url(redis_server.url) for _ in range(2)]
+        received = [[], []]
+        for bus, messages in zip(buses, received):
+            async def handler(message, messages=messages):
+                messages.append(message)
+            await bus.subscribe("games", handler)
+        await buses[0].publish("games", "new_round\nround one")
+        await wait_until(lambda: received == [["new_round\nround one"]] * 2)
+        for bus in buses:
+            await bus.close()
+
+    @pytest.mark.asyncio
+    async def test_slow_redis_bus_handler_does_not_hold_up_other_messages(self, redis_server):
+        bus = RedisMessageBus.from_url(redis_server.url)
+        received, release = [], asyncio.Event()
+
+        async def handler(message):
+            received.append(message)
+            if message == "slow":
+                await release.wait()
+                received.append("slow done")
+
+        await bus.subscribe("games", handler)
+        for message in ("slow", "first", "second"):
+            await bus.publish("games", message)
+        await wait_until(lambda: received == ["slow", "first", "second"])
+        release.set()
+        await wait_until(lambda: received[-1] == "slow done")
+        await bus.close()
+
+    @pytest.mark.asyncio
+    async def test_redis_bus_resubscribes_after_losing_the_connection(self, redis_server):
+        bus = RedisMessageBus.from_url(redis_server.url)
+        received = []
+
+        async def handler(message):
+            received.append(message)
+
+        await bus.subscribe("games", handler)
+        redis_server.disconnect_all()
+        await wait_until(lambda: bool(redis_server.subscribers.get(b"games")), timeout=3)
+        await bus.publish("games", "hello")
+        await wait_until(lambda: received == ["hello"])
+        await bus.close()
+
+    @pytest.mark.asyncio
+    async def test_redis_bus_raises_server_errors(self, redis_server):
+        bus = RedisMessageBus.from_url(redis_server.url.replace("secret", "wrong"))
+        with pytest.raises(MessageBusError):
+            await bus.publish("games", "hello")
+        await bus.close()
+
+    @pytest.mark.asyncio
+    async def test_players_on_different_workers_get_the_game_messages(self, redis_server):
+        db_client = MockFirestore()
+        first_worker = BusGameManager(db_client, RedisMessageBus.from_url(redis_server.url))
+        second_worker = BusGameManager(db_client, RedisMessageBus.from_url(redis_server.url))
+        game = await first_worker.create_game(handle="test_handle", avatar="test_avatar", user_count=2,
+                                              round_count=1, round_duration=timedelta(minutes=1))
+        player = await first_worker.add_player(game_id=game.id, handle="player_handle", avatar="player_avatar")
+        await first_worker.write_behind.flush(game.id)
+        creator_socket, player_socket = MockWebSocket(), MockWebSocket()
+        await asyncio.wait_for(first_worker.join_game(game.id, game.created_by, creator_socket), 1)
+        await asyncio.wait_for(second_worker.join_game(game.id, player.id, player_socket), 1)
+        # The lobby is full once the workers know each other's players, and the game is started once
+        for socket in (creator_socket, player_socket):
+            await wait_until(lambda: "new_round" in socket.message_types())
+        await asyncio.sleep(0.1)
+        for socket in (creator_socket, player_socket):
+            assert socket.message_types().count("game_start") == 1 and socket.message_types()[-1] == "new_round"
+
+        # The second worker loads the round started by the first one, and the round waits for the creator
+        first_round = (await first_worker.is_game_valid(game.id))[1].rounds[0]
+        await second_worker.submit_guess(game.id, first_round.id, player.id, first_round.movie_name)
+        await wait_until(lambda: player_socket.message_types()[-1] == "guess_result")
+        assert player_socket.messages[-1]["meta"]["guess_result"] is True
+        await asyncio.sleep(0.1)
+        assert creator_socket.message_types()[-1] == "new_round"
+
+        # The first worker ends the round as soon as its own player answered too
+        await first_worker.submit_guess(game.id, first_round.id, game.created_by, "zzzz qqqq")
+        await wait_until(lambda: "end_game" in player_socket.message_types())
+        stored_game = await db_client.get_game(game.id)
+        assert stored_game["results"] == {player.id: 1, game.created_by: 0}
+        for worker in (first_worker, second_worker):
+            await worker.close()
+
+    @pytest.mark.asyncio
+    async def test_ending_a_round_keeps_the_guesses_of_other_workers(self, redis_server):
+        db_client = MockFirestore()
+        first_worker = BusGameManager(db_client, RedisMessageBus.from_url(redis_server.url))
+        second_worker = BusGameManager(db_client, RedisMessageBus.from_url(redis_server.url))
+        game = await first_worker.create_game(handle="test_handle", avatar="test_avatar", user_count=2,
+                                              round_count=2, round_duration=timedelta(minutes=1))
+        player = await first_worker.add_player(game_id=game.id, handle="player_handle", avatar="player_avatar")
+        await first_worker.start_round(game.id)
+        stale_game = copy.deepcopy(first_worker.games.get(game.id))
+        first_round = stale_game.rounds[0]
+        await second_worker.submit_guess(game.id, first_round.id, player.id, first_round.movie_name)
+        # The first worker ends the round before it heard of the guess
+        first_worker.games.put(stale_game)
+        await first_worker.end_round(game.id, first_round.id)
+        stored_game = await db_client.get_game(game.id)
+        assert stored_game["rounds"][0]["results"] == {game.created_by: False, player.id: True}
+        assert [p["score"] for p in stored_game["players"]] == [0, 1]
+        for worker in (first_worker, second_worker):
+            await worker.close()
+
+    @pytest.mark.asyncio
+    async def test_players_added_by_several_workers_at_once_respect_the_limit(self, redis_server):
+        db_client = MockFirestore()
+        workers = [BusGameManager(db_client, RedisMessageBus.from_url(redis_server.url)) for _ in range(3)]
+        game = await workers[0].create_game(handle="test_handle", avatar="test_avatar", user_count=3,
+                                            round_count=1, round_duration=timedelta(minutes=1))
+        for worker in workers:
+            await worker.is_game_valid(game.id)
+        results = await asyncio.gather(
+            *[worker.add_player(game_id=game.id, handle="handle", avatar="avatar") for worker in workers],
+            return_exceptions=True,
+        )
+        added = [result for result in results if isinstance(result, Player)]
+        assert len(added) == 2 and sum(isinstance(result, PlayerLimitMetError) for result in results) == 1
+        stored_players = db_client.games[game.id]["players"]
+        assert sorted(p["order"] for p in stored_players.values()) == [0, 1, 2]
+        _, loaded_game = await workers[0].is_game_valid(game.id)
+        assert [p.id for p in loaded_game.players][1:] == [p.id for p in added]
+        for worker in workers:
+            await worker.close()
+
+    @pytest.mark.asyncio
+    async def test_players_added_by_another_worker_can_join(self, redis_server):
+        db_client = MockFirestore()
+        first_worker = BusGameManager(db_client, RedisMessageBus.from_url(redis_server.url))
+        second_worker = BusGameManager(db_client, RedisMessageBus.from_url(redis_server.url))
+        game = await first_worker.create_game(handle="test_handle", avatar="test_avatar", user_count=3,
+                                              round_count=1, round_duration=timedelta(minutes=1))
+        await asyncio.wait_for(first_worker.join_game(game.id, game.created_by, MockWebSocket()), 1)
+        player = await second_worker.add_player(game_id=game.id, handle="player_handle", avatar="player_avatar")
+        player_socket = MockWebSocket()
+        await asyncio.wait_for(first_worker.join_game(game.id, player.id, player_socket), 1)
+        assert player_socket.message_types() == ["player_join"]
+        for worker in (first_worker, second_worker):
+            await worker.close()
+
+    @pytest.mark.asyncio
+    async def test_round_end_is_signalled_through_the_bus(self):
+        game_manager = BusGameManager(MockFirestore(), InProcessMessageBus())
+        game = await game_manager.create_game(handle="test_handle", avatar="test_avatar", user_count=1,
+                                              round_count=2, round_duration=timedelta(minutes=1))
+        await asyncio.wait_for(game_manager.join_game(game.id, game.created_by, MockWebSocket()), 1)
+        first_round = game.rounds[0]
+        assert first_round.start_time is not None
+        await game_manager.submit_guess(game.id, first_round.id, game.created_by, first_round.movie_name)
+        await wait_until(lambda: first_round.end_time is not None)
+        await game_manager.close()
@@ -0,0 +1,61 @@
+import pytest
+from fastapi import FastAPI
+
+from api.lib.metrics import Histogram, MetricsRegistry, MetricsMiddleware
+
+
+async def call(app, method, path):
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "method": method, "path": path, "raw_path": path.encode(), "query_string": b"",
+        "headers": [], "root_path": "", "scheme": "http", "server": ("test", 80), "http_version": "1.1",
+    }
+    await app(scope, receive, send)
+    return sent[0]["status"]
+
+
+class TestMetrics:
+    def test_histogram_renders_cumulative_buckets(self):
+        registry = MetricsRegistry()
+        histogram = registry.histogram("test_seconds", "Test durations", ("operation",), buckets=(0.1, 1.0))
+        histogram.observe(0.05, "get")
+        histogram.observe(0.5, "get")
+        histogram.observe(5, "get")
+        registry.gauge("test_games", "Test games", lambda: 3)
+        lines = registry.render().splitlines()
+        assert 'test_seconds_bucket{operation="get",le="0.1"} 1' in lines
+        assert 'test_seconds_bucket{operation="get",le="1.0"} 2' in lines
+        assert 'test_seconds_bucket{operation="get",le="+Inf"} 3' in lines
+        assert 'test_seconds_sum{operation="get"} 5.55' in lines
+        assert 'test_seconds_count{operation="get"} 3' in lines
+        assert "# TYPE test_games gauge" in lines and "test_games 3" in lines
+
+    def test_time_observes_failed_calls(self):
+        histogram = Histogram("test_seconds", "Test durations", ("operation",))
+        with pytest.raises(ValueError):
+            with histogram.time("fail"):
+                raise ValueError()
+        assert histogram.count("fail") == 1
+
+    @pytest.mark.asyncio
+    async def test_middleware_labels_requests_with_their_route(self):
+        app = FastAPI()
+
+        @app.get("/game/{game_id}")
+        async def get_game(game_id: str):
+            return {"game_id": game_id}
+
+        histogram = Histogram("test_http_seconds", "Test requests", ("method", "route", "status"))
+        app.add_middleware(MetricsMiddleware, histogram=histogram)
+        assert await call(app, "GET", "/game/1") == 200
+        assert await call(app, "GET", "/game/2") == 200
+        assert await call(app, "GET", "/missing") == 404
+        assert histogram.count("GET", "/game/{game_id}", "200") == 2
+        assert histogram.count("GET", "unmatched", "404") == 1
@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+from api.errors.rate_limit import RateLimitedError, ServerBusyError
+from api.lib import rate_limit
+from api.lib.rate_limit import TokenBucketLimiter, AdmissionController
+
+
+class TestRateLimit:
+    def test_buckets_refill_at_the_rate(self, monkeypatch):
+        now = [100.0]
+        monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now[0])
+        limiter = TokenBucketLimiter(rate=2, burst=3, max_keys=2)
+        for _ in range(3):
+            limiter.acquire("player")
+        with pytest.raises(RateLimitedError) as error:
+            limiter.acquire("player")
+        assert error.value.retry_after == pytest.approx(0.5)
+        limiter.acquire("other_player")
+        now[0] += 0.5
+        limiter.acquire("player")
+        with pytest.raises(RateLimitedError):
+            limiter.acquire("player")
+        limiter.acquire("third_player")
+        assert len(limiter) == 2
+
+    @pytest.mark.asyncio
+    async def test_admission_queues_then_rejects(self):
+        admission = AdmissionController(max_concurrency=1, max_queue=1, queue_timeout=0.2)
+        release = asyncio.Event()
+        admitted = []
+
+        async def create(name):
+            async with admission.admit():
+                admitted.append(name)
+                await release.wait()
+
+        first = asyncio.get_running_loop().create_task(create("first"))
+        queued = asyncio.get_running_loop().create_task(create("queued"))
+        await asyncio.sleep(0)
+        assert admitted == ["first"] and admission.waiting == 1
+        with pytest.raises(ServerBusyError):
+            await create("rejected")
+        release.set()
+        await asyncio.gather(first, queued)
+        assert admitted == ["first", "queued"] and admission.waiting == 0
+
+        release.clear()
+        first = asyncio.get_running_loop().create_task(create("first"))
+        await asyncio.sleep(0)
+        with pytest.raises(ServerBusyError):
+            await create("timed_out")
+        assert admission.waiting == 0
+        release.set()
+        await first
@@ -0,0 +1,53 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+import pytz
+
+from api.bal.round_scheduler import RoundScheduler
+
+
+class TestRoundScheduler:
+    def initialize_tests(self):
+        self.ended_rounds = []
+        self.round_ended = asyncio.Event()
+
+        async def on_round_end(game_id, round_id):
+            self.ended_rounds.append((game_id, round_id))
+            self.round_ended.set()
+
+        self.scheduler = RoundScheduler(on_round_end=on_round_end)
+
+    @pytest.mark.asyncio
+    async def test_rounds_end_in_deadline_order(self):
+        self.initialize_tests()
+        now = datetime.now(pytz.timezone('UTC'))
+        self.scheduler.schedule("game_2", "round_2", now + timedelta(milliseconds=60))
+        self.scheduler.schedule("game_1", "round_1", now + timedelta(milliseconds=20))
+        assert len(self.scheduler) == 2
+        while len(self.ended_rounds) < 2:
+            await asyncio.wait_for(self.round_ended.wait(), 1)
+            self.round_ended.clear()
+        assert self.ended_rounds == [("game_1", "round_1"), ("game_2", "round_2")]
+        assert len(self.scheduler) == 0
+        await self.scheduler.close()
+
+    @pytest.mark.asyncio
+    async def test_setting_the_event_ends_the_round_once(self):
+        self.initialize_tests()
+        timer = self.scheduler.schedule("game", "round", datetime.now(pytz.timezone('UTC')) + timedelta(minutes=1))
+        timer.set()
+        await asyncio.wait_for(self.round_ended.wait(), 1)
+        timer.set()
+        await asyncio.sleep(0.01)
+        assert self.ended_rounds == [("game", "round")]
+        await self.scheduler.close()
+
+    @pytest.mark.asyncio
+    async def test_cancelled_round_does_not_end(self):
+        self.initialize_tests()
+        self.scheduler.schedule("game", "round", datetime.now(pytz.timezone('UTC')) + timedelta(milliseconds=10))
+        self.scheduler.cancel("game", "round")
+        await asyncio.sleep(0.05)
+        assert self.ended_rounds == []
+        await self.scheduler.close()
@@ -0,0 +1,42 @@
+import json
+from datetime import timedelta
+
+from fastapi.encoders import jsonable_encoder
+
+from api.bal.broadcaster import Broadcaster
+from api.dal.sqlite import encode_document
+from api.dal.documents import to_document
+from api.models.game import GetGameWithResultsResponse, VerifyGameResponse, Player
+from benchmarks.bench_serialization import create_game
+
+
+class TestSerialization:
+    def test_to_dict_matches_dict(self):
+        game = create_game(player_count=3, round_count=2)
+        assert game.to_dict() == game.dict()
+        assert game.players[0].to_dict() == game.players[0].dict()
+        assert game.rounds[0].to_dict() == game.rounds[0].dict()
+
+    def test_responses_are_encoded_like_fastapi(self):
+        game = create_game(player_count=3, round_count=2)
+        response = GetGameWithResultsResponse(status="OK", game=game)
+        assert json.loads(response.json_bytes()) == jsonable_encoder(response)
+        verify_response = VerifyGameResponse(status="OK", game_id=game.id, user_count=3, round_count=2,
+                                             round_duration=timedelta(minutes=2), created_by=game.created_by)
+        assert json.loads(verify_response.json_bytes()) == jsonable_encoder(verify_response)
+
+    def test_encoded_game_is_cached_until_invalidated(self):
+        game = create_game(player_count=1, round_count=1)
+        encoded = game.json_bytes()
+        game.players.append(Player(handle="late_player", avatar="avatar", score=0))
+        assert game.json_bytes() is encoded
+        game.invalidate()
+        assert [p["handle"] for p in json.loads(game.json_bytes())["players"]] == ["player_0", "late_player"]
+
+    def test_documents_and_messages_are_compact_json(self):
+        game = create_game(player_count=2, round_count=1)
+        document = to_document(game.to_dict())
+        assert json.loads(encode_document(document))["rounds"][game.rounds[0].id]["start_time"] == \
+            game.rounds[0].start_time.isoformat()
+        assert Broadcaster.encode({"message": "Guess the movie", "meta": {"emoji": "🦁👑"}}) == \
+            '{"message":"Guess the movie","meta":{"emoji":"🦁👑"}}'
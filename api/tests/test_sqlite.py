@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta
+
+import pytest
+import pytz
+
+from api.bal.game_manager import GameManager
+from api.dal import documents
+from api.dal.sqlite import SQLiteDatabase
+from api.models.game import Game, Player, Round
+from tests.conftest import MockGPTManager
+
+
+def new_game():
+    player = Player(handle="test_handle", avatar="test_avatar", score=0)
+    return Game(created_by=player.id, players=[player], rounds=[Round(emoji="🦁👑", movie_name="The Lion King")])
+
+
+class TestSQLiteDatabase:
+    @pytest.mark.asyncio
+    async def test_upsert_and_get_game(self):
+        db = SQLiteDatabase()
+        game = new_game()
+        await db.upsert_game(game.dict())
+        assert await db.get_game(game.id) == game.dict()
+        assert await db.get_game("invalid_id") == {}
+        db.close()
+
+    @pytest.mark.asyncio
+    async def test_update_game(self):
+        db = SQLiteDatabase()
+        game = new_game()
+        await db.upsert_game(game.dict())
+        start_time = datetime.now(pytz.timezone('UTC'))
+        await db.update_game(game.id, documents.round_started(game.rounds[0].id, start_time))
+        await db.update_game(game.id, documents.guess_recorded(game.rounds[0].id, game.players[0].id, True))
+        stored_round = (await db.get_game(game.id))["rounds"][0]
+        assert stored_round["start_time"] == start_time.isoformat()
+        assert stored_round["results"] == {game.players[0].id: True}
+        db.close()
+
+    @pytest.mark.asyncio
+    async def test_players_are_added_up_to_the_limit(self):
+        db = SQLiteDatabase()
+        game = new_game()
+        await db.upsert_game(game.dict())
+        players = [Player(handle=f"h{i}", avatar="a", score=0) for i in range(2)]
+        assert await db.add_player(game.id, players[0].to_dict(), len(game.players) + 1)
+        assert not await db.add_player(game.id, players[1].to_dict(), len(game.players) + 1)
+        stored_game = await db.get_game(game.id)
+        assert [p["id"] for p in stored_game["players"]] == [p.id for p in game.players] + [players[0].id]
+        db.close()
+
+    @pytest.mark.asyncio
+    async def test_games_are_persisted_in_wal_mode(self, tmp_path):
+        path = str(tmp_path / "filmemo.db")
+        db = SQLiteDatabase(path)
+        assert db.connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        game = new_game()
+        await db.upsert_game(game.dict())
+        db.close()
+        db = SQLiteDatabase(path)
+        assert (await db.get_game(game.id))["id"] == game.id
+        db.close()
+
+    @pytest.mark.asyncio
+    async def test_game_manager_reloads_games_from_sqlite(self):
+        game_manager = GameManager(db_client=SQLiteDatabase(), gpt_client=MockGPTManager())
+        game = await game_manager.create_game(handle="test_handle", avatar="test_avatar", user_count=2,
+                                              round_count=1, round_duration=timedelta(minutes=1))
+        player = await game_manager.add_player(game_id=game.id, handle="player_handle", avatar="player_avatar")
+        await game_manager.start_round(game.id)
+        await game_manager.submit_guess(game.id, game.rounds[0].id, player.id, game.rounds[0].movie_name)
+        await game_manager.end_round(game.id, game.rounds[0].id)
+        game_manager.games.evict(game.id)
+        _, loaded_game = await game_manager.is_game_valid(game.id)
+        assert [p.id for p in loaded_game.players] == [game.created_by, player.id]
+        assert loaded_game.rounds[0].start_time == game.rounds[0].start_time
+        assert loaded_game.rounds[0].results == {game.created_by: False, player.id: True}
+        await game_manager.close()
+
+    @pytest.mark.asyncio
+    async def test_game_manager_closes_the_database(self, tmp_path):
+        path = tmp_path / "filmemo.db"
+        game_manager = GameManager(db_client=SQLiteDatabase(str(path)), gpt_client=MockGPTManager())
+        game = await game_manager.create_game(handle="test_handle", avatar="test_avatar", user_count=2,
+                                              round_count=1, round_duration=timedelta(minutes=1))
+        await game_manager.add_player(game_id=game.id, handle="player_handle", avatar="player_avatar")
+        await game_manager.close()
+        assert not (tmp_path / "filmemo.db-wal").exists()
+        db = SQLiteDatabase(str(path))
+        assert len((await db.get_game(game.id))["players"]) == 2
+        db.close()
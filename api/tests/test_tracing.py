@@ -0,0 +1,55 @@
+import asyncio
+import time
+
+import pytest
+
+from api.errors.profiler import ProfilerBusyError
+from api.lib.profiler import SamplingProfiler
+from api.lib.tracing import Tracer
+
+
+def busy_work(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(i * i for i in range(1000))
+
+
+class TestTracing:
+    def test_timelines_are_bounded(self):
+        tracer = Tracer(max_games=2, max_spans=3)
+        for i in range(5):
+            tracer.record("first", f"span_{i}", i, i + 0.5)
+        tracer.record("second", "span", 0, 1)
+        tracer.record("first", "span_5", 5, 6)
+        tracer.record("third", "span", 0, 1)
+        assert len(tracer) == 2 and tracer.timeline("second") is None
+        assert [span["name"] for span in tracer.timeline("first")["spans"]] == ["span_3", "span_4", "span_5"]
+
+    def test_span_records_errors(self):
+        tracer = Tracer()
+        with pytest.raises(ValueError):
+            with tracer.span("game", "submit_guess", round_id="round") as span:
+                span["player_id"] = "player"
+                raise ValueError()
+        [span] = tracer.timeline("game")["spans"]
+        assert span["round_id"] == "round" and span["player_id"] == "player" and span["error"] == "ValueError"
+
+    @pytest.mark.asyncio
+    async def test_profiler_samples_the_event_loop(self):
+        profiler = SamplingProfiler(interval=0.001)
+
+        async def work():
+            for _ in range(20):
+                busy_work(0.01)
+                await asyncio.sleep(0)
+
+        task = asyncio.get_running_loop().create_task(work())
+        profile = asyncio.get_running_loop().create_task(profiler.profile(0.2))
+        await asyncio.sleep(0)
+        with pytest.raises(ProfilerBusyError):
+            await profiler.profile(0.1)
+        report = await profile
+        await task
+        assert report.samples > 0 and not profiler.running
+        assert "busy_work" in report.top()
+        assert any("busy_work" in line for line in report.collapsed().splitlines())